@@ -0,0 +1,150 @@
+"""Admission control for calendar generation.
+
+A request's cost is estimated up front in post units:
+
+    days x platforms x (1 + REEL_WEIGHT x share of platforms that get a reel plan)
+
+and checked, in order, against hard ceilings (days, platforms, cost), then
+per-user and per-IP token buckets. Requests that pass but cost more than
+GENERATE_SYNC_COST are meant for the background path rather than a request
+worker. Buckets are per process, like the other in-memory caches.
+
+Config (env):
+  GENERATE_MAX_DAYS, GENERATE_MAX_PLATFORMS, GENERATE_MAX_COST   hard ceilings per request
+  GENERATE_SYNC_COST                 largest cost served inline
+  GENERATE_USER_RATE / _USER_BURST   per-user bucket: units refilled per second / capacity
+  GENERATE_IP_RATE / _IP_BURST       per-IP bucket
+"""
+import math
+import os
+import threading
+import time
+
+REEL_WEIGHT = 1.0  # a reel plan costs about as much again as the caption/prompt work
+
+
+def _env_float(name, default):
+    try:
+        return float(os.getenv(name, ''))
+    except ValueError:
+        return default
+
+
+def max_days():
+    return int(_env_float('GENERATE_MAX_DAYS', 3650))
+
+
+def max_platforms():
+    return int(_env_float('GENERATE_MAX_PLATFORMS', 10))
+
+
+def max_cost():
+    return _env_float('GENERATE_MAX_COST', 60000)
+
+
+def sync_cost():
+    return _env_float('GENERATE_SYNC_COST', 5000)
+
+
+def estimate_cost(days, platforms, reel_platforms=()):
+    """Estimated work, in post units, for `days` days across `platforms`."""
+    platforms = list(platforms or [])
+    if days <= 0 or not platforms:
+        return 0.0
+    reel_share = sum(1 for p in platforms if str(p).lower() in reel_platforms) / len(platforms)
+    return days * len(platforms) * (1 + REEL_WEIGHT * reel_share)
+
+
+class Rejected(Exception):
+    """Request refused. `status` is the HTTP status to answer with, `retry_after` seconds (or None)."""
+
+    def __init__(self, message, status=429, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, cost, now):
+        """Seconds until `cost` tokens are available (0 if they are now)."""
+        self._refill(now)
+        if self.tokens >= cost:
+            return 0.0
+        if self.rate <= 0:
+            return math.inf
+        return (cost - self.tokens) / self.rate
+
+
+class Limiter:
+    """Token buckets keyed by e.g. 'user:<id>' / 'ip:<addr>'; a charge succeeds only if every bucket can pay."""
+
+    def __init__(self, max_keys=10000, clock=time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, key, rate, burst, now):
+        b = self._buckets.get(key)
+        if b is None:
+            if len(self._buckets) >= self.max_keys:
+                # drop buckets that have refilled completely; they carry no state
+                for k in [k for k, v in self._buckets.items() if v.tokens + (now - v.updated) * v.rate >= v.capacity]:
+                    del self._buckets[k]
+            b = self._buckets[key] = TokenBucket(rate, burst, now)
+        else:
+            b.rate, b.capacity = rate, burst
+        return b
+
+    def charge(self, cost, limits):
+        """Take `cost` tokens from each (key, rate, burst) in `limits`, or raise Rejected with Retry-After."""
+        with self._lock:
+            now = self.clock()
+            buckets = [self._bucket(key, rate, burst, now) for key, rate, burst in limits]
+            for b in buckets:
+                if cost > b.capacity:
+                    raise Rejected('Request is larger than your generation allowance', status=413)
+            wait = max((b.wait_time(cost, now) for b in buckets), default=0.0)
+            if wait > 0:
+                raise Rejected('Generation rate limit exceeded', retry_after=max(1, math.ceil(wait)))
+            for b in buckets:
+                b.tokens -= cost
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+limiter = Limiter()
+
+
+def check_ceilings(days, platforms, cost):
+    if days > max_days():
+        raise Rejected(f'days must be at most {max_days()}', status=400)
+    if len(set(platforms or [])) > max_platforms():
+        raise Rejected(f'At most {max_platforms()} platforms per request', status=400)
+    if cost > max_cost():
+        raise Rejected('Request too large; ask for fewer days or platforms', status=413)
+
+
+def admit(cost, user_id=None, ip=None):
+    """Charge `cost` against the caller's user and IP buckets (raises Rejected)."""
+    limits = []
+    if user_id:
+        limits.append((f'user:{user_id}', _env_float('GENERATE_USER_RATE', 200), _env_float('GENERATE_USER_BURST', 60000)))
+    if ip:
+        limits.append((f'ip:{ip}', _env_float('GENERATE_IP_RATE', 400), _env_float('GENERATE_IP_BURST', 120000)))
+    if cost > 0 and limits:
+        limiter.charge(cost, limits)
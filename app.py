@@ -1,31 +1,78 @@
+import time
+_IMPORT_STARTED = time.perf_counter()  # STARTUP_PROFILE=1 logs import -> first served request
+
 import os, sqlite3, uuid, json, re
+import base64
+import hashlib
 from datetime import date
 from datetime import datetime, timezone
-from flask import Flask, request, jsonify, render_template, g, session
+from flask import Flask, Response, request, jsonify, render_template, g, session, has_app_context, has_request_context
 import threading
-import time
+import hmac
+import secrets
 from flask_cors import CORS
-from generator import generate_posts
-from werkzeug.security import generate_password_hash, check_password_hash
-from typing import TYPE_CHECKING
-
-# optional stripe import (only used if STRIPE_SECRET_KEY is set)
-try:
-    if TYPE_CHECKING:
-        # ensure type-checkers know about stripe without requiring it at runtime
-        import stripe  # type: ignore
-    else:
-        import stripe
-except Exception:
-    stripe = None
+from generator import (FIELD_DEPENDENCIES, STRUCTURAL_INPUTS, affected_fields, changed_inputs, content_stamp,
+                       generate_posts, iter_posts, params_from_payload, update_posts)
+import admission
+import batch
+import captions
+import content
+import counters
+import dbwriter
+import exports
+import maintenance
+import metrics
+import sqltrace
+from cache import TTLCache
+import passwords
+import profiles
+import progress
+
+# Stripe and OpenAI are imported on first use rather than at import time: most
+# requests never touch billing, and the stripe package alone is a large share of
+# worker boot. Tests may replace `stripe` (with a stub, or None for "not installed").
+_NOT_LOADED = object()
+stripe = _NOT_LOADED
+_openai_client = _NOT_LOADED
+
+
+def load_stripe():
+    """The stripe module, imported on first call; None when it is not installed."""
+    global stripe
+    if stripe is _NOT_LOADED:
+        try:
+            import stripe as stripe_module
+        except Exception:
+            stripe_module = None
+        stripe = stripe_module
+    return stripe
+
+
+def stripe_client():
+    """stripe with api_key set from STRIPE_SECRET_KEY, or None when Stripe is not configured."""
+    key = os.getenv('STRIPE_SECRET_KEY')
+    if not key:
+        return None
+    mod = load_stripe()
+    if mod is not None:
+        mod.api_key = key
+    return mod
+
+
+def openai_client():
+    """Shared OpenAI client, created on first call; None without OPENAI_API_KEY or the openai package."""
+    global _openai_client
+    if _openai_client is _NOT_LOADED:
+        client = None
+        if os.getenv("OPENAI_API_KEY"):
+            try:
+                from openai import OpenAI
+                client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+            except Exception:
+                client = None
+        _openai_client = client
+    return _openai_client
 
-USE_OPENAI = bool(os.getenv("OPENAI_API_KEY"))
-if USE_OPENAI:
-    try:
-        from openai import OpenAI
-        openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    except Exception:
-        USE_OPENAI = False
 
 app = Flask(__name__)
 app.secret_key = os.getenv("SECRET_KEY", "dev-secret-change-me")
@@ -33,20 +80,100 @@ CORS(app)
 
 DB_PATH = os.path.join(os.path.dirname(__file__), "togetherly.db")
 
+class TimedConnection(sqlite3.Connection):
+    """sqlite3 connection that counts statements and the time spent running them."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.query_count = 0
+        self.query_time = 0.0
+        self.tracer = None
+
+    def _timed(self, fn, *args):
+        tracer = self.tracer
+        token = tracer.begin_call() if tracer else None
+        t0 = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self.query_count += 1
+            self.query_time += time.perf_counter() - t0
+            if tracer:
+                tracer.end_call(token)
+
+    def execute(self, sql, parameters=()):
+        return self._timed(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._timed(super().executemany, sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self._timed(super().executescript, sql_script)
+
+
+def sql_trace_enabled():
+    return bool(app.config.get('SQL_TRACE')) or os.getenv('SQL_TRACE') == '1'
+
+
 def get_db():
     if "db" not in g:
-        g.db = sqlite3.connect(DB_PATH)
+        g.db = sqlite3.connect(DB_PATH, factory=TimedConnection)
         g.db.row_factory = sqlite3.Row
+        if has_request_context() and sql_trace_enabled():
+            sqltrace.QueryTracer(request.endpoint or 'unmatched').attach(g.db)
     return g.db
 
+def db_writer():
+    return dbwriter.get(DB_PATH)
+
+
+def write(op, params=(), durability=dbwriter.NORMAL):
+    """Run a write (SQL string or callable taking a connection) on the shared writer and wait for its commit."""
+    w = db_writer()
+    # statements run on the writer still count against the calling request's SQL trace
+    trace = None
+    if has_request_context() and sql_trace_enabled():
+        trace = get_db().tracer
+    fut = w.submit(op, durability, trace) if callable(op) else w.execute(op, params, durability, trace)
+    return fut.result(timeout=float(os.getenv('DB_WRITE_TIMEOUT', '10')))
+
+
 @app.teardown_appcontext
 def close_db(exc):
     db = g.pop("db", None)
     if db is not None:
         db.close()
 
+# "latest" is by created_at, then insertion order (created_at has one-second resolution)
+LATEST_SUBSCRIPTION = 'SELECT rowid FROM subscriptions WHERE user_id = {user} ORDER BY created_at DESC, rowid DESC LIMIT 1'
+LATEST_SUBSCRIPTION_STATUS = 'SELECT status FROM subscriptions WHERE user_id = {user} ORDER BY created_at DESC, rowid DESC LIMIT 1'
+
+ADMIN_BROWSER_SCHEMA = f"""
+CREATE INDEX IF NOT EXISTS idx_users_created ON users(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_users_paid_created ON users(is_paid, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_users_substatus_created ON users(subscription_status, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_subscriptions_user_created ON subscriptions(user_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_subscriptions_created ON subscriptions(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_subscriptions_status_created ON subscriptions(status, created_at, id);
+CREATE TRIGGER IF NOT EXISTS users_substatus_ins AFTER INSERT ON subscriptions BEGIN
+    UPDATE users SET subscription_status = ({LATEST_SUBSCRIPTION_STATUS.format(user='NEW.user_id')}) WHERE id = NEW.user_id;
+END;
+CREATE TRIGGER IF NOT EXISTS users_substatus_upd AFTER UPDATE OF status, user_id, created_at ON subscriptions BEGIN
+    UPDATE users SET subscription_status = ({LATEST_SUBSCRIPTION_STATUS.format(user='OLD.user_id')}) WHERE id = OLD.user_id;
+    UPDATE users SET subscription_status = ({LATEST_SUBSCRIPTION_STATUS.format(user='NEW.user_id')}) WHERE id = NEW.user_id AND NEW.user_id IS NOT OLD.user_id;
+END;
+CREATE TRIGGER IF NOT EXISTS users_substatus_del AFTER DELETE ON subscriptions BEGIN
+    UPDATE users SET subscription_status = ({LATEST_SUBSCRIPTION_STATUS.format(user='OLD.user_id')}) WHERE id = OLD.user_id;
+END;
+"""
+
+
 def init_db():
     db = get_db()
+    # only takes effect on a new, empty database; existing ones can switch with `python maintenance.py --enable-incremental-vacuum`
+    db.execute('PRAGMA auto_vacuum=INCREMENTAL')
+    # WAL lets request connections keep reading while the writer thread commits
+    db.execute('PRAGMA journal_mode=WAL')
     db.executescript(
         """
         CREATE TABLE IF NOT EXISTS profiles (
@@ -90,10 +217,55 @@ def init_db():
             id TEXT PRIMARY KEY,
             status TEXT,
             result TEXT,
+            total INTEGER DEFAULT 0,
+            processed INTEGER DEFAULT 0,
+            changed INTEGER DEFAULT 0,
+            errors INTEGER DEFAULT 0,
+            started_at DATETIME,
+            finished_at DATETIME,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE IF NOT EXISTS reconcile_results (
+            job_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            subscription_id TEXT,
+            stripe_subscription_id TEXT,
+            status TEXT,
+            current_period_end DATETIME,
+            outcome TEXT NOT NULL,
+            error TEXT,
+            PRIMARY KEY (job_id, seq)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_reconcile_results_outcome ON reconcile_results(job_id, outcome, seq);
+        CREATE INDEX IF NOT EXISTS idx_reconcile_results_status ON reconcile_results(job_id, status, seq);
+        CREATE TABLE IF NOT EXISTS generate_jobs (
+            id TEXT PRIMARY KEY,
+            owner TEXT,
+            status TEXT,
+            cost REAL,
+            result TEXT,
+            error TEXT,
             started_at DATETIME,
             finished_at DATETIME,
             created_at DATETIME DEFAULT CURRENT_TIMESTAMP
         );
+        CREATE INDEX IF NOT EXISTS idx_generate_jobs_owner ON generate_jobs(owner, status);
+        CREATE TABLE IF NOT EXISTS calendars (
+            id TEXT PRIMARY KEY,
+            owner TEXT,
+            params TEXT,
+            stamp TEXT,
+            version INTEGER DEFAULT 1,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME
+        );
+        CREATE INDEX IF NOT EXISTS idx_calendars_owner ON calendars(owner);
+        CREATE TABLE IF NOT EXISTS calendar_posts (
+            calendar_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            post TEXT NOT NULL,
+            PRIMARY KEY (calendar_id, seq)
+        ) WITHOUT ROWID;
         CREATE TABLE IF NOT EXISTS password_reset_tokens (
             token TEXT PRIMARY KEY,
             user_id TEXT,
@@ -118,6 +290,11 @@ def init_db():
             db.execute("ALTER TABLE profiles ADD COLUMN details TEXT;")
         except Exception:
             pass
+    # per-job counters replaced the result blob; older reconcile_jobs tables lack them
+    rcols = [r[1] for r in db.execute("PRAGMA table_info(reconcile_jobs)").fetchall()]
+    for col in ('total', 'processed', 'changed', 'errors'):
+        if col not in rcols:
+            db.execute(f"ALTER TABLE reconcile_jobs ADD COLUMN {col} INTEGER DEFAULT 0;")
     # ensure users table has is_admin column (backfill for older DBs)
     try:
         ucols = [r[1] for r in db.execute("PRAGMA table_info(users)").fetchall()]
@@ -128,6 +305,21 @@ def init_db():
                 pass
     except Exception:
         pass
+    # users.subscription_status mirrors the user's latest subscription so the admin browser can filter on an index
+    ucols = [r[1] for r in db.execute("PRAGMA table_info(users)").fetchall()]
+    if "subscription_status" not in ucols:
+        db.execute("ALTER TABLE users ADD COLUMN subscription_status TEXT;")
+        db.execute(f"UPDATE users SET subscription_status = ({LATEST_SUBSCRIPTION_STATUS.format(user='users.id')})")
+    db.executescript(ADMIN_BROWSER_SCHEMA)
+    # one row per Stripe subscription, so a redelivered webhook updates instead of inserting again
+    if not db.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_subscriptions_stripe_id'").fetchone():
+        db.execute('DELETE FROM subscriptions WHERE stripe_subscription_id IS NOT NULL AND rowid NOT IN '
+                   '(SELECT MAX(rowid) FROM subscriptions WHERE stripe_subscription_id IS NOT NULL GROUP BY stripe_subscription_id)')
+        db.execute('CREATE UNIQUE INDEX idx_subscriptions_stripe_id ON subscriptions(stripe_subscription_id)')
+    db.commit()
+    profiles.install(db)
+    counters.install(db)
+    maintenance.install(db)
     db.commit()
 
     # Dev-only: seed a known admin user for local development to simplify testing
@@ -137,7 +329,7 @@ def init_db():
             dev_pw = os.getenv('DEV_ADMIN_PW') or 'OHsj1984'
             # create or update user with admin flag
             existing = db.execute('SELECT id FROM users WHERE email = ?', (dev_email,)).fetchone()
-            pw_hash = generate_password_hash(dev_pw, method='pbkdf2:sha256')
+            pw_hash = passwords.hash_password(dev_pw)
             if existing:
                 try:
                     db.execute('UPDATE users SET password_hash = ?, is_admin = ? WHERE id = ?', (pw_hash, 1, existing['id']))
@@ -150,12 +342,61 @@ def init_db():
                 except Exception:
                     pass
             db.commit()
+            invalidate_entitlements()
     except Exception:
         pass
+    _initialized_db_paths.add(DB_PATH)
+
+
+# schema setup and the dev seed run once per database file rather than on every request
+_initialized_db_paths = set()
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+_first_request_logged = False
+
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is None:
+        return response
+    endpoint = request.endpoint or 'unmatched'
+    metrics.http_request_duration.observe(time.perf_counter() - started, endpoint, request.method, str(response.status_code))
+    db = g.get('db')
+    metrics.sql_queries_per_request.observe(db.query_count if db is not None else 0, endpoint)
+    metrics.sql_time_per_request.observe(db.query_time if db is not None else 0.0, endpoint)
+    if db is not None and db.tracer is not None:
+        sqltrace.finish(db.tracer, app.logger)
+    global _first_request_logged
+    if not _first_request_logged:
+        _first_request_logged = True
+        if os.getenv('STARTUP_PROFILE') == '1':
+            app.logger.warning('startup: first request (%s) served %.1f ms after app import began',
+                               endpoint, (time.perf_counter() - _IMPORT_STARTED) * 1000)
+    return response
+
+
+def stripe_call(operation, fn, *args, **kwargs):
+    """Call a Stripe SDK function, recording its latency and outcome."""
+    t0 = time.perf_counter()
+    outcome = 'error'
+    try:
+        result = fn(*args, **kwargs)
+        outcome = 'ok'
+        return result
+    finally:
+        metrics.stripe_call_duration.observe(time.perf_counter() - t0, operation, outcome)
+
 
 @app.before_request
 def ensure_db():
-    init_db()
+    if DB_PATH not in _initialized_db_paths:
+        init_db()
+        maintenance.start_scheduler(lambda: DB_PATH)
 
 @app.get("/")
 def index():
@@ -163,6 +404,17 @@ def index():
     return render_template("index.html", is_dev=is_dev)
 
 
+# Service worker must be served from the root to control the whole site; the
+# content version is baked in so a new content pack installs a fresh cache.
+@app.get('/sw.js')
+def service_worker():
+    sw_path = os.path.join(os.path.dirname(__file__), "static", "sw.js")
+    with open(sw_path, "r", encoding="utf-8") as f:
+        body = f.read().replace("__CONTENT_VERSION__", json.dumps(content.version())[1:-1])
+    return Response(body, mimetype='application/javascript',
+                    headers={'Cache-Control': 'no-cache', 'Service-Worker-Allowed': '/'})
+
+
 @app.get('/account')
 def account_page():
     uid = session.get('user_id')
@@ -177,9 +429,9 @@ def account_page():
         subscription = dict(sub) if sub else None
         # try to fetch fresh data from Stripe and enrich with human dates (best-effort)
         try:
-            if subscription and stripe and os.getenv('STRIPE_SECRET_KEY') and subscription.get('stripe_subscription_id'):
-                stripe.api_key = os.getenv('STRIPE_SECRET_KEY')
-                remote = stripe.Subscription.retrieve(subscription['stripe_subscription_id'])
+            stripe = stripe_client()
+            if subscription and stripe and subscription.get('stripe_subscription_id'):
+                remote = stripe_call('subscription.retrieve', stripe.Subscription.retrieve, subscription['stripe_subscription_id'])
                 subscription['status'] = remote.get('status')
                 subscription['current_period_end'] = remote.get('current_period_end')
         except Exception:
@@ -224,9 +476,9 @@ def api_account():
     subscription_data = dict(sub) if sub else None
     # if Stripe is configured and we have a stripe_subscription_id, try to fetch fresh status
     try:
-        if subscription_data and stripe and os.getenv('STRIPE_SECRET_KEY') and subscription_data.get('stripe_subscription_id'):
-            stripe.api_key = os.getenv('STRIPE_SECRET_KEY')
-            remote = stripe.Subscription.retrieve(subscription_data['stripe_subscription_id'])
+        stripe = stripe_client()
+        if subscription_data and stripe and subscription_data.get('stripe_subscription_id'):
+            remote = stripe_call('subscription.retrieve', stripe.Subscription.retrieve, subscription_data['stripe_subscription_id'])
             subscription_data['status'] = remote.get('status')
             subscription_data['current_period_end'] = remote.get('current_period_end')
     except Exception:
@@ -278,20 +530,22 @@ def api_cancel_subscription():
         return jsonify({'ok': False, 'error': 'No subscription found'}), 400
     # If Stripe is configured and subscription id exists, cancel at Stripe
     try:
-        if stripe and os.getenv('STRIPE_SECRET_KEY') and sub['stripe_subscription_id']:
-            stripe.api_key = os.getenv('STRIPE_SECRET_KEY')
+        stripe = stripe_client()
+        if stripe and sub['stripe_subscription_id']:
             try:
-                stripe.Subscription.delete(sub['stripe_subscription_id'])
+                stripe_call('subscription.delete', stripe.Subscription.delete, sub['stripe_subscription_id'])
             except Exception as e:
                 # if deletion fails, fallback to marking canceled locally but report error
                 db.execute('UPDATE subscriptions SET status = ? WHERE id = ?', ('canceled', sub['id']))
                 db.execute('UPDATE users SET is_paid = 0 WHERE id = ?', (uid,))
                 db.commit()
+                invalidate_entitlements(uid)
                 return jsonify({'ok': False, 'error': f'stripe error: {e}'}), 502
         # mark canceled locally
         db.execute('UPDATE subscriptions SET status = ? WHERE id = ?', ('canceled', sub['id']))
         db.execute('UPDATE users SET is_paid = 0 WHERE id = ?', (uid,))
         db.commit()
+        invalidate_entitlements(uid)
         return jsonify({'ok': True})
     except Exception as e:
         return jsonify({'ok': False, 'error': str(e)}), 500
@@ -300,60 +554,151 @@ def api_cancel_subscription():
 @app.get("/api/content")
 def api_content():
     # return minimal metadata about content pack (version and flags)
-    cfg_path = os.path.join(os.path.dirname(__file__), "static", "content", "config.json")
-    flags_path = os.path.join(os.path.dirname(__file__), "static", "content", "flags.json")
-    out: dict = {"version": "local", "flags": {}}
-    try:
-        with open(cfg_path, "r", encoding="utf-8") as f:
-            cfg = json.load(f)
-            out["version"] = cfg.get("version", out["version"])
-    except Exception:
-        pass
-    try:
-        with open(flags_path, "r", encoding="utf-8") as f:
-            flags = json.load(f)
-            out["flags"] = flags
-    except Exception:
-        out["flags"] = {}
-    return jsonify(out)
+    return jsonify({"version": content.version(), "flags": content.flags()})
 
 
 def load_flags():
-    flags_path = os.path.join(os.path.dirname(__file__), "static", "content", "flags.json")
-    try:
-        with open(flags_path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return {}
+    return content.flags()
+
 
+def reconcile_batch_size():
+    return max(1, int(os.getenv('RECONCILE_BATCH', '500')))
 
-def perform_reconcile(db=None):
+
+def apply_reconcile(conn, batch):
+    """Writer op: store the Stripe state for a batch of reconciled subscriptions."""
+    for r in batch:
+        if r['error'] is None:
+            conn.execute('UPDATE subscriptions SET status = ?, current_period_end = ? WHERE id = ?', (r['status'], r['current_period_end'], r['id']))
+            is_paid = 1 if r['status'] in ('active', 'trialing') else 0
+            conn.execute('UPDATE users SET is_paid = ? WHERE id = ?', (is_paid, r['user_id']))
+
+
+def reconcile_subscriptions(db, flush, on_progress=None):
+    """Check every subscription that has a Stripe id against Stripe.
+
+    Results go to `flush(batch)` every RECONCILE_BATCH subscriptions (and
+    once at the end); flush is expected to write them. Each result is a
+    dict with seq, id, user_id, stripe_subscription_id, status,
+    current_period_end, outcome ('unchanged', 'changed' or 'error') and
+    error. `on_progress(dict)` is called after each subscription with
+    processed, total, changed, errors and eta_seconds. Returns the final
+    counts.
+    """
+    stripe = stripe_client()
+    rows = db.execute('SELECT id, user_id, stripe_subscription_id, status FROM subscriptions WHERE stripe_subscription_id IS NOT NULL').fetchall()
+    size = reconcile_batch_size()
+    batch = []
+    counts = {'processed': 0, 'total': len(rows), 'changed': 0, 'errors': 0}
+    t0 = time.monotonic()
+    for n, r in enumerate(rows, 1):
+        sid = r['stripe_subscription_id']
+        res = {'seq': n, 'id': r['id'], 'user_id': r['user_id'], 'stripe_subscription_id': sid,
+               'status': None, 'current_period_end': None, 'outcome': 'unchanged', 'error': None}
+        try:
+            remote = stripe_call('subscription.retrieve', stripe.Subscription.retrieve, sid) if stripe else {}
+            res['status'] = remote.get('status') if remote else None
+            res['current_period_end'] = remote.get('current_period_end') if remote else None
+            if res['status'] != r['status']:
+                res['outcome'] = 'changed'
+                counts['changed'] += 1
+        except Exception as e:
+            res['outcome'], res['error'] = 'error', str(e)
+            counts['errors'] += 1
+        batch.append(res)
+        counts['processed'] = n
+        if on_progress:
+            elapsed = time.monotonic() - t0
+            on_progress(dict(counts, eta_seconds=round(elapsed / n * (len(rows) - n), 1)))
+        # Stripe calls stay outside the writer; each batch goes in as one operation
+        if len(batch) >= size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+    return counts
+
+
+def perform_reconcile(db=None, on_progress=None):
     """Perform reconciliation logic and return results list."""
-    close_here = False
     if db is None:
         db = get_db()
-        close_here = False
-    rows = db.execute('SELECT id, user_id, stripe_subscription_id FROM subscriptions WHERE stripe_subscription_id IS NOT NULL').fetchall()
     results = []
-    for r in rows:
-        sid = r['stripe_subscription_id']
-        try:
-            remote = stripe.Subscription.retrieve(sid) if stripe else {}
-            status = remote.get('status') if remote else None
-            cpe = remote.get('current_period_end') if remote else None
-            db.execute('UPDATE subscriptions SET status = ?, current_period_end = ? WHERE id = ?', (status, cpe, r['id']))
-            is_paid = 1 if status in ('active', 'trialing') else 0
-            db.execute('UPDATE users SET is_paid = ? WHERE id = ?', (is_paid, r['user_id']))
-            results.append({'id': r['id'], 'stripe_subscription_id': sid, 'status': status})
-        except Exception as e:
-            results.append({'id': r['id'], 'stripe_subscription_id': sid, 'error': str(e)})
-    db.commit()
+
+    def flush(batch):
+        write(lambda conn: apply_reconcile(conn, batch), durability=dbwriter.FULL)
+        for r in batch:
+            invalidate_entitlements(r['user_id'])
+            out = {'id': r['id'], 'stripe_subscription_id': r['stripe_subscription_id']}
+            if r['error'] is None:
+                out['status'] = r['status']
+            else:
+                out['error'] = r['error']
+            results.append(out)
+
+    reconcile_subscriptions(db, flush, on_progress)
     return results
 
 
+def run_reconcile_job(job_id, db):
+    """Run a reconcile job: per-subscription rows go to reconcile_results, counts to the job row."""
+    last = {'processed': 0, 'total': 0, 'changed': 0, 'errors': 0}
+
+    def on_progress(p):
+        last.update(p)
+        progress.publish(job_id, dict(p, status='running'))
+
+    stored = {'processed': 0, 'changed': 0, 'errors': 0}
+
+    def flush(batch):
+        stored['processed'] = batch[-1]['seq']
+        stored['changed'] += sum(r['outcome'] == 'changed' for r in batch)
+        stored['errors'] += sum(r['outcome'] == 'error' for r in batch)
+        total = last['total']
+
+        def op(conn):
+            apply_reconcile(conn, batch)
+            conn.executemany(
+                'INSERT INTO reconcile_results (job_id, seq, subscription_id, stripe_subscription_id, status, current_period_end, outcome, error) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                [(job_id, r['seq'], r['id'], r['stripe_subscription_id'], r['status'], r['current_period_end'], r['outcome'], r['error'])
+                 for r in batch])
+            conn.execute('UPDATE reconcile_jobs SET total = ?, processed = ?, changed = ?, errors = ? WHERE id = ?',
+                         (total, stored['processed'], stored['changed'], stored['errors'], job_id))
+        write(op, durability=dbwriter.FULL)
+        for r in batch:
+            invalidate_entitlements(r['user_id'])
+
+    try:
+        last.update(reconcile_subscriptions(db, flush, on_progress))
+        status, error = 'finished', None
+    except Exception as e:
+        status, error = 'failed', str(e)
+    finished = datetime.now(timezone.utc).isoformat()
+    try:
+        write('UPDATE reconcile_jobs SET status = ?, result = ?, total = ?, processed = ?, changed = ?, errors = ?, finished_at = ? WHERE id = ?',
+              (status, error, last['total'], last['processed'], last['changed'], last['errors'], finished, job_id))
+    finally:
+        progress.publish(job_id, dict(last, status=status, eta_seconds=0), done=True)
+
+
+def run_reconcile_job_in_thread(job_id, db_path):
+    # the request's connection is closed (and thread-bound) by the time this runs
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        run_reconcile_job(job_id, conn)
+    finally:
+        conn.close()
+
+
+RECONCILE_JOB_FIELDS = ('id', 'status', 'total', 'processed', 'changed', 'errors', 'started_at', 'finished_at', 'created_at')
+RECONCILE_OUTCOMES = ('unchanged', 'changed', 'error')
+
+
 @app.post('/api/reconcile-job')
 def api_reconcile_job():
-    """Create a reconcile job. If wait=1 is passed, run synchronously and return results."""
+    """Create a reconcile job. If wait=1 is passed, run synchronously and return the job summary."""
     admin_emails = os.getenv('ADMIN_EMAILS', '')
     if admin_emails and not is_admin():
         return jsonify({'ok': False, 'error': 'Admin required'}), 403
@@ -361,7 +706,7 @@ def api_reconcile_job():
         token = request.headers.get('X-CSRF-Token')
         if not token or token != session.get('admin_csrf'):
             return jsonify({'ok': False, 'error': 'CSRF token required'}), 403
-    if stripe is None or not os.getenv('STRIPE_SECRET_KEY'):
+    if stripe_client() is None:
         return jsonify({'ok': False, 'error': 'Stripe not configured'}), 501
 
     wait = request.args.get('wait') == '1'
@@ -371,62 +716,198 @@ def api_reconcile_job():
     db.execute('INSERT INTO reconcile_jobs (id, status, started_at) VALUES (?, ?, ?)', (job_id, 'running', started))
     db.commit()
 
-    def run_job(jid):
-        try:
-            results = perform_reconcile(db=db)
-            finished = datetime.now(timezone.utc).isoformat()
-            db.execute('UPDATE reconcile_jobs SET status = ?, result = ?, finished_at = ? WHERE id = ?', ('finished', json.dumps(results), finished, jid))
-            db.commit()
-        except Exception as e:
-            finished = datetime.now(timezone.utc).isoformat()
-            db.execute('UPDATE reconcile_jobs SET status = ?, result = ?, finished_at = ? WHERE id = ?', ('failed', str(e), finished, jid))
-            db.commit()
+    progress.publish(job_id, {'status': 'running', 'processed': 0, 'total': None, 'changed': 0, 'errors': 0, 'eta_seconds': None})
 
     if wait:
-        run_job(job_id)
+        run_reconcile_job(job_id, db)
         row = db.execute('SELECT * FROM reconcile_jobs WHERE id = ?', (job_id,)).fetchone()
-        return jsonify({'ok': True, 'job': dict(row)})
+        return jsonify({'ok': True, 'job': reconcile_job_summary(row)})
     else:
-        t = threading.Thread(target=run_job, args=(job_id,))
+        t = threading.Thread(target=run_reconcile_job_in_thread, args=(job_id, DB_PATH))
         t.daemon = True
         t.start()
         return jsonify({'ok': True, 'job_id': job_id})
 
 
+def reconcile_job_summary(row):
+    job = {k: row[k] for k in RECONCILE_JOB_FIELDS}
+    if row['status'] == 'failed':
+        job['error'] = row['result']
+    elif row['result']:
+        # jobs from before reconcile_results kept the whole list here
+        job['result'] = row['result']
+    return job
+
+
 @app.get('/api/reconcile-jobs/<job_id>')
 def api_reconcile_job_get(job_id):
-    if not is_admin() and os.getenv('ADMIN_EMAILS', ''):
-        return jsonify({'ok': False, 'error': 'Admin required'}), 403
+    """Job summary plus one page of per-subscription results.
+
+    Query: outcome (unchanged|changed|error), status (Stripe status),
+    limit (default 100, max 1000), after (the previous page's next_after).
+    """
+    denied = require_admin()
+    if denied:
+        return denied
+    outcome = request.args.get('outcome')
+    if outcome and outcome not in RECONCILE_OUTCOMES:
+        return jsonify({'ok': False, 'error': 'outcome must be one of ' + ', '.join(RECONCILE_OUTCOMES)}), 400
+    try:
+        limit = min(max(int(request.args.get('limit', 100)), 1), 1000)
+        after = int(request.args.get('after', 0))
+    except ValueError:
+        return jsonify({'ok': False, 'error': 'limit and after must be integers'}), 400
     db = get_db()
     row = db.execute('SELECT * FROM reconcile_jobs WHERE id = ?', (job_id,)).fetchone()
     if not row:
         return jsonify({'ok': False, 'error': 'Not found'}), 404
-    return jsonify({'ok': True, 'job': dict(row)})
 
+    sql = 'SELECT seq, subscription_id, stripe_subscription_id, status, current_period_end, outcome, error FROM reconcile_results WHERE job_id = ?'
+    params = [job_id]
+    if outcome:
+        sql += ' AND outcome = ?'
+        params.append(outcome)
+    status = request.args.get('status')
+    if status:
+        sql += ' AND status = ?'
+        params.append(status)
+    # keyset pagination: seq is the job's row order, so the next page starts after the last seq seen
+    sql += ' AND seq > ? ORDER BY seq LIMIT ?'
+    params += [after, limit + 1]
+    results = [dict(r) for r in db.execute(sql, params).fetchall()]
+    next_after = None
+    if len(results) > limit:
+        results.pop()
+        next_after = results[-1]['seq']
+    return jsonify({'ok': True, 'job': reconcile_job_summary(row), 'results': results, 'next_after': next_after})
+
+
+def sse(event, data, event_id=None):
+    msg = f'event: {event}\ndata: {json.dumps(data)}\n\n'
+    return f'id: {event_id}\n{msg}' if event_id is not None else msg
+
+
+@app.get('/api/reconcile-jobs/<job_id>/events')
+def api_reconcile_job_events(job_id):
+    """Stream a reconcile job's progress as Server-Sent Events.
+
+    `progress` events carry processed/total/changed/errors/eta_seconds; a
+    final `done` event carries the job status, after which the stream ends.
+    Progress comes from the in-process runner, not the database. A job not
+    running in this process gets a single `done` event from its stored row.
+    """
+    denied = require_admin()
+    if denied:
+        return denied
+    topic = progress.topic(job_id)
+    if topic is None:
+        row = get_db().execute('SELECT status, finished_at FROM reconcile_jobs WHERE id = ?', (job_id,)).fetchone()
+        if not row:
+            return jsonify({'ok': False, 'error': 'Not found'}), 404
+        return Response(sse('done', {'status': row['status'], 'finished_at': row['finished_at']}),
+                        mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+    if not progress.acquire_listener():
+        return rejected_response(admission.Rejected('Too many progress listeners', status=503, retry_after=5))
+
+    heartbeat = float(os.getenv('SSE_HEARTBEAT_SECONDS', '15'))
+    max_age = float(os.getenv('SSE_MAX_SECONDS', '300'))
+
+    def stream():
+        # clients reconnect after max_age; the first event is always the current state
+        yield 'retry: 2000\n\n'
+        seen = 0
+        sent_at = 0.0
+        deadline = time.monotonic() + max_age
+        while time.monotonic() < deadline:
+            version, state, done = topic.wait(seen, min(heartbeat, max(deadline - time.monotonic(), 0)))
+            if done:
+                yield sse('done', state, version)
+                return
+            if version > seen:
+                seen = version
+                yield sse('progress', state, version)
+                # publishes that skip the wake-up still bump the version; pace the stream
+                pause = sent_at + progress.interval() - time.monotonic()
+                sent_at = time.monotonic()
+                if pause > 0:
+                    time.sleep(pause)
+            else:
+                yield ': keep-alive\n\n'
+
+    resp = Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # runs on disconnect too, even if the generator never started
+    resp.call_on_close(progress.release_listener)
+    return resp
 
-def is_admin():
-    """Simple admin check based on ADMIN_EMAILS env var (comma-separated)."""
-    uid = session.get('user_id')
+
+# Entitlements (email, is_paid, is_admin) are read on hot paths: gating, the admin
+# check and current_user. They are memoised per request on `g` and kept across
+# requests for ENTITLEMENT_CACHE_TTL seconds; every write path that changes
+# is_paid/is_admin calls invalidate_entitlements().
+entitlement_cache = TTLCache(lambda: float(os.getenv('ENTITLEMENT_CACHE_TTL', '30')))
+
+
+def get_entitlements(uid):
+    """Return {'id', 'email', 'is_paid', 'is_admin'} for a user, or None if unknown."""
     if not uid:
+        return None
+    memo = g.setdefault('entitlements', {})
+    if uid in memo:
+        return memo[uid]
+    ent = entitlement_cache.get(uid)
+    if ent is None:
+        row = get_db().execute('SELECT id, email, is_paid, is_admin FROM users WHERE id = ?', (uid,)).fetchone()
+        if row:
+            ent = {'id': row['id'], 'email': row['email'], 'is_paid': bool(row['is_paid']), 'is_admin': bool(row['is_admin'])}
+            entitlement_cache.set(uid, ent)
+    memo[uid] = ent
+    return ent
+
+
+def invalidate_entitlements(uid=None):
+    """Drop cached entitlements for one user, or for everyone when uid is None."""
+    if uid is None:
+        entitlement_cache.clear()
+    else:
+        entitlement_cache.pop(uid)
+    memo = g.get('entitlements') if has_app_context() else None
+    if memo:
+        if uid is None:
+            memo.clear()
+        else:
+            memo.pop(uid, None)
+
+
+def is_admin():
+    """Admin check: the users.is_admin flag, or membership of ADMIN_EMAILS (comma-separated)."""
+    ent = get_entitlements(session.get('user_id'))
+    if not ent:
         return False
-    db = get_db()
-    # select is_admin flag if present
-    row = db.execute('SELECT email, is_admin FROM users WHERE id = ?', (uid,)).fetchone()
-    if not row:
-        return False
-    # Prefer explicit is_admin column if present
-    try:
-        # sqlite3.Row supports mapping access; treat truthy values as admin
-        if 'is_admin' in row.keys() and row.get('is_admin'):
-            return True
-    except Exception:
-        pass
+    if ent['is_admin']:
+        return True
     # Fallback to ADMIN_EMAILS env var if configured
     admin_emails = os.getenv('ADMIN_EMAILS', '')
     if not admin_emails:
         return False
     allowed = [e.strip().lower() for e in admin_emails.split(',') if e.strip()]
-    return row['email'].lower() in allowed
+    return (ent['email'] or '').lower() in allowed
+
+
+def require_admin(csrf=False):
+    """403 response unless the caller is an admin (and, with csrf=True, sent the session's X-CSRF-Token); else None.
+
+    Unlike the older reconcile endpoints this does not open up when ADMIN_EMAILS is unset:
+    these endpoints export user data or run maintenance.
+    """
+    if not is_admin():
+        return jsonify({'ok': False, 'error': 'Admin required'}), 403
+    if csrf:
+        token = request.headers.get('X-CSRF-Token') or ''
+        expected = session.get('admin_csrf') or ''
+        if not token or not hmac.compare_digest(token, expected):
+            return jsonify({'ok': False, 'error': 'CSRF token required'}), 403
+    return None
 
 
 ### DB helpers
@@ -443,10 +924,15 @@ def set_user_paid(uid: str, paid: bool = True):
     try:
         db.execute('UPDATE users SET is_paid = ? WHERE id = ?', (1 if paid else 0, uid))
         db.commit()
+        invalidate_entitlements(uid)
     except Exception:
         pass
 
 
+def hashing_busy_response():
+    return jsonify({'ok': False, 'error': 'Too many sign-in attempts right now, please retry'}), 503, {'Retry-After': '1'}
+
+
 @app.post('/api/signup')
 def api_signup():
     data = request.get_json(force=True)
@@ -458,7 +944,10 @@ def api_signup():
         return jsonify({'ok': False, 'error': 'Password too short (min 6 chars)'}), 400
     db = get_db()
     uid = str(uuid.uuid4())
-    pw = generate_password_hash(password, method='pbkdf2:sha256')
+    try:
+        pw = passwords.hash_password(password)
+    except passwords.HashingBusy:
+        return hashing_busy_response()
     try:
         db.execute("INSERT INTO users (id, email, password_hash) VALUES (?, ?, ?)", (uid, email, pw))
         db.commit()
@@ -475,8 +964,19 @@ def api_login():
     password = data.get('password') or ''
     db = get_db()
     row = db.execute('SELECT * FROM users WHERE email = ?', (email,)).fetchone()
-    if not row or not check_password_hash(row['password_hash'] or '', password):
+    try:
+        valid = bool(row) and passwords.verify_password(row['password_hash'] or '', password)
+    except passwords.HashingBusy:
+        return hashing_busy_response()
+    if not valid:
         return jsonify({'ok': False, 'error': 'Invalid credentials'}), 401
+    # transparently upgrade hashes made with an older method or cost (best-effort)
+    if passwords.needs_rehash(row['password_hash']):
+        try:
+            db.execute('UPDATE users SET password_hash = ? WHERE id = ?', (passwords.hash_password(password), row['id']))
+            db.commit()
+        except Exception:
+            pass
     session['user_id'] = row['id']
     return jsonify({'ok': True, 'id': row['id'], 'email': row['email'], 'is_paid': bool(row['is_paid'])})
 
@@ -489,20 +989,36 @@ def api_logout():
 
 @app.get('/api/current_user')
 def api_current_user():
-    uid = session.get('user_id')
-    if not uid:
-        return jsonify({})
-    db = get_db()
-    row = db.execute('SELECT id, email, is_paid FROM users WHERE id = ?', (uid,)).fetchone()
-    if not row:
+    ent = get_entitlements(session.get('user_id'))
+    if not ent:
         return jsonify({})
-    return jsonify({'id': row['id'], 'email': row['email'], 'is_paid': bool(row['is_paid'])})
+    return jsonify({'id': ent['id'], 'email': ent['email'], 'is_paid': ent['is_paid']})
+
+
+# Everything the front end needs before first interaction, in one response.
+# Pieces come from the content-pack and entitlement caches; the ETag lets a
+# returning browser revalidate with a 304 instead of re-downloading the config.
+@app.get('/api/bootstrap')
+def api_bootstrap():
+    ent = get_entitlements(session.get('user_id'))
+    out = {
+        'version': content.version(),
+        'flags': content.flags(),
+        'config': content.config(),
+        'profile': load_profile(session.get('profile_id')) or {},
+        'current_user': {'id': ent['id'], 'email': ent['email'], 'is_paid': ent['is_paid']} if ent else {},
+    }
+    resp = jsonify(out)
+    resp.add_etag()
+    resp.headers['Cache-Control'] = 'private, no-cache'
+    return resp.make_conditional(request)
 
 
 @app.post('/api/create-checkout-session')
 def api_create_checkout():
     # creates a Stripe Checkout Session for the current user; requires STRIPE_SECRET_KEY
-    if stripe is None or not os.getenv('STRIPE_SECRET_KEY'):
+    stripe = stripe_client()
+    if stripe is None:
         return jsonify({'ok': False, 'error': 'Stripe not configured. Set STRIPE_SECRET_KEY in env for test mode.'}), 501
     uid = session.get('user_id')
     if not uid:
@@ -511,10 +1027,10 @@ def api_create_checkout():
     price_id = data.get('price_id') or os.getenv('STRIPE_TEST_PRICE_ID')
     if not price_id:
         return jsonify({'ok': False, 'error': 'No price configured. Set STRIPE_TEST_PRICE_ID or pass price_id.'}), 400
-    stripe.api_key = os.getenv('STRIPE_SECRET_KEY')
     try:
         # in test mode create a session and return the URL
-        sess = stripe.checkout.Session.create(
+        sess = stripe_call(
+            'checkout.session.create', stripe.checkout.Session.create,
             mode='subscription',
             payment_method_types=['card'],
             line_items=[{'price': price_id, 'quantity': 1}],
@@ -527,13 +1043,18 @@ def api_create_checkout():
         return jsonify({'ok': False, 'error': str(e)}), 500
 
 
+def webhook_write_failed(typ):
+    app.logger.exception('stripe webhook %s: write failed; asking Stripe to retry', typ)
+    return jsonify({'ok': False, 'error': 'Could not record event; retry later'}), 500
+
+
 @app.post('/api/stripe-webhook')
 def api_stripe_webhook():
     payload = request.data
     sig_header = request.headers.get('Stripe-Signature')
     secret = os.getenv('STRIPE_WEBHOOK_SECRET')
     event = None
-    db = get_db()
+    stripe = load_stripe() if secret else None
     if secret and stripe:
         try:
             event = stripe.Webhook.construct_event(payload, sig_header, secret)
@@ -550,22 +1071,29 @@ def api_stripe_webhook():
     typ = event.get('type')
     data = event.get('data', {}).get('object', {})
 
+    # Billing state goes through the writer with FULL durability: Stripe will not resend an event we acknowledged,
+    # so a failed write answers 500 and Stripe retries. Handlers must stay safe to replay: subscriptions are keyed
+    # by the unique stripe_subscription_id, and the user updates set absolute values.
     # Handle checkout.session.completed: mark user paid and store subscription id
     if typ == 'checkout.session.completed':
         client_ref = data.get('client_reference_id')
         customer = data.get('customer')
         subscription_id = data.get('subscription')
         if client_ref:
-            try:
-                db.execute('UPDATE users SET stripe_customer_id = ?, is_paid = 1 WHERE id = ?', (customer, client_ref))
+            def mark_paid(conn):
+                conn.execute('UPDATE users SET stripe_customer_id = ?, is_paid = 1 WHERE id = ?', (customer, client_ref))
                 # create subscription row if subscription_id present
                 if subscription_id:
                     sub_id = str(uuid.uuid4())
-                    db.execute('INSERT OR REPLACE INTO subscriptions (id, user_id, stripe_subscription_id, status) VALUES (?, ?, ?, ?)',
-                               (sub_id, client_ref, subscription_id, 'active'))
-                db.commit()
+                    # a redelivered event leaves the row (and any later status change) as it is
+                    conn.execute('INSERT INTO subscriptions (id, user_id, stripe_subscription_id, status) VALUES (?, ?, ?, ?) '
+                                 'ON CONFLICT(stripe_subscription_id) DO UPDATE SET user_id = excluded.user_id',
+                                 (sub_id, client_ref, subscription_id, 'active'))
+            try:
+                write(mark_paid, durability=dbwriter.FULL)
             except Exception:
-                pass
+                return webhook_write_failed(typ)
+            invalidate_entitlements(client_ref)
 
     # Handle subscription lifecycle events to update status
     if typ in ('customer.subscription.created', 'customer.subscription.updated', 'customer.subscription.deleted'):
@@ -573,44 +1101,54 @@ def api_stripe_webhook():
         stripe_sub_id = sub.get('id')
         status = sub.get('status')
         customer = sub.get('customer')
-        # try to find user by stripe_customer_id
-        user_row = db.execute('SELECT id FROM users WHERE stripe_customer_id = ?', (customer,)).fetchone()
-        if user_row:
+
+        def upsert_subscription(conn):
+            # try to find user by stripe_customer_id
+            user_row = conn.execute('SELECT id FROM users WHERE stripe_customer_id = ?', (customer,)).fetchone()
+            if not user_row:
+                return None
             uid = user_row['id']
-            # upsert subscription
-            try:
-                # find existing
-                existing = db.execute('SELECT id FROM subscriptions WHERE stripe_subscription_id = ?', (stripe_sub_id,)).fetchone()
-                if existing:
-                    db.execute('UPDATE subscriptions SET status = ?, current_period_end = ? WHERE id = ?', (status, sub.get('current_period_end'), existing['id']))
-                else:
-                    db.execute('INSERT INTO subscriptions (id, user_id, stripe_subscription_id, status, current_period_end) VALUES (?, ?, ?, ?, ?)',
-                               (str(uuid.uuid4()), uid, stripe_sub_id, status, sub.get('current_period_end')))
-                # set user paid flag based on status
-                is_paid = 1 if status in ('active', 'trialing') else 0
-                db.execute('UPDATE users SET is_paid = ? WHERE id = ?', (is_paid, uid))
-                db.commit()
-            except Exception:
-                pass
+            existing = conn.execute('SELECT id FROM subscriptions WHERE stripe_subscription_id = ?', (stripe_sub_id,)).fetchone()
+            if existing:
+                conn.execute('UPDATE subscriptions SET status = ?, current_period_end = ? WHERE id = ?', (status, sub.get('current_period_end'), existing['id']))
+            else:
+                conn.execute('INSERT INTO subscriptions (id, user_id, stripe_subscription_id, status, current_period_end) VALUES (?, ?, ?, ?, ?)',
+                             (str(uuid.uuid4()), uid, stripe_sub_id, status, sub.get('current_period_end')))
+            # set user paid flag based on status
+            is_paid = 1 if status in ('active', 'trialing') else 0
+            conn.execute('UPDATE users SET is_paid = ? WHERE id = ?', (is_paid, uid))
+            return uid
+        try:
+            uid = write(upsert_subscription, durability=dbwriter.FULL)
+        except Exception:
+            return webhook_write_failed(typ)
+        if uid:
+            invalidate_entitlements(uid)
 
     # invoice payment succeeded -> ensure user is marked paid
     if typ == 'invoice.payment_succeeded':
-        inv = data
-        customer = inv.get('customer')
-        user_row = db.execute('SELECT id FROM users WHERE stripe_customer_id = ?', (customer,)).fetchone()
-        if user_row:
-            try:
-                db.execute('UPDATE users SET is_paid = 1 WHERE id = ?', (user_row['id'],))
-                db.commit()
-            except Exception:
-                pass
+        customer = data.get('customer')
+
+        def mark_invoice_paid(conn):
+            user_row = conn.execute('SELECT id FROM users WHERE stripe_customer_id = ?', (customer,)).fetchone()
+            if user_row:
+                conn.execute('UPDATE users SET is_paid = 1 WHERE id = ?', (user_row['id'],))
+                return user_row['id']
+            return None
+        try:
+            uid = write(mark_invoice_paid, durability=dbwriter.FULL)
+        except Exception:
+            return webhook_write_failed(typ)
+        if uid:
+            invalidate_entitlements(uid)
 
     return jsonify({'ok': True})
 
 
 @app.post('/api/create-portal-session')
 def api_create_portal():
-    if stripe is None or not os.getenv('STRIPE_SECRET_KEY'):
+    stripe = stripe_client()
+    if stripe is None:
         return jsonify({'ok': False, 'error': 'Stripe not configured'}), 501
     uid = session.get('user_id')
     if not uid:
@@ -619,9 +1157,8 @@ def api_create_portal():
     user = db.execute('SELECT stripe_customer_id FROM users WHERE id = ?', (uid,)).fetchone()
     if not user or not user['stripe_customer_id']:
         return jsonify({'ok': False, 'error': 'No stripe customer for user'}), 400
-    stripe.api_key = os.getenv('STRIPE_SECRET_KEY')
     try:
-        sess = stripe.billing_portal.Session.create(customer=user['stripe_customer_id'], return_url=os.getenv('STRIPE_MANAGE_URL', 'http://localhost:5001/'))
+        sess = stripe_call('billing_portal.session.create', stripe.billing_portal.Session.create, customer=user['stripe_customer_id'], return_url=os.getenv('STRIPE_MANAGE_URL', 'http://localhost:5001/'))
         return jsonify({'ok': True, 'url': sess.url})
     except Exception as e:
         return jsonify({'ok': False, 'error': str(e)}), 500
@@ -642,7 +1179,8 @@ def api_create_subscription():
     Expects JSON: { price_id, payment_method }
     Returns: { ok: True, client_secret?, subscription_id, status }
     """
-    if stripe is None or not os.getenv('STRIPE_SECRET_KEY'):
+    stripe = stripe_client()
+    if stripe is None:
         return jsonify({'ok': False, 'error': 'Stripe not configured'}), 501
     uid = session.get('user_id')
     if not uid:
@@ -655,14 +1193,13 @@ def api_create_subscription():
     if not payment_method:
         return jsonify({'ok': False, 'error': 'payment_method required'}), 400
 
-    stripe.api_key = os.getenv('STRIPE_SECRET_KEY')
     db = get_db()
     user = db.execute('SELECT id, email, stripe_customer_id FROM users WHERE id = ?', (uid,)).fetchone()
     try:
         customer_id = user.get('stripe_customer_id') if user else None
         if not customer_id:
             # create customer
-            cust = stripe.Customer.create(email=user['email'] if user else None)
+            cust = stripe_call('customer.create', stripe.Customer.create, email=user['email'] if user else None)
             customer_id = cust['id']
             try:
                 db.execute('UPDATE users SET stripe_customer_id = ? WHERE id = ?', (customer_id, uid))
@@ -672,18 +1209,19 @@ def api_create_subscription():
 
         # attach payment method to customer
         try:
-            stripe.PaymentMethod.attach(payment_method, customer=customer_id)
+            stripe_call('payment_method.attach', stripe.PaymentMethod.attach, payment_method, customer=customer_id)
         except Exception:
             # ignore if already attached or other recoverable error
             pass
         # set as default payment method for invoices
         try:
-            stripe.Customer.modify(customer_id, invoice_settings={'default_payment_method': payment_method})
+            stripe_call('customer.modify', stripe.Customer.modify, customer_id, invoice_settings={'default_payment_method': payment_method})
         except Exception:
             pass
 
         # create subscription in incomplete state so we can handle SCA if needed
-        sub = stripe.Subscription.create(
+        sub = stripe_call(
+            'subscription.create', stripe.Subscription.create,
             customer=customer_id,
             items=[{'price': price_id}],
             payment_behavior='default_incomplete',
@@ -724,16 +1262,16 @@ def api_reconcile_subscriptions():
         token = request.headers.get('X-CSRF-Token')
         if not token or token != session.get('admin_csrf'):
             return jsonify({'ok': False, 'error': 'CSRF token required'}), 403
-    if stripe is None or not os.getenv('STRIPE_SECRET_KEY'):
+    stripe = stripe_client()
+    if stripe is None:
         return jsonify({'ok': False, 'error': 'Stripe not configured'}), 501
-    stripe.api_key = os.getenv('STRIPE_SECRET_KEY')
     db = get_db()
     rows = db.execute('SELECT id, user_id, stripe_subscription_id FROM subscriptions WHERE stripe_subscription_id IS NOT NULL').fetchall()
     results = []
     for r in rows:
         sid = r['stripe_subscription_id']
         try:
-            remote = stripe.Subscription.retrieve(sid)
+            remote = stripe_call('subscription.retrieve', stripe.Subscription.retrieve, sid)
             status = remote.get('status')
             cpe = remote.get('current_period_end')
             # upsert the values into subscriptions table
@@ -745,6 +1283,8 @@ def api_reconcile_subscriptions():
         except Exception as e:
             results.append({'id': r['id'], 'stripe_subscription_id': sid, 'error': str(e)})
     db.commit()
+    for r in rows:
+        invalidate_entitlements(r['user_id'])
     return jsonify({'ok': True, 'results': results})
 
 
@@ -753,9 +1293,207 @@ def admin_page():
     # basic admin interface to trigger reconciliation
     if not is_admin():
         return render_template('admin.html', allowed=False)
+    if 'admin_csrf' not in session:
+        session['admin_csrf'] = secrets.token_urlsafe(32)
     return render_template('admin.html', allowed=True)
 
 
+@app.get('/api/admin/stats')
+def api_admin_stats():
+    """Dashboard counts from the trigger-maintained admin_counters table."""
+    denied = require_admin()
+    if denied:
+        return denied
+    return jsonify({'ok': True, 'stats': counters.summary(get_db())})
+
+
+@app.post('/api/admin/stats/check')
+def api_admin_stats_check():
+    """Compare the counters with the tables; ?repair=1 rebuilds them when they differ."""
+    denied = require_admin(csrf=True)
+    if denied:
+        return denied
+    mismatches = counters.check(get_db())
+    repaired = False
+    if mismatches and request.args.get('repair') == '1':
+        write(counters.rebuild)
+        repaired = True
+    return jsonify({'ok': True, 'consistent': not mismatches, 'mismatches': mismatches, 'repaired': repaired})
+
+
+@app.post('/api/admin/maintenance')
+def api_admin_maintenance():
+    """Run database maintenance now (?budget=seconds) and return what it reclaimed."""
+    denied = require_admin(csrf=True)
+    if denied:
+        return denied
+    try:
+        budget = min(float(request.args['budget']), 60.0) if 'budget' in request.args else None
+    except ValueError:
+        return jsonify({'ok': False, 'error': 'budget must be a number'}), 400
+    return jsonify({'ok': True, 'report': maintenance.run(DB_PATH, budget=budget, writer=db_writer())})
+
+
+def encode_cursor(*values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """The values packed by encode_cursor, or None for a missing/garbled cursor."""
+    if not token:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except ValueError:
+        return None
+    return values if isinstance(values, list) else None
+
+
+def page_limit():
+    try:
+        return min(max(int(request.args.get('limit', 50)), 1), 200)
+    except ValueError:
+        return None
+
+
+@app.get('/api/admin/users')
+def api_admin_users():
+    """Users (newest first) with their latest subscription, one keyset page at a time.
+
+    Filters: is_paid=0|1, status=<subscription status> (or 'none'),
+    email=<prefix>. With an email prefix the page is ordered by email
+    instead of signup time, so the unique email index serves it. Pass the
+    previous response's next_after as `after` for the next page.
+    """
+    denied = require_admin()
+    if denied:
+        return denied
+    limit = page_limit()
+    if limit is None:
+        return jsonify({'ok': False, 'error': 'limit must be an integer'}), 400
+    where, params = [], []
+    is_paid = request.args.get('is_paid')
+    if is_paid is not None:
+        if is_paid not in ('0', '1'):
+            return jsonify({'ok': False, 'error': 'is_paid must be 0 or 1'}), 400
+        where.append('u.is_paid = ?')
+        params.append(int(is_paid))
+    status = request.args.get('status')
+    if status == 'none':
+        where.append('u.subscription_status IS NULL')
+    elif status:
+        where.append('u.subscription_status = ?')
+        params.append(status)
+    prefix = (request.args.get('email') or '').strip().lower()
+    after = decode_cursor(request.args.get('after'))
+    if prefix:
+        # a range rather than LIKE so the email index is used; emails are stored lowercased
+        where.append('u.email >= ? AND u.email < ?')
+        params += [prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)]
+        if after:
+            where.append('u.email > ?')
+            params.append(after[0])
+        order = 'u.email'
+    else:
+        if after and len(after) == 2:
+            where.append('(u.created_at, u.id) < (?, ?)')
+            params += after
+        order = 'u.created_at DESC, u.id DESC'
+    sql = (
+        'SELECT u.id, u.email, u.is_paid, u.is_admin, u.created_at, '
+        's.id AS sub_id, s.stripe_subscription_id, s.status AS sub_status, s.current_period_end '
+        'FROM users u LEFT JOIN subscriptions s ON s.rowid = (' + LATEST_SUBSCRIPTION.format(user='u.id') + ')'
+        + (' WHERE ' + ' AND '.join(where) if where else '')
+        + f' ORDER BY {order} LIMIT ?'
+    )
+    rows = get_db().execute(sql, params + [limit + 1]).fetchall()
+    users = []
+    for r in rows[:limit]:
+        sub = None
+        if r['sub_id']:
+            sub = {'id': r['sub_id'], 'stripe_subscription_id': r['stripe_subscription_id'],
+                   'status': r['sub_status'], 'current_period_end': r['current_period_end']}
+        users.append({'id': r['id'], 'email': r['email'], 'is_paid': bool(r['is_paid']), 'is_admin': bool(r['is_admin']),
+                      'created_at': r['created_at'], 'subscription': sub})
+    next_after = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_after = encode_cursor(last['email']) if prefix else encode_cursor(last['created_at'], last['id'])
+    return jsonify({'ok': True, 'users': users, 'next_after': next_after})
+
+
+PROFILE_SEGMENT_FILTERS = ('platform', 'keyword', 'goal', 'reel_style')
+
+
+@app.get('/api/admin/profiles')
+def api_admin_profiles():
+    """Profiles matching every given platform/keyword/goal/reel_style filter, paged by id with `after`."""
+    denied = require_admin()
+    if denied:
+        return denied
+    limit = page_limit()
+    if limit is None:
+        return jsonify({'ok': False, 'error': 'limit must be an integer'}), 400
+    where, params = profiles.segment_sql([(k, request.args[k]) for k in PROFILE_SEGMENT_FILTERS if request.args.get(k)])
+    after = request.args.get('after')
+    if after:
+        where.append('p.id > ?')
+        params.append(after)
+    rows = get_db().execute(
+        'SELECT p.id, p.industry, p.tone, p.company, p.reel_style, p.created_at FROM profiles p'
+        + (' WHERE ' + ' AND '.join(where) if where else '')
+        + ' ORDER BY p.id LIMIT ?', params + [limit + 1]).fetchall()
+    out = [dict(r) for r in rows[:limit]]
+    return jsonify({'ok': True, 'profiles': out, 'next_after': out[-1]['id'] if len(rows) > limit else None})
+
+
+@app.get('/api/admin/profile-segments')
+def api_admin_profile_segments():
+    """Profile counts per value of one field (platforms, brand_keywords, niche_keywords, goals or reel_style)."""
+    denied = require_admin()
+    if denied:
+        return denied
+    field = request.args.get('field', 'platforms')
+    db = get_db()
+    if field == 'reel_style':
+        rows = db.execute('SELECT reel_style AS value, COUNT(*) AS n FROM profiles WHERE reel_style IS NOT NULL '
+                          'GROUP BY reel_style ORDER BY n DESC').fetchall()
+    elif field in profiles.LIST_FIELDS:
+        rows = db.execute('SELECT value, COUNT(DISTINCT profile_id) AS n FROM profile_values WHERE field = ? '
+                          'GROUP BY value ORDER BY n DESC', (field,)).fetchall()
+    else:
+        return jsonify({'ok': False, 'error': 'field must be one of: ' + ', '.join(profiles.LIST_FIELDS + ('reel_style',))}), 400
+    return jsonify({'ok': True, 'field': field, 'segments': [{'value': r['value'], 'profiles': r['n']} for r in rows]})
+
+
+@app.get('/api/admin/subscriptions')
+def api_admin_subscriptions():
+    """Subscriptions (newest first) with their user's email; filter by status, page with `after`."""
+    denied = require_admin()
+    if denied:
+        return denied
+    limit = page_limit()
+    if limit is None:
+        return jsonify({'ok': False, 'error': 'limit must be an integer'}), 400
+    where, params = [], []
+    status = request.args.get('status')
+    if status:
+        where.append('s.status = ?')
+        params.append(status)
+    after = decode_cursor(request.args.get('after'))
+    if after and len(after) == 2:
+        where.append('(s.created_at, s.id) < (?, ?)')
+        params += after
+    rows = get_db().execute(
+        'SELECT s.id, s.user_id, u.email, s.stripe_subscription_id, s.status, s.current_period_end, s.created_at '
+        'FROM subscriptions s LEFT JOIN users u ON u.id = s.user_id'
+        + (' WHERE ' + ' AND '.join(where) if where else '')
+        + ' ORDER BY s.created_at DESC, s.id DESC LIMIT ?', params + [limit + 1]).fetchall()
+    subs = [dict(r) for r in rows[:limit]]
+    next_after = encode_cursor(subs[-1]['created_at'], subs[-1]['id']) if len(rows) > limit else None
+    return jsonify({'ok': True, 'subscriptions': subs, 'next_after': next_after})
+
+
 # Dev debug route to inspect session and current user (only in dev or when ALLOW_DEV_DEBUG=1)
 @app.get('/__debug__/session')
 def debug_session():
@@ -785,6 +1523,19 @@ def dev_list_routes():
     return jsonify({'ok': True, 'routes': rules})
 
 
+# Prometheus-style metrics. Open in dev; otherwise requires METRICS_TOKEN as a bearer token, or an admin session.
+@app.get('/__dev__/metrics')
+def dev_metrics():
+    allowed = os.getenv('FLASK_ENV') == 'development' or os.getenv('ALLOW_DEV_DEBUG') == '1'
+    token = os.getenv('METRICS_TOKEN')
+    if not allowed and token:
+        auth = request.headers.get('Authorization', '')
+        allowed = hmac.compare_digest(auth.encode(), f'Bearer {token}'.encode())
+    if not allowed and not is_admin():
+        return 'Not allowed', 403
+    return metrics.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+
 # Dev helper: simple ping
 @app.get('/__dev__/ping')
 def dev_ping():
@@ -793,6 +1544,26 @@ def dev_ping():
     return 'pong'
 
 
+# Dev-only render benchmark: /__dev__/bench/render scrolls a long calendar and reports frame times
+@app.get('/__dev__/bench/render')
+def dev_bench_render():
+    if os.getenv('FLASK_ENV') != 'development' and os.getenv('ALLOW_DEV_DEBUG') != '1':
+        return 'Not allowed', 403
+    return render_template('bench_render.html')
+
+
+@app.get('/__dev__/bench/calendar.json')
+def dev_bench_calendar():
+    if os.getenv('FLASK_ENV') != 'development' and os.getenv('ALLOW_DEV_DEBUG') != '1':
+        return jsonify({'ok': False, 'error': 'Not allowed'}), 403
+    days = max(1, min(int(request.args.get('days', 365)), 1000))
+    platforms = list(captions.current().platform_hints)[:max(1, int(request.args.get('platforms', 5)))]
+    posts = generate_posts(days=days, start_day=date.today(), industry='Fitness', tone='friendly',
+                           platforms=platforms, brand_keywords=['bench'], include_images=True,
+                           niche_keywords=['strength'], goals=['growth'])
+    return jsonify({'ok': True, 'count': len(posts), 'posts': posts})
+
+
 # Dev-only helper: create or update a user and sign them in (only in dev)
 @app.post('/__dev__/create_user')
 def dev_create_user():
@@ -808,13 +1579,17 @@ def dev_create_user():
     # if exists, update password and paid flag, else create
     row = db.execute('SELECT id FROM users WHERE email = ?', (email,)).fetchone()
     uid = row['id'] if row else str(uuid.uuid4())
-    pw_hash = generate_password_hash(password, method='pbkdf2:sha256')
+    try:
+        pw_hash = passwords.hash_password(password)
+    except passwords.HashingBusy:
+        return hashing_busy_response()
     try:
         if row:
             db.execute('UPDATE users SET password_hash = ?, is_paid = ? WHERE id = ?', (pw_hash, 1 if is_paid else 0, uid))
         else:
             db.execute('INSERT INTO users (id, email, password_hash, is_paid) VALUES (?, ?, ?, ?)', (uid, email, pw_hash, 1 if is_paid else 0))
         db.commit()
+        invalidate_entitlements(uid)
     except Exception as e:
         return jsonify({'ok': False, 'error': str(e)}), 500
     session['user_id'] = uid
@@ -860,7 +1635,10 @@ def api_confirm_password_reset():
     if row['expires_at'] and datetime.datetime.fromisoformat(row['expires_at']) < datetime.datetime.utcnow():
         return jsonify({'ok': False, 'error': 'Token expired'}), 400
     # update password
-    pw_hash = generate_password_hash(new_pw, method='pbkdf2:sha256')
+    try:
+        pw_hash = passwords.hash_password(new_pw)
+    except passwords.HashingBusy:
+        return hashing_busy_response()
     try:
         db.execute('UPDATE users SET password_hash = ? WHERE id = ?', (pw_hash, row['user_id']))
         db.execute('DELETE FROM password_reset_tokens WHERE token = ?', (token,))
@@ -870,6 +1648,45 @@ def api_confirm_password_reset():
     return jsonify({'ok': True})
 
 
+# Serialised profile responses, keyed by profile id. save_profile writes the new
+# text through, so a worker always serves its own writes without touching the
+# database; PROFILE_CACHE_TTL bounds how long another worker's copy can lag.
+profile_cache = TTLCache(lambda: float(os.getenv('PROFILE_CACHE_TTL', '30')))
+
+
+def profile_etag(text):
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def cached_profile(profile_id):
+    """(json text, etag) for the saved profile, from the cache or the database; None if there is none."""
+    if not profile_id:
+        return None
+    entry = profile_cache.get(profile_id)
+    if entry is None:
+        text = profiles.load(get_db(), profile_id)
+        if text is None:
+            return None
+        entry = (text, profile_etag(text))
+        profile_cache.set(profile_id, entry)
+    return entry
+
+
+PROFILE_UPSERT = """
+INSERT INTO profiles (id, industry, tone, platforms, brand_keywords, niche_keywords, goals, details, company, include_images)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(id) DO UPDATE SET
+    industry=excluded.industry,
+    tone=excluded.tone,
+    platforms=excluded.platforms,
+    brand_keywords=excluded.brand_keywords,
+    niche_keywords=excluded.niche_keywords,
+    goals=excluded.goals,
+    details=excluded.details,
+    company=excluded.company,
+    include_images=excluded.include_images
+"""
+
 
 @app.post("/api/profile")
 def save_profile():
@@ -904,106 +1721,437 @@ def save_profile():
         company,
         1 if data.get("include_images", True) else 0,
     )
-    db = get_db()
-    db.execute(
-        """INSERT INTO profiles (id, industry, tone, platforms, brand_keywords, niche_keywords, goals, details, company, include_images)
-           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-           ON CONFLICT(id) DO UPDATE SET
-              industry=excluded.industry,
-              tone=excluded.tone,
-              platforms=excluded.platforms,
-              brand_keywords=excluded.brand_keywords,
-              niche_keywords=excluded.niche_keywords,
-              goals=excluded.goals,
-              details=excluded.details,
-              company=excluded.company,
-              include_images=excluded.include_images
-        """,
-        row,
-    )
-    db.commit()
+
+    def upsert(conn):
+        conn.execute(PROFILE_UPSERT, row)
+        # read back in the same transaction so the cache gets exactly what a later GET would build
+        return profiles.load(conn, profile_id)
+
+    text = write(upsert)
+    profile_cache.set(profile_id, (text, profile_etag(text)))
     return jsonify({"ok": True, "profile_id": profile_id})
 
 
+def load_profile(profile_id):
+    """Return the saved profile as a plain dict, or None."""
+    entry = cached_profile(profile_id)
+    return json.loads(entry[0]) if entry else None
+
+
 @app.get("/api/profile")
 def get_profile():
-    profile_id = session.get("profile_id")
-    if not profile_id:
-        return jsonify({})
-    db = get_db()
-    row = db.execute("SELECT * FROM profiles WHERE id = ?", (profile_id,)).fetchone()
-    if not row:
-        return jsonify({})
-    # parse stored JSON fields
-    def parse_json_field(val, default=None):
+    entry = cached_profile(session.get("profile_id"))
+    if entry is None:
+        return Response('{}', mimetype='application/json')
+    resp = Response(entry[0], mimetype='application/json')
+    resp.set_etag(entry[1])
+    resp.headers['Cache-Control'] = 'private, no-cache'
+    return resp.make_conditional(request)
+
+
+def check_generation_access(days):
+    """Enforce the paid gate for longer calendars. Returns an error response, or None if allowed."""
+    flags = load_flags()
+    gate7 = bool(flags.get('gate7DayToPaid'))
+    if gate7 and days >= 7:
+        uid = session.get('user_id')
+        if not uid:
+            return jsonify({'ok': False, 'error': 'Authentication required for this feature'}), 401
+        ent = get_entitlements(uid)
+        if not ent or not ent['is_paid']:
+            return jsonify({'ok': False, 'error': 'Paid subscription required for this feature'}), 403
+    return None
+
+
+def client_ip():
+    return request.remote_addr or 'unknown'
+
+
+def generation_cost(total_days, window_days, platforms):
+    """Apply the hard ceilings without charging anything; returns the cost (raises admission.Rejected)."""
+    if not isinstance(platforms, list):
+        raise admission.Rejected('platforms must be a list', status=400)
+    cost = admission.estimate_cost(window_days, platforms, captions.current().reel_platforms)
+    admission.check_ceilings(total_days, platforms, cost)
+    return cost
+
+
+def admit_generation(total_days, window_days, platforms):
+    """Apply the hard ceilings and charge the caller's rate limits; returns the cost (raises admission.Rejected)."""
+    cost = generation_cost(total_days, window_days, platforms)
+    admission.admit(cost, user_id=session.get('user_id'), ip=client_ip())
+    return cost
+
+
+def rejected_response(e):
+    resp = jsonify({'ok': False, 'error': str(e)})
+    resp.status_code = e.status
+    if e.retry_after is not None:
+        resp.headers['Retry-After'] = str(e.retry_after)
+    return resp
+
+
+def job_owner():
+    """Who may poll a generate job: the signed-in user, else a per-session token."""
+    uid = session.get('user_id')
+    if uid:
+        return 'user:' + uid
+    if 'job_owner' not in session:
+        session['job_owner'] = str(uuid.uuid4())
+    return 'session:' + session['job_owner']
+
+
+# calendars too large to build inside a request run here, chunked across the batch pool
+_generate_jobs_active = 0
+_generate_jobs_lock = threading.Lock()
+
+
+def queue_generate_job(params, cost, total_days):
+    """Queue a generate job and answer 202; the rate limits are charged only once the job is accepted."""
+    global _generate_jobs_active
+    owner = job_owner()
+    user_id, ip = session.get('user_id'), client_ip()
+    with _generate_jobs_lock:
+        if _generate_jobs_active >= int(os.getenv('GENERATE_MAX_QUEUED', '16')):
+            return rejected_response(admission.Rejected('Generation queue is full', status=503, retry_after=10))
+        _generate_jobs_active += 1
+    job_id = str(uuid.uuid4())
+    max_jobs = int(os.getenv('GENERATE_MAX_JOBS_PER_USER', '2'))
+    stale = float(os.getenv('GENERATE_JOB_STALE_SECONDS', '900')) / 86400
+
+    def enqueue(conn):
+        # jobs run on daemon threads; rows a restart or crash left queued/running would otherwise count forever
+        conn.execute("UPDATE generate_jobs SET status = 'failed', error = 'abandoned', finished_at = ? "
+                     "WHERE owner = ? AND status IN ('queued', 'running') "
+                     "AND julianday(COALESCE(started_at, created_at)) < julianday('now') - ?",
+                     (datetime.now(timezone.utc).isoformat(), owner, stale))
+        pending = conn.execute("SELECT COUNT(*) FROM generate_jobs WHERE owner = ? AND status IN ('queued', 'running')",
+                               (owner,)).fetchone()[0]
+        if pending >= max_jobs:
+            raise admission.Rejected('Too many generation jobs in progress', retry_after=5)
+        # last, so a full queue or per-user limit costs nothing; a rejected charge rolls the op back
+        admission.admit(cost, user_id=user_id, ip=ip)
+        conn.execute('INSERT INTO generate_jobs (id, owner, status, cost) VALUES (?, ?, ?, ?)', (job_id, owner, 'queued', cost))
+    try:
+        write(enqueue)
+        t = threading.Thread(target=run_generate_job, args=(job_id, params, total_days, DB_PATH), daemon=True)
+        t.start()
+    except Exception as e:
+        with _generate_jobs_lock:
+            _generate_jobs_active -= 1
+        if isinstance(e, admission.Rejected):
+            return rejected_response(e)
+        raise
+    resp = jsonify({'ok': True, 'queued': True, 'job_id': job_id, 'cost': cost,
+                    'status_url': f'/api/generate/jobs/{job_id}'})
+    resp.status_code = 202
+    resp.headers['Location'] = f'/api/generate/jobs/{job_id}'
+    resp.headers['Retry-After'] = '1'
+    return resp
+
+
+def run_generate_job(job_id, params, total_days, db_path):
+    global _generate_jobs_active
+    writer = dbwriter.get(db_path)
+    try:
+        writer.execute('UPDATE generate_jobs SET status = ?, started_at = ? WHERE id = ?',
+                       ('running', datetime.now(timezone.utc).isoformat(), job_id))
+        status, result, error = 'failed', None, None
         try:
-            if not val:
-                return [] if default is None else default
-            return json.loads(val)
-        except Exception:
-            return [] if default is None else default
+            for _, _, posts, err in batch.iter_batch([(job_id, params)]):
+                if err:
+                    error = err
+                else:
+                    end = params['offset'] + params['days']
+                    result = json.dumps({
+                        'count': len(posts), 'posts': posts, 'offset': params['offset'], 'total_days': total_days,
+                        'next_offset': end if end < total_days else None,
+                    })
+                    status = 'finished'
+        except Exception as e:
+            error = str(e) or e.__class__.__name__
+        writer.execute('UPDATE generate_jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?',
+                       (status, result, error, datetime.now(timezone.utc).isoformat(), job_id)).result()
+    finally:
+        with _generate_jobs_lock:
+            _generate_jobs_active -= 1
+
+
+@app.get('/api/generate/jobs/<job_id>')
+def api_generate_job_get(job_id):
+    """Poll a queued generate job; once finished the calendar is under `result`."""
+    db = get_db()
+    row = db.execute('SELECT id, owner, status, cost, error, created_at, started_at, finished_at FROM generate_jobs WHERE id = ?',
+                     (job_id,)).fetchone()
+    if not row or row['owner'] != job_owner():
+        return jsonify({'ok': False, 'error': 'Not found'}), 404
+    job = {k: row[k] for k in ('id', 'status', 'cost', 'error', 'created_at', 'started_at', 'finished_at')}
+    if row['status'] != 'finished':
+        resp = jsonify({'ok': True, 'job': job})
+        if row['status'] in ('queued', 'running'):
+            resp.headers['Retry-After'] = '1'
+        return resp
+    # the stored result is already JSON; splice it in rather than parse and re-encode it
+    result = db.execute('SELECT result FROM generate_jobs WHERE id = ?', (job_id,)).fetchone()['result']
+    return Response('{"ok": true, "job": %s, "result": %s}' % (json.dumps(job), result), mimetype='application/json')
 
-    return jsonify({
-        "id": row["id"],
-        "industry": row["industry"],
-        "tone": row["tone"],
-        "platforms": parse_json_field(row["platforms"], []),
-        "brand_keywords": parse_json_field(row["brand_keywords"], []),
-        "niche_keywords": parse_json_field(row["niche_keywords"], []),
-        "goals": parse_json_field(row["goals"], []),
-        "details": parse_json_field(row.get("details"), {}),
-        "company": row["company"] or "",
-        "include_images": bool(row["include_images"]),
-        "created_at": row["created_at"],
-    })
 
 @app.post("/api/generate")
 def api_generate():
+    """Generate a calendar of `days` days. Optional `offset`/`limit` return just that window of days."""
     data = request.get_json(force=True)
     profile_id = session.get("profile_id")
-    days = int(data.get("days", 30))
-    start_iso = data.get("start_date")
+    params = params_from_payload(data)
+    total_days = params["days"]
     try:
-        start_day = date.fromisoformat(start_iso) if start_iso else date.today()
-    except Exception:
-        start_day = date.today()
-
-    industry = data.get("industry", "Business")
-    tone = data.get("tone", "friendly")
-    platforms = data.get("platforms", ["instagram"])
-    brand_keywords = data.get("brand_keywords", [])
-    niche_keywords = data.get("niche_keywords", [])
-    goals = data.get("goals", [])
-    details = data.get("details", {})
-    include_images = bool(data.get("include_images", True))
-    company = data.get("company", "")
+        offset = int(data.get("offset", 0))
+        limit = int(data["limit"]) if data.get("limit") is not None else total_days
+    except (TypeError, ValueError):
+        return jsonify({'ok': False, 'error': 'offset and limit must be integers'}), 400
+    if offset < 0 or limit < 0:
+        return jsonify({'ok': False, 'error': 'offset and limit must not be negative'}), 400
 
     # enforce server-side gating for 7-day (or longer) generation
-    flags = load_flags()
-    gate7 = bool(flags.get('gate7DayToPaid'))
-    if gate7 and days >= 7:
-        uid = session.get('user_id')
-        if not uid:
-            return jsonify({'ok': False, 'error': 'Authentication required for this feature'}), 401
-        db = get_db()
-        user = db.execute('SELECT is_paid FROM users WHERE id = ?', (uid,)).fetchone()
-        if not user or not user['is_paid']:
-            return jsonify({'ok': False, 'error': 'Paid subscription required for this feature'}), 403
+    denied = check_generation_access(total_days)
+    if denied:
+        return denied
+
+    end = min(total_days, offset + limit)
+    window_days = max(0, end - offset)
+    try:
+        cost = generation_cost(total_days, window_days, params["platforms"])
+        if cost > admission.sync_cost():
+            return queue_generate_job({**params, "days": window_days, "offset": offset}, cost, total_days)
+        admission.admit(cost, user_id=session.get('user_id'), ip=client_ip())
+    except admission.Rejected as e:
+        return rejected_response(e)
+
+    posts = generate_posts(**{**params, "days": window_days, "offset": offset})
+    return jsonify({
+        "count": len(posts), "posts": posts, "profile_id": profile_id,
+        "offset": offset, "total_days": total_days, "next_offset": end if end < total_days else None,
+    })
+
+
+# Stored calendars: the generate parameters plus one row per post, so a profile
+# edit rewrites only the posts whose fields depend on what changed.
+CALENDAR_PAYLOAD_FIELDS = ('days', 'start_date', 'industry', 'tone', 'platforms', 'brand_keywords',
+                           'niche_keywords', 'goals', 'details', 'include_images', 'company')
+
+
+# one statement per write however many posts: rows arrive as a JSON array of [seq, post] pairs
+CALENDAR_POSTS_INSERT = ('INSERT OR REPLACE INTO calendar_posts (calendar_id, seq, post) '
+                         "SELECT ?, json_extract(value, '$[0]'), json_extract(value, '$[1]') FROM json_each(?)")
+
+
+class CalendarConflict(Exception):
+    """The calendar changed between reading it and writing the update."""
+
+
+def calendar_payload(params):
+    """JSON-ready form of generate_posts params that params_from_payload maps back to the same params."""
+    payload = {k: v for k, v in params.items() if k in CALENDAR_PAYLOAD_FIELDS}
+    payload['start_date'] = params['start_day'].isoformat()
+    return payload
+
+
+def admit_calendar(params):
+    """Gate and charge a full calendar build; returns an error response, or None if allowed."""
+    denied = check_generation_access(params['days'])
+    if denied:
+        return denied
+    try:
+        # size first, so an oversized calendar is refused without charging the caller's rate limits
+        if isinstance(params['platforms'], list) and admission.estimate_cost(
+                params['days'], params['platforms'], captions.current().reel_platforms) > admission.sync_cost():
+            raise admission.Rejected('Calendar too large to store; use /api/generate for long ranges', status=413)
+        admit_generation(params['days'], params['days'], params['platforms'])
+    except admission.Rejected as e:
+        return rejected_response(e)
+    return None
+
+
+def calendar_row(calendar_id):
+    row = get_db().execute('SELECT id, owner, params, stamp, version FROM calendars WHERE id = ?', (calendar_id,)).fetchone()
+    if not row or row['owner'] != job_owner():
+        return None
+    return row
+
+
+@app.post('/api/calendars')
+def api_calendar_create():
+    """Generate a calendar (same payload as /api/generate) and store it for incremental updates."""
+    data = request.get_json(force=True)
+    try:
+        params = params_from_payload(data if isinstance(data, dict) else {})
+    except (TypeError, ValueError):
+        return jsonify({'ok': False, 'error': 'Invalid calendar payload'}), 400
+    denied = admit_calendar(params)
+    if denied:
+        return denied
+    posts = generate_posts(**params)
+    calendar_id = str(uuid.uuid4())
+    owner = job_owner()
+    payload = json.dumps(calendar_payload(params))
+    stamp = content_stamp()
+
+    def store(conn):
+        conn.execute('INSERT INTO calendars (id, owner, params, stamp, version, updated_at) VALUES (?, ?, ?, ?, 1, ?)',
+                     (calendar_id, owner, payload, stamp, datetime.now(timezone.utc).isoformat()))
+        conn.execute(CALENDAR_POSTS_INSERT, (calendar_id, json.dumps([[i, p] for i, p in enumerate(posts)])))
+    write(store)
+    resp = jsonify({'ok': True, 'id': calendar_id, 'version': 1, 'count': len(posts), 'posts': posts})
+    resp.status_code = 201
+    resp.headers['Location'] = f'/api/calendars/{calendar_id}'
+    return resp
+
+
+@app.get('/api/calendars/<calendar_id>')
+def api_calendar_get(calendar_id):
+    row = calendar_row(calendar_id)
+    if row is None:
+        return jsonify({'ok': False, 'error': 'Not found'}), 404
+    # posts are stored as JSON; SQLite assembles the array so they are not parsed and re-encoded here
+    posts = get_db().execute('SELECT json_group_array(json(post)) FROM '
+                             '(SELECT post FROM calendar_posts WHERE calendar_id = ? ORDER BY seq)', (calendar_id,)).fetchone()[0]
+    head = json.dumps({'ok': True, 'id': row['id'], 'version': row['version'], 'params': json.loads(row['params'])})
+    return Response('%s, "posts": %s}' % (head[:-1], posts), mimetype='application/json')
+
+
+@app.patch('/api/calendars/<calendar_id>')
+def api_calendar_update(calendar_id):
+    """Apply changed generate parameters; recomputes only dependent fields and returns only the posts that changed."""
+    data = request.get_json(force=True)
+    if not isinstance(data, dict):
+        return jsonify({'ok': False, 'error': 'Expected a JSON object'}), 400
+    row = calendar_row(calendar_id)
+    if row is None:
+        return jsonify({'ok': False, 'error': 'Not found'}), 404
+    stored = json.loads(row['params'])
+    try:
+        old = params_from_payload(stored)
+        new = params_from_payload({**stored, **{k: v for k, v in data.items() if k in CALENDAR_PAYLOAD_FIELDS}})
+    except (TypeError, ValueError):
+        return jsonify({'ok': False, 'error': 'Invalid calendar payload'}), 400
+    inputs = changed_inputs(old, new)
+    stamp = content_stamp()
+    regenerate = stamp != row['stamp'] or not inputs.isdisjoint(STRUCTURAL_INPUTS)
+    if regenerate:
+        denied = admit_calendar(new)
+        if denied:
+            return denied
+    posts = [json.loads(p) for (p,) in get_db().execute(
+        'SELECT post FROM calendar_posts WHERE calendar_id = ? ORDER BY seq', (calendar_id,))]
+    updated, changed = update_posts(posts, old, new, regenerate=stamp != row['stamp'])
+    version = row['version']
+    payload = json.dumps(calendar_payload(new))
+    if changed or payload != row['params'] or stamp != row['stamp']:
+
+        def apply(conn):
+            cur = conn.execute('UPDATE calendars SET params = ?, stamp = ?, version = version + 1, updated_at = ? '
+                               'WHERE id = ? AND version = ?',
+                               (payload, stamp, datetime.now(timezone.utc).isoformat(), calendar_id, version))
+            if cur.rowcount != 1:
+                raise CalendarConflict()
+            if len(updated) < len(posts):
+                conn.execute('DELETE FROM calendar_posts WHERE calendar_id = ? AND seq >= ?', (calendar_id, len(updated)))
+            conn.execute(CALENDAR_POSTS_INSERT, (calendar_id, json.dumps([[i, updated[i]] for i in changed])))
+        try:
+            write(apply)
+        except CalendarConflict:
+            return jsonify({'ok': False, 'error': 'Calendar was updated concurrently; retry'}), 409
+        version += 1
+    return jsonify({
+        'ok': True, 'id': calendar_id, 'version': version, 'count': len(updated),
+        'changed_inputs': sorted(inputs), 'regenerated': regenerate,
+        'fields': list(FIELD_DEPENDENCIES) if regenerate else affected_fields(inputs),
+        'posts': [{'seq': i, 'post': updated[i]} for i in changed],
+    })
+
+
+@app.post("/api/generate/batch")
+def api_generate_batch():
+    """Generate calendars for many profiles at once, streamed back as NDJSON, one line per profile."""
+    data = request.get_json(force=True)
+    profiles = data.get("profiles") if isinstance(data, dict) else None
+    if not isinstance(profiles, list) or not profiles or not all(isinstance(p, dict) for p in profiles):
+        return jsonify({'ok': False, 'error': 'profiles must be a non-empty list of objects'}), 400
+    max_profiles = int(os.getenv('BATCH_MAX_PROFILES', '100'))
+    if len(profiles) > max_profiles:
+        return jsonify({'ok': False, 'error': f'Too many profiles (max {max_profiles})'}), 400
+    try:
+        jobs = [(p.get('id') or str(i), params_from_payload(p)) for i, p in enumerate(profiles)]
+    except (TypeError, ValueError):
+        return jsonify({'ok': False, 'error': 'Invalid profile payload'}), 400
+    denied = check_generation_access(max(params['days'] for _, params in jobs))
+    if denied:
+        return denied
+    try:
+        reel = captions.current().reel_platforms
+        cost = 0.0
+        for _, params in jobs:
+            if not isinstance(params['platforms'], list):
+                raise admission.Rejected('platforms must be a list', status=400)
+            one = admission.estimate_cost(params['days'], params['platforms'], reel)
+            admission.check_ceilings(params['days'], params['platforms'], one)
+            cost += one
+        admission.admit(cost, user_id=session.get('user_id'), ip=client_ip())
+    except admission.Rejected as e:
+        return rejected_response(e)
+
+    def stream():
+        for index, key, posts, error in batch.iter_batch(jobs):
+            line = {'index': index, 'id': key}
+            if error:
+                line['error'] = error
+            else:
+                line.update(count=len(posts), posts=posts)
+            yield json.dumps(line) + '\n'
+
+    return Response(stream(), mimetype='application/x-ndjson')
+
+EXPORT_LIST_ARGS = ("platforms", "brand_keywords", "niche_keywords", "goals")
+EXPORT_SCALAR_ARGS = ("days", "start_date", "industry", "tone", "company")
+
+
+@app.get("/api/generate/export")
+def api_generate_export():
+    """Stream the calendar for the saved profile as CSV, iCalendar or JSON Lines.
+
+    Query args override the saved profile; list fields are comma-separated.
+    """
+    fmt = request.args.get("format", "csv").lower()
+    if fmt not in exports.FORMATS:
+        return jsonify({'ok': False, 'error': 'format must be one of: ' + ', '.join(exports.FORMATS)}), 400
+    data = {k: v for k, v in (load_profile(session.get("profile_id")) or {}).items() if v is not None}
+    for key in EXPORT_SCALAR_ARGS:
+        if key in request.args:
+            data[key] = request.args[key]
+    for key in EXPORT_LIST_ARGS:
+        if key in request.args:
+            data[key] = [v.strip() for v in request.args[key].split(",") if v.strip()]
+    if "include_images" in request.args:
+        data["include_images"] = request.args["include_images"] not in ("0", "false", "")
+    try:
+        params = params_from_payload(data)
+    except (TypeError, ValueError):
+        return jsonify({'ok': False, 'error': 'Invalid parameters'}), 400
+    denied = check_generation_access(params["days"])
+    if denied:
+        return denied
+    # exports stream, so they are never queued, but they still count against the limits
+    try:
+        admit_generation(params["days"], params["days"], params["platforms"])
+    except admission.Rejected as e:
+        return rejected_response(e)
+
+    mimetype, ext = exports.FORMATS[fmt]
+    body = exports.buffered(exports.WRITERS[fmt](iter_posts(**params)))
+    return Response(body, mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename="togetherly-calendar.{ext}"',
+        'Cache-Control': 'no-store',
+    })
 
-    posts = generate_posts(
-        days=days,
-        start_day=start_day,
-        industry=industry,
-        tone=tone,
-        platforms=platforms,
-        brand_keywords=brand_keywords,
-        include_images=include_images,
-        niche_keywords=niche_keywords,
-        goals=goals,
-        details=details,
-        company=company
-    )
-    return jsonify({"count": len(posts), "posts": posts, "profile_id": profile_id})
 
 @app.post("/api/feedback")
 def api_feedback():
@@ -1011,8 +2159,7 @@ def api_feedback():
     profile_id = session.get("profile_id")
     if not profile_id:
         return jsonify({"ok": False, "error": "No profile in session"}), 400
-    db = get_db()
-    db.execute(
+    write(
         "INSERT INTO feedback (profile_id, post_day, platform, rating, note) VALUES (?, ?, ?, ?, ?)",
         (
             profile_id,
@@ -1022,7 +2169,6 @@ def api_feedback():
             data.get("note", "")[:500],
         ),
     )
-    db.commit()
     return jsonify({"ok": True})
 
 if __name__ == "__main__":
@@ -0,0 +1,142 @@
+"""Multi-profile calendar generation on a process pool.
+
+Each profile's calendar is split into day chunks (BATCH_CHUNK_DAYS) and every
+chunk of every profile is fanned out across the pool, so a single long
+calendar still uses all cores. Results are reassembled per profile and
+yielded as soon as that profile's last chunk finishes.
+
+Offline use:
+    python batch.py profiles.json --out-dir calendars/ [--workers N]
+where profiles.json is a JSON list (or NDJSON) of /api/generate payloads.
+One <id>.json file is written per profile.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from generator import generate_posts, params_from_payload
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def default_workers():
+    return int(os.getenv('GENERATOR_WORKERS', '0')) or (os.cpu_count() or 1)
+
+
+def get_pool():
+    """Shared process pool for generation, created on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # imported here: concurrent.futures.process pulls in multiprocessing, which
+                # the web worker only needs once someone actually runs a batch
+                from concurrent.futures import ProcessPoolExecutor
+                _pool = ProcessPoolExecutor(max_workers=default_workers())
+    return _pool
+
+
+def plan_chunks(days, chunk_days=None):
+    """Split a calendar of `days` days into (offset, length) chunks."""
+    chunk_days = chunk_days or int(os.getenv('BATCH_CHUNK_DAYS', '30'))
+    return [(off, min(chunk_days, days - off)) for off in range(0, max(days, 0), chunk_days)]
+
+
+def _generate_chunk(params, offset, days):
+    # chunk offsets are relative to the job's own offset (a window of a longer calendar)
+    return generate_posts(**{**params, 'days': days, 'offset': params.get('offset', 0) + offset})
+
+
+def iter_batch(jobs, executor=None, chunk_days=None):
+    """Generate calendars for `jobs`, a list of (key, generate_posts kwargs).
+
+    Yields (index, key, posts, error) once per profile, in completion order.
+    """
+    executor = executor or get_pool()
+    pending = {}
+    parts = {}
+    remaining = {}
+    failed = {}
+    for index, (key, params) in enumerate(jobs):
+        chunks = plan_chunks(params['days'], chunk_days)
+        parts[index] = [None] * len(chunks)
+        remaining[index] = len(chunks)
+        if not chunks:
+            yield index, key, [], None
+            continue
+        for pos, (offset, length) in enumerate(chunks):
+            fut = executor.submit(_generate_chunk, params, offset, length)
+            pending[fut] = (index, pos)
+
+    try:
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                index, pos = pending.pop(fut)
+                try:
+                    parts[index][pos] = fut.result()
+                except Exception as e:
+                    failed.setdefault(index, str(e) or e.__class__.__name__)
+                remaining[index] -= 1
+                if remaining[index] == 0:
+                    key = jobs[index][0]
+                    if index in failed:
+                        yield index, key, None, failed[index]
+                    else:
+                        yield index, key, [p for chunk in parts[index] for p in chunk], None
+                    del parts[index]
+    finally:
+        # consumer went away (e.g. client disconnected): drop work that has not started
+        for fut in pending:
+            fut.cancel()
+
+
+def _load_profiles(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        data = [json.loads(line) for line in text.splitlines() if line.strip()]
+    if isinstance(data, dict):
+        data = data.get('profiles', [])
+    return data
+
+
+def _safe_name(key):
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', str(key)).strip('._') or 'profile'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate calendars for many profiles, one file per profile.')
+    parser.add_argument('profiles', help='JSON list or NDJSON file of /api/generate payloads')
+    parser.add_argument('--out-dir', default='calendars', help='directory to write <id>.json files into')
+    parser.add_argument('--workers', type=int, default=0, help='process count (default: GENERATOR_WORKERS or CPU count)')
+    parser.add_argument('--chunk-days', type=int, default=0, help='days per work unit (default: BATCH_CHUNK_DAYS or 30)')
+    args = parser.parse_args(argv)
+    from concurrent.futures import ProcessPoolExecutor
+
+    profiles = _load_profiles(args.profiles)
+    jobs = [(p.get('id') or str(i), params_from_payload(p)) for i, p in enumerate(profiles)]
+    os.makedirs(args.out_dir, exist_ok=True)
+    failures = 0
+    with ProcessPoolExecutor(max_workers=args.workers or default_workers()) as executor:
+        for index, key, posts, error in iter_batch(jobs, executor=executor, chunk_days=args.chunk_days or None):
+            if error:
+                failures += 1
+                print(f'{key}: failed: {error}', file=sys.stderr)
+                continue
+            out_path = os.path.join(args.out_dir, _safe_name(key) + '.json')
+            with open(out_path, 'w', encoding='utf-8') as f:
+                json.dump({'profile_id': key, 'count': len(posts), 'posts': posts}, f, ensure_ascii=False)
+            print(f'{key}: {len(posts)} posts -> {out_path}')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
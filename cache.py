@@ -0,0 +1,55 @@
+"""Small thread-safe in-process caches."""
+import threading
+import time
+
+
+class TTLCache:
+    """Dict-like cache whose entries expire `ttl` seconds after being set.
+
+    `ttl` may be a number or a zero-argument callable, so it can follow an
+    env var without restarting. A ttl of 0 disables caching.
+    """
+
+    def __init__(self, ttl, maxsize=10000):
+        self._ttl = ttl
+        self.maxsize = maxsize
+        self._data = {}
+        self._lock = threading.Lock()
+
+    @property
+    def ttl(self):
+        return self._ttl() if callable(self._ttl) else self._ttl
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        expires, value = entry
+        if expires < time.monotonic():
+            with self._lock:
+                if self._data.get(key) is entry:
+                    del self._data[key]
+            return default
+        return value
+
+    def set(self, key, value):
+        ttl = self.ttl
+        if ttl <= 0:
+            return
+        with self._lock:
+            if len(self._data) >= self.maxsize and key not in self._data:
+                # drop the entry closest to expiry rather than growing without bound
+                oldest = min(self._data, key=lambda k: self._data[k][0])
+                del self._data[oldest]
+            self._data[key] = (time.monotonic() + ttl, value)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
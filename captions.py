@@ -0,0 +1,117 @@
+"""Caption and reel templates from the content pack (static/content/templates.json).
+
+The JSON is compiled once into Template objects (pre-parsed into a
+%-format string plus the ordered field names) and a TemplateSet holding
+the pillars, tone and platform lookups. current() recompiles when the
+file changes and swaps the whole set in one assignment, so a calendar
+renders against one consistent set and content edits need no restart.
+"""
+import string
+import threading
+
+import content
+
+TEMPLATES_FILE = 'templates.json'
+
+_formatter = string.Formatter()
+
+
+class Template:
+    """A '{field}' template parsed once; render() is a single %-format."""
+    __slots__ = ('source', 'fields', '_fmt')
+
+    def __init__(self, source: str):
+        fmt = []
+        fields = []
+        for literal, field, spec, conv in _formatter.parse(source):
+            fmt.append(literal.replace('%', '%%'))
+            if field is None:
+                continue
+            if not field.isidentifier() or spec or conv:
+                raise ValueError(f'unsupported placeholder {{{field}}} in template {source!r}')
+            fmt.append('%s')
+            fields.append(field)
+        self.source = source
+        self.fields = tuple(fields)
+        self._fmt = ''.join(fmt)
+
+    def render(self, values) -> str:
+        if not self.fields:
+            return self._fmt % ()
+        return self._fmt % tuple([values[f] for f in self.fields])
+
+
+class ReelStyle:
+    __slots__ = ('name', 'hooks', 'shots')
+
+    def __init__(self, name, hooks, shots):
+        self.name = name
+        self.hooks = tuple(Template(h) for h in hooks)
+        self.shots = tuple(shots)
+
+
+class TemplateSet:
+    """Everything the generator renders from, compiled from one templates.json."""
+
+    def __init__(self, data: dict):
+        self.source = data
+        self.pillars = tuple((p['name'], p['hint']) for p in data['pillars'])
+        if not self.pillars:
+            raise ValueError('templates.json must define at least one pillar')
+        self.platform_hints = {k.lower(): v for k, v in data['platform_hints'].items()}
+        self.default_platform_hint = data.get('default_platform_hint', '')
+        self.tones = {k.lower(): v for k, v in data['tones'].items()}
+        self.default_tone = data.get('default_tone', '')
+        self.caption = Template(data['caption'])
+        self.image_prompt = Template(data['image_prompt'])
+
+        reel = data['reel']
+        self.reel_platforms = frozenset(p.lower() for p in reel['platforms'])
+        self.reel_styles = {name: ReelStyle(name, s['hooks'], s['shots']) for name, s in reel['styles'].items()}
+        self.default_reel_style = reel['default_style']
+        if self.default_reel_style not in self.reel_styles:
+            raise ValueError(f'default reel style {self.default_reel_style!r} is not defined')
+        self.fallback_shots = tuple(reel['fallback_shots'])
+        self.beats = tuple((b['t'], b['osd'], Template(b['line'])) for b in reel['beats'])
+        self.reel_cta = reel['cta']
+        self.thumbnail_prompt = Template(reel['thumbnail_prompt'])
+        self.srt_prompt = Template(reel['srt_prompt'])
+
+    def tone_blurb(self, tone: str) -> str:
+        return self.tones.get(tone.lower(), self.default_tone)
+
+    def platform_hint(self, platform: str) -> str:
+        return self.platform_hints.get(platform.lower(), self.default_platform_hint)
+
+
+_current = None
+_rejected = None  # last templates.json object that failed to compile, so it is not retried per call
+_lock = threading.Lock()
+
+
+def current() -> TemplateSet:
+    """The compiled set for the current templates.json.
+
+    A file that fails to compile leaves the previous set in place; with no
+    previous set the error propagates.
+    """
+    global _current, _rejected
+    data = content.load(TEMPLATES_FILE)
+    cur = _current
+    if cur is not None and (cur.source is data or _rejected is data):
+        return cur
+    with _lock:
+        cur = _current
+        if cur is not None and (cur.source is data or _rejected is data):
+            return cur
+        try:
+            if data is None:
+                raise ValueError(f'static/content/{TEMPLATES_FILE} is missing or not valid JSON')
+            compiled = TemplateSet(data)
+        except (KeyError, TypeError, ValueError):
+            if cur is None:
+                raise
+            _rejected = data
+            return cur
+        _current = compiled
+        return compiled
@@ -0,0 +1,61 @@
+"""Content pack (static/content/*.json), parsed once and reloaded when a file changes.
+
+Each file is re-read only when its (mtime, size) stamp changes, so per-request
+callers pay a stat() instead of a read and a JSON parse. The returned objects
+are shared between requests; treat them as read-only.
+"""
+import json
+import os
+import threading
+
+CONTENT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'content')
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def _stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def load(name, default=None):
+    """Parsed JSON of static/content/<name>, or `default` if it is missing or invalid."""
+    path = os.path.join(CONTENT_DIR, name)
+    stamp = _stamp(path)
+    entry = _cache.get(name)
+    if entry is not None and entry[0] == stamp:
+        return entry[1]
+    with _lock:
+        entry = _cache.get(name)
+        if entry is not None and entry[0] == stamp:
+            return entry[1]
+        value = default
+        if stamp is not None:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    value = json.load(f)
+            except Exception:
+                value = default
+        _cache[name] = (stamp, value)
+        return value
+
+
+def config():
+    return load('config.json', {}) or {}
+
+
+def flags():
+    return load('flags.json', {}) or {}
+
+
+def version():
+    return config().get('version', 'local')
+
+
+def clear():
+    with _lock:
+        _cache.clear()
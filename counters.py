@@ -0,0 +1,172 @@
+"""Admin summary counters kept current by SQLite triggers.
+
+admin_counters holds (name, bucket) -> value rows:
+
+    users         ''            all users
+    users_paid    ''            users with is_paid = 1
+    subscriptions <status>      subscriptions per status ('' for NULL)
+    renewals      YYYY-MM-DD    active/trialing subscriptions by current_period_end day
+    feedback      ''            all feedback rows
+    feedback_day  YYYY-MM-DD    feedback rows by created_at day
+
+Triggers on users, subscriptions and feedback adjust the rows in the same
+transaction as the change, whichever connection makes it. The admin
+dashboard then reads a handful of primary-key rows instead of scanning the
+tables. check() recomputes everything from the tables and reports
+differences; rebuild() replaces the table with the recomputed values.
+
+    python counters.py [--db togetherly.db] [--rebuild]
+"""
+import argparse
+import sqlite3
+import sys
+from datetime import date, timedelta
+
+RENEWING = "('active', 'trialing')"
+
+
+def _day(expr):
+    # Stripe sends current_period_end as a unix timestamp; older rows may hold ISO text
+    return f"(CASE WHEN typeof({expr}) IN ('integer', 'real') THEN date({expr}, 'unixepoch') ELSE date({expr}) END)"
+
+
+def _bump(name, bucket, delta, when='1'):
+    return (f"INSERT INTO admin_counters (name, bucket, value) SELECT '{name}', {bucket}, {delta} WHERE {when} "
+            f"ON CONFLICT (name, bucket) DO UPDATE SET value = value + excluded.value;")
+
+
+def _renews(row):
+    return f"{row}.status IN {RENEWING} AND {_day(row + '.current_period_end')} IS NOT NULL"
+
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS admin_counters (
+    name TEXT NOT NULL,
+    bucket TEXT NOT NULL DEFAULT '',
+    value INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (name, bucket)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS admin_counters_users_ins AFTER INSERT ON users BEGIN
+    {_bump('users', "''", 1)}
+    {_bump('users_paid', "''", 1, 'NEW.is_paid = 1')}
+END;
+CREATE TRIGGER IF NOT EXISTS admin_counters_users_del AFTER DELETE ON users BEGIN
+    {_bump('users', "''", -1)}
+    {_bump('users_paid', "''", -1, 'OLD.is_paid = 1')}
+END;
+CREATE TRIGGER IF NOT EXISTS admin_counters_users_upd AFTER UPDATE OF is_paid ON users
+WHEN (OLD.is_paid = 1) IS NOT (NEW.is_paid = 1) BEGIN
+    {_bump('users_paid', "''", "CASE WHEN NEW.is_paid = 1 THEN 1 ELSE -1 END")}
+END;
+
+CREATE TRIGGER IF NOT EXISTS admin_counters_subs_ins AFTER INSERT ON subscriptions BEGIN
+    {_bump('subscriptions', "COALESCE(NEW.status, '')", 1)}
+    {_bump('renewals', _day('NEW.current_period_end'), 1, _renews('NEW'))}
+END;
+CREATE TRIGGER IF NOT EXISTS admin_counters_subs_del AFTER DELETE ON subscriptions BEGIN
+    {_bump('subscriptions', "COALESCE(OLD.status, '')", -1)}
+    {_bump('renewals', _day('OLD.current_period_end'), -1, _renews('OLD'))}
+END;
+CREATE TRIGGER IF NOT EXISTS admin_counters_subs_upd AFTER UPDATE OF status, current_period_end ON subscriptions
+WHEN OLD.status IS NOT NEW.status OR OLD.current_period_end IS NOT NEW.current_period_end BEGIN
+    {_bump('subscriptions', "COALESCE(OLD.status, '')", -1, 'OLD.status IS NOT NEW.status')}
+    {_bump('subscriptions', "COALESCE(NEW.status, '')", 1, 'OLD.status IS NOT NEW.status')}
+    {_bump('renewals', _day('OLD.current_period_end'), -1, _renews('OLD'))}
+    {_bump('renewals', _day('NEW.current_period_end'), 1, _renews('NEW'))}
+END;
+
+CREATE TRIGGER IF NOT EXISTS admin_counters_feedback_ins AFTER INSERT ON feedback BEGIN
+    {_bump('feedback', "''", 1)}
+    {_bump('feedback_day', 'date(NEW.created_at)', 1, 'date(NEW.created_at) IS NOT NULL')}
+END;
+CREATE TRIGGER IF NOT EXISTS admin_counters_feedback_del AFTER DELETE ON feedback BEGIN
+    {_bump('feedback', "''", -1)}
+    {_bump('feedback_day', 'date(OLD.created_at)', -1, 'date(OLD.created_at) IS NOT NULL')}
+END;
+"""
+
+# the same counters computed from scratch
+ACTUAL = f"""
+SELECT 'users', '', COUNT(*) FROM users
+UNION ALL SELECT 'users_paid', '', COUNT(*) FROM users WHERE is_paid = 1
+UNION ALL SELECT 'subscriptions', COALESCE(status, ''), COUNT(*) FROM subscriptions GROUP BY 2
+UNION ALL SELECT 'renewals', {_day('current_period_end')}, COUNT(*) FROM subscriptions
+    WHERE status IN {RENEWING} AND {_day('current_period_end')} IS NOT NULL GROUP BY 2
+UNION ALL SELECT 'feedback', '', COUNT(*) FROM feedback
+UNION ALL SELECT 'feedback_day', date(created_at), COUNT(*) FROM feedback WHERE date(created_at) IS NOT NULL GROUP BY 2
+"""
+
+
+def install(conn):
+    """Create the table and triggers; fill the table if it is new (or was emptied)."""
+    conn.executescript(SCHEMA)
+    if conn.execute('SELECT 1 FROM admin_counters LIMIT 1').fetchone() is None:
+        rebuild(conn)
+
+
+def rebuild(conn):
+    """Replace every counter with its value recomputed from the tables (caller commits)."""
+    conn.execute('DELETE FROM admin_counters')
+    conn.execute(f'INSERT INTO admin_counters (name, bucket, value) {ACTUAL}')
+
+
+def check(conn):
+    """[{name, bucket, stored, actual}] for every counter that disagrees with the tables."""
+    stored = {(n, b): v for n, b, v in conn.execute('SELECT name, bucket, value FROM admin_counters')}
+    actual = {(n, b): v for n, b, v in conn.execute(ACTUAL)}
+    out = []
+    for key in sorted(set(stored) | set(actual)):
+        s, a = stored.get(key, 0), actual.get(key, 0)
+        if s != a:
+            out.append({'name': key[0], 'bucket': key[1], 'stored': s, 'actual': a})
+    return out
+
+
+def summary(conn, today=None, days=7):
+    """Dashboard numbers; two indexed reads however large the tables are."""
+    today = today or date.today()
+    start, end = today.isoformat(), (today + timedelta(days=days - 1)).isoformat()
+    since = (today - timedelta(days=days - 1)).isoformat()
+    out = {'users': 0, 'paid_users': 0, 'subscriptions': {}, 'feedback_total': 0,
+           f'renewals_next_{days}_days': 0, f'feedback_last_{days}_days': 0}
+    for name, bucket, value in conn.execute(
+            "SELECT name, bucket, value FROM admin_counters WHERE name IN ('users', 'users_paid', 'subscriptions', 'feedback')"):
+        if name == 'subscriptions':
+            if value:
+                out['subscriptions'][bucket or 'unknown'] = value
+        else:
+            out[{'users': 'users', 'users_paid': 'paid_users', 'feedback': 'feedback_total'}[name]] = value
+    for name, value in conn.execute(
+            "SELECT 'renewals', SUM(value) FROM admin_counters WHERE name = 'renewals' AND bucket BETWEEN ? AND ? "
+            "UNION ALL SELECT 'feedback_day', SUM(value) FROM admin_counters WHERE name = 'feedback_day' AND bucket BETWEEN ? AND ?",
+            (start, end, since, start)):
+        key = f'renewals_next_{days}_days' if name == 'renewals' else f'feedback_last_{days}_days'
+        out[key] = value or 0
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check (or rebuild) the admin summary counters.')
+    parser.add_argument('--db', default='togetherly.db')
+    parser.add_argument('--rebuild', action='store_true', help='replace the counters with recomputed values')
+    args = parser.parse_args(argv)
+    conn = sqlite3.connect(args.db)
+    try:
+        conn.executescript(SCHEMA)
+        bad = check(conn)
+        for m in bad:
+            print(f"{m['name']}[{m['bucket']}]: stored {m['stored']}, actual {m['actual']}")
+        if bad and args.rebuild:
+            rebuild(conn)
+            conn.commit()
+            print('rebuilt')
+        elif not bad:
+            print('counters consistent')
+    finally:
+        conn.close()
+    return 1 if bad and not args.rebuild else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
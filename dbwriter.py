@@ -0,0 +1,205 @@
+"""Single SQLite writer with group commit.
+
+Request handlers, webhooks and background jobs hand their writes to one
+writer thread per database instead of committing on their own
+connections. The thread takes the first queued operation and gathers more
+for up to DB_WRITE_DELAY_MS or DB_WRITE_BATCH operations. It runs them in
+one transaction, each under its own savepoint so one failing operation
+does not undo its neighbours. After a single COMMIT it resolves every
+caller's Future.
+
+Durability is chosen per operation:
+  NORMAL  grouped; committed with synchronous=NORMAL, which in WAL mode
+          survives a process crash but may lose the last commits on power loss
+  FULL    flushes the group at once and commits it with synchronous=FULL
+          (billing state, anything a third party will not resend)
+
+Operations are callables taking the writer's connection; they must not
+commit or roll back themselves. A `trace` passed with an operation is a
+sqltrace.QueryTracer; it sees the statements the operation runs, with the
+same execute() call boundaries as a request connection.
+"""
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+NORMAL = 'normal'
+FULL = 'full'
+
+_STOP = object()
+
+
+class _Op:
+    __slots__ = ('fn', 'durability', 'trace', 'future')
+
+    def __init__(self, fn, durability, trace=None):
+        self.fn = fn
+        self.durability = durability
+        self.trace = trace
+        self.future = Future()
+
+
+class _Connection(sqlite3.Connection):
+    # marks execute() boundaries for the tracer of the operation being run
+    tracer = None
+
+    def _traced(self, fn, *args):
+        tracer = self.tracer
+        if tracer is None:
+            return fn(*args)
+        token = tracer.begin_call()
+        try:
+            return fn(*args)
+        finally:
+            tracer.end_call(token)
+
+    def execute(self, sql, parameters=()):
+        return self._traced(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._traced(super().executemany, sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self._traced(super().executescript, sql_script)
+
+
+class Writer:
+    def __init__(self, path, max_batch=None, max_delay=None):
+        self.path = path
+        self.max_batch = max_batch or int(os.getenv('DB_WRITE_BATCH', '64'))
+        self.max_delay = (max_delay if max_delay is not None else float(os.getenv('DB_WRITE_DELAY_MS', '2'))) / 1000
+        self.commits = 0
+        self.ops = 0
+        self._queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, durability=NORMAL, trace=None):
+        """Queue `fn(conn)`; the returned Future resolves to its result once the group is committed."""
+        if self._closed:
+            raise RuntimeError('writer is closed')
+        op = _Op(fn, durability, trace)
+        self._queue.put(op)
+        return op.future
+
+    def execute(self, sql, params=(), durability=NORMAL, trace=None):
+        """Queue one statement; the Future resolves to the cursor's rowcount."""
+        return self.submit(lambda conn: conn.execute(sql, params).rowcount, durability, trace)
+
+    def close(self, timeout=5):
+        """Commit whatever is queued and stop the thread."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, timeout=30, factory=_Connection)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _run(self):
+        conn = self._connect()
+        stopping = False
+        try:
+            while not stopping:
+                op = self._queue.get()
+                if op is _STOP:
+                    break
+                group = [op]
+                full = op.durability == FULL
+                deadline = time.monotonic() + self.max_delay
+                while len(group) < self.max_batch and not full:
+                    remaining = deadline - time.monotonic()
+                    try:
+                        nxt = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if nxt is _STOP:
+                        stopping = True
+                        break
+                    group.append(nxt)
+                    full = nxt.durability == FULL
+                self._commit(conn, group, full)
+            # anything submitted before close() still gets written
+            while True:
+                try:
+                    op = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if op is not _STOP:
+                    self._commit(conn, [op], op.durability == FULL)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _trace(conn, tracer):
+        conn.tracer = tracer
+        conn.set_trace_callback(tracer._on_statement if tracer is not None else None)
+
+    def _commit(self, conn, group, full):
+        outcomes = []
+        try:
+            if full:
+                conn.execute('PRAGMA synchronous=FULL')
+            conn.execute('BEGIN IMMEDIATE')
+            for op in group:
+                conn.execute('SAVEPOINT op')
+                self._trace(conn, op.trace)
+                try:
+                    outcomes.append((op, op.fn(conn), None))
+                    self._trace(conn, None)
+                    conn.execute('RELEASE op')
+                except Exception as e:
+                    self._trace(conn, None)
+                    conn.execute('ROLLBACK TO op')
+                    conn.execute('RELEASE op')
+                    outcomes.append((op, None, e))
+            conn.execute('COMMIT')
+        except Exception as e:
+            try:
+                conn.execute('ROLLBACK')
+            except Exception:
+                pass
+            for op in group:
+                if not op.future.done():
+                    op.future.set_exception(e)
+            return
+        finally:
+            if full:
+                try:
+                    conn.execute('PRAGMA synchronous=NORMAL')
+                except Exception:
+                    pass
+        self.commits += 1
+        self.ops += len(group)
+        for op, result, error in outcomes:
+            if error is not None:
+                op.future.set_exception(error)
+            else:
+                op.future.set_result(result)
+
+
+_writer = None
+_lock = threading.Lock()
+
+
+def get(path):
+    """The writer for database `path`; switching paths (tests) closes the previous writer."""
+    global _writer
+    w = _writer
+    if w is not None and w.path == path and not w._closed:
+        return w
+    with _lock:
+        w = _writer
+        if w is None or w.path != path or w._closed:
+            if w is not None:
+                w.close()
+            w = _writer = Writer(path)
+        return w
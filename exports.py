@@ -0,0 +1,117 @@
+"""Streaming calendar exports (CSV, iCalendar, JSON Lines).
+
+Each writer consumes an iterator of posts (generator.iter_posts) and yields
+text chunks, so memory stays flat regardless of calendar length.
+"""
+import csv
+import io
+import json
+from datetime import date, datetime, timedelta, timezone
+
+CSV_FIELDS = ['date', 'day_index', 'platform', 'pillar', 'caption', 'image_prompt', 'image_url',
+              'reel_hook', 'reel_script', 'reel_shot_list', 'reel_hashtags']
+
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ics': ('text/calendar', 'ics'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+}
+
+
+def buffered(chunks, size=16384):
+    """Coalesce small chunks into ~size-character pieces; the first chunk is passed through immediately."""
+    buf = []
+    n = 0
+    first = True
+    for chunk in chunks:
+        if first:
+            first = False
+            yield chunk
+            continue
+        buf.append(chunk)
+        n += len(chunk)
+        if n >= size:
+            yield ''.join(buf)
+            buf = []
+            n = 0
+    if buf:
+        yield ''.join(buf)
+
+
+def iter_jsonl(posts):
+    for post in posts:
+        yield json.dumps(post, ensure_ascii=False) + '\n'
+
+
+def iter_csv(posts):
+    out = io.StringIO()
+    writer = csv.writer(out)
+
+    def take():
+        text = out.getvalue()
+        out.seek(0)
+        out.truncate()
+        return text
+
+    writer.writerow(CSV_FIELDS)
+    yield take()
+    for post in posts:
+        reel = post.get('reel') or {}
+        writer.writerow([
+            post['date'], post['day_index'], post['platform'], post['pillar'], post['caption'],
+            post['image_prompt'], post['image_url'] or '',
+            reel.get('hook', ''),
+            '\n'.join(reel.get('script_beats') or []),
+            '\n'.join(reel.get('shot_list') or []),
+            ' '.join(reel.get('hashtags') or []),
+        ])
+        yield take()
+
+
+def _ics_escape(text):
+    return (text or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\r\n', '\\n').replace('\n', '\\n')
+
+
+def _ics_line(line):
+    """Fold a content line at 75 octets as RFC 5545 requires."""
+    raw = line.encode('utf-8')
+    if len(raw) <= 75:
+        return line + '\r\n'
+    parts = []
+    limit = 75
+    while raw:
+        cut = min(limit, len(raw))
+        # don't split a multi-byte UTF-8 sequence
+        while cut < len(raw) and (raw[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(raw[:cut].decode('utf-8'))
+        raw = raw[cut:]
+        limit = 74  # continuation lines start with a space
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def iter_ics(posts, calendar_name='Togetherly content calendar'):
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    yield ''.join(_ics_line(l) for l in (
+        'BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//Togetherly//Content Calendar//EN',
+        'CALSCALE:GREGORIAN', f'X-WR-CALNAME:{_ics_escape(calendar_name)}',
+    ))
+    for post in posts:
+        day = date.fromisoformat(post['date'])
+        lines = [
+            'BEGIN:VEVENT',
+            f"UID:{post['date']}-{post['day_index']}-{post['platform']}@togetherly",
+            f'DTSTAMP:{stamp}',
+            f'DTSTART;VALUE=DATE:{day.strftime("%Y%m%d")}',
+            f'DTEND;VALUE=DATE:{(day + timedelta(days=1)).strftime("%Y%m%d")}',
+            f"SUMMARY:{_ics_escape(post['platform'].capitalize() + ' • ' + post['pillar'])}",
+            f"DESCRIPTION:{_ics_escape(post['caption'])}",
+        ]
+        if post.get('image_url'):
+            lines.append(f"URL:{post['image_url']}")
+        lines.append('END:VEVENT')
+        yield ''.join(_ics_line(l) for l in lines)
+    yield _ics_line('END:VCALENDAR')
+
+
+WRITERS = {'csv': iter_csv, 'ics': iter_ics, 'jsonl': iter_jsonl}
@@ -1,225 +1,339 @@
+import hashlib
+import json
 from datetime import date, timedelta
+from time import perf_counter
 from typing import Optional
 
-PILLARS_BY_DEFAULT = [
-    ("Educational", "Share a quick tip that solves a common problem for your audience."),
-    ("Behind-the-Scenes", "Show a candid look at your process, team, or workspace."),
-    ("Testimonial/Social Proof", "Share a short customer quote and the outcome they achieved."),
-    ("Product/Offer", "Highlight one offering with benefits, price (optional), and CTA."),
-    ("Engagement", "Ask a question or run a simple poll to spark comments."),
-    ("Story", "Tell a brief story of a challenge → action → result."),
-]
-
-PLATFORM_HINTS = {
-    "instagram": "Keep it visual, 1–2 short paragraphs, 8–12 niche hashtags.",
-    "facebook": "Conversational tone, 2–3 short paragraphs. Invite replies.",
-    "linkedin": "Value-forward, concise, 1–2 actionable insights, 3–6 hashtags.",
-    "tiktok": "Hook in first sentence, keep lines punchy, suggest a shot list.",
-    "twitter": "Short & punchy. 1–2 tweets per post; avoid walls of text.",
-}
+from hashtags import get_index as hashtag_index
+import captions
+import metrics
 
 def default_hashtags(industry: str, niche_keywords: list[str]):
-    base = [f"#{industry.replace(' ', '')[:18]}", "#SmallBusiness", "#LocalBiz", "#BehindTheScenes", "#Tips"]
-    extra = [f"#{k.strip().replace(' ', '')[:18]}" for k in niche_keywords if k.strip()]
-    seen = set()
-    tags = []
-    for t in base + extra:
-        t_low = t.lower()
-        if t_low not in seen:
-            tags.append(t)
-            seen.add(t_low)
-    return tags[:12]
+    return hashtag_index().tags(industry, niche_keywords)
 
 def to_sentence_case(s: str):
     if not s: return s
     return s[0].upper() + s[1:]
 
-def make_caption(industry: str, tone: str, pillar_name: str, pillar_hint: str,
-                 platform: str, brand_keywords: list[str], hashtags: list[str], goals: list[str], company: str = ""):
-    tone_blurb = {
-        "friendly": "Warm, encouraging, and conversational.",
-        "professional": "Clear, confident, and value-focused.",
-        "playful": "Upbeat, witty, and a bit cheeky.",
-        "inspirational": "Uplifting, thoughtful, and mission-driven."
-    }.get(tone.lower(), "Conversational and helpful.")
-
-    platform_hint = PLATFORM_HINTS.get(platform.lower(), "Make it concise and useful.")
-    brand_line = f" ({', '.join(brand_keywords)})" if brand_keywords else ""
-    goal_line = f"Focus: {', '.join(goals)}." if goals else ""
-
-    company_line = f"From {company}." if company else ""
-    body = (
-        f"{pillar_name} • {industry}{brand_line}\n"
-        f"{pillar_hint}\n\n"
-        f"{company_line}\n"
-        f"{goal_line}\n"
-        f"Tone: {tone_blurb}\n"
-        f"Platform tip: {platform_hint}\n\n"
-        f"CTA: Tell us what you think below 👇"
-    )
-
-    tags = " ".join(hashtags)
-    return f"{body}\n\n{tags}"
-
-def image_prompt(industry: str, pillar_name: str, brand_keywords: list[str], company: str = ""):
-    kw = ", ".join(brand_keywords) if brand_keywords else "on-brand colors"
-    company_part = f"Company: {company}. " if company else ""
-    return (f"High-quality photo for social post. {company_part}Industry: {industry}. "
-            f"Content pillar: {pillar_name}. Style: natural light, minimal background, {kw}.")
-
-def make_reel_plan(industry: str, pillar_name: str, brand_keywords: list[str], tone: str, company: str = "", reel_style: Optional[str] = None):
-    # structured reel plan; supports a basic `reel_style` preference when provided
-    style = (reel_style or "Face-camera tips")
-    # pick some hooks based on style
-    hooks_map = {
-        "Face-camera tips": [
-            "3 mistakes costing you customers 👇",
-            "Try this before your next post…",
-            "The 30-second fix for engagement"
-        ],
-        "Property b-roll + captions": [
-            f"Inside this {industry} feature in 30s 🏡",
-            "3 features you’ll miss if you scroll fast…",
-            "Before/After: tiny changes, big feel"
-        ],
-        "Product b-roll + captions": [
-            f"Check out this {pillar_name} in 30s ✨",
-            "3 reasons customers love this…",
-            "Quick tour: what makes it special"
-        ],
-        "Local hotspot montage": [
-            f"Spend a perfect morning in {pillar_name} ☀️",
-            "Hidden gem you’ve gotta try…",
-            "Locals know this trick 🤫"
-        ],
-        "Story + before/after": [
-            "From idea → launch in 30s",
-            "We almost gave up—then this happened",
-            "Tiny change → big result"
-        ],
-        "Workout montage": [
-            "Quick 3-move sequence to level up your routine",
-            "Try this superset for max results",
-            "Short challenge: do 3 rounds"
-        ]
+def caption_context(industry: str, tone: str, brand_keywords: list[str], hashtags: list[str], goals: list[str],
+                    company: str = "", tpl: Optional[captions.TemplateSet] = None):
+    """Caption template values that are the same for every post of a calendar."""
+    tpl = tpl or captions.current()
+    return {
+        "industry": industry,
+        "brand_line": f" ({', '.join(brand_keywords)})" if brand_keywords else "",
+        "company_line": f"From {company}." if company else "",
+        "goal_line": f"Focus: {', '.join(goals)}." if goals else "",
+        "tone_blurb": tpl.tone_blurb(tone),
+        "tags": " ".join(hashtags),
     }
 
-    chosen_hooks = hooks_map.get(style) or hooks_map.get("Face-camera tips")
-    if not chosen_hooks:
-        chosen_hooks = hooks_map["Face-camera tips"]
-    hook = chosen_hooks[0]
+def make_caption(industry: str, tone: str, pillar_name: str, pillar_hint: str,
+                 platform: str, brand_keywords: list[str], hashtags: list[str], goals: list[str], company: str = ""):
+    tpl = captions.current()
+    ctx = caption_context(industry, tone, brand_keywords, hashtags, goals, company, tpl)
+    ctx.update(pillar_name=pillar_name, pillar_hint=pillar_hint, platform_hint=tpl.platform_hint(platform))
+    return tpl.caption.render(ctx)
 
-    # script beats: timestamps for a ~30–40s reel
-    beats = [
-        {"t": "0-3s",  "osd": "Hook", "line": hook},
-        {"t": "3-10s", "osd": "Point 1", "line": "Problem your audience feels + quick promise."},
-        {"t": "10-20s","osd": "Point 2", "line": "One actionable tip aligned to your goals."},
-        {"t": "20-30s","osd": "Point 3", "line": "Example or mini story to make it real."},
-        {"t": "30-40s","osd": "CTA", "line": "Comment a question / DM for help / Check link in bio."}
-    ]
-
-    shot_map = {
-        "Face-camera tips": [
-            "Front-facing A-roll, eye-level, natural light",
-            "Cutaways: screen recording, product close-up",
-            "End with CTA text overlay"
-        ],
-        "Property b-roll + captions": [
-            "Exterior wide → entry → kitchen → feature highlight",
-            "Quick pans, 0.8x speed ramp between rooms",
-            "On-screen captions for each highlight"
-        ],
-        "Product b-roll + captions": [
-            "Wide shot → detail close-ups → demo",
-            "Match edits to beat; short clips per feature",
-            "Add caption overlays for key specs"
-        ],
-        "Local hotspot montage": [
-            "Sign → interior → hero item → smiling staff → crowd",
-            "Match cuts to beat; 0.5s–1.0s per clip",
-            "End with text: name + location"
-        ],
-        "Story + before/after": [
-            "Talking head intro",
-            "B-roll: before clip/photos",
-            "After reveal with text overlay"
-        ],
-        "Workout montage": [
-            "Demonstration A-roll",
-            "Close-ups on form",
-            "Speed ramps and finishing CTA"
-        ]
-    }
+def image_prompt(industry: str, pillar_name: str, brand_keywords: list[str], company: str = "",
+                 tpl: Optional[captions.TemplateSet] = None):
+    return (tpl or captions.current()).image_prompt.render({
+        "industry": industry,
+        "pillar_name": pillar_name,
+        "keywords": ", ".join(brand_keywords) if brand_keywords else "on-brand colors",
+        "company_part": f"Company: {company}. " if company else "",
+    })
 
-    shot_list = shot_map.get(style, ["Talking head + a few cutaways, end with CTA"])
+def make_reel_plan(industry: str, pillar_name: str, brand_keywords: list[str], tone: str, company: str = "", reel_style: Optional[str] = None,
+                   hashtags: Optional[list[str]] = None, tpl: Optional[captions.TemplateSet] = None):
+    # structured reel plan; supports a basic `reel_style` preference when provided
+    tpl = tpl or captions.current()
+    style = (reel_style or tpl.default_reel_style)
+    known = tpl.reel_styles.get(style)
+    values = {"industry": industry, "pillar_name": pillar_name, "style": style, "tone": tone}
+    values["hook"] = hook = (known or tpl.reel_styles[tpl.default_reel_style]).hooks[0].render(values)
 
-    hashtags = default_hashtags(industry, brand_keywords)
-    thumb_prompt = f"Portrait thumbnail: {industry} • {style}. Clean bold text, high contrast, subject centered."
+    # script beats: timestamps for a ~30–40s reel
+    beats = [{"t": t, "osd": osd, "line": line.render(values)} for t, osd, line in tpl.beats]
+    hashtags = list(hashtags) if hashtags is not None else default_hashtags(industry, brand_keywords)
 
     return {
         "style": style,
         "hook": hook,
         "beats": beats,
-        "script_beats": [b.get('line') if isinstance(b, dict) else b for b in beats],
-        "shot_list": shot_list,
-        "on_screen_text": [b.get('osd') for b in beats],
+        "script_beats": [b["line"] for b in beats],
+        "shot_list": list(known.shots if known else tpl.fallback_shots),
+        "on_screen_text": [b["osd"] for b in beats],
         "hashtags": hashtags,
-        "cta": "Comment / DM / Link in bio",
-        "thumbnail_prompt": thumb_prompt,
-        "srt_prompt": f"Generate SRT subtitles for a ~30-40s reel about {pillar_name} in {industry}. Tone: {tone}."
+        "cta": tpl.reel_cta,
+        "thumbnail_prompt": tpl.thumbnail_prompt.render(values),
+        "srt_prompt": tpl.srt_prompt.render(values),
     }
 
 def unsplash_link(industry: str, pillar_name: str):
     q = f"{industry} {pillar_name}".replace(" ", "+")
     return f"https://source.unsplash.com/featured/?{q}"
 
-def rolling_pillars():
+def pillar_for_day(day: int, tpl: Optional[captions.TemplateSet] = None):
+    """Pillar for 0-based calendar day `day`; same rotation as a full run, in O(1)."""
+    pillars = (tpl or captions.current()).pillars
+    return pillars[day % len(pillars)]
+
+def rolling_pillars(start: int = 0):
+    pillars = captions.current().pillars
+    n = len(pillars)
+    i = start % n
     while True:
-        for name, hint in PILLARS_BY_DEFAULT:
-            yield (name, hint)
+        yield pillars[i]
+        i = (i + 1) % n
 
-def generate_posts(days: int, start_day, industry: str, tone: str,
-                   platforms: list[str], brand_keywords: list[str],
-                   include_images: bool, niche_keywords: list[str], goals: list[str], company: str = "", details: Optional[dict] = None):
-    posts = []
-    pillar_stream = rolling_pillars()
-    hashtags = default_hashtags(industry, niche_keywords)
+def params_from_payload(data: dict):
+    """Map a /api/generate style JSON payload to generate_posts keyword arguments."""
+    start_iso = data.get("start_date")
+    try:
+        start_day = date.fromisoformat(start_iso) if start_iso else date.today()
+    except Exception:
+        start_day = date.today()
+    return {
+        "days": int(data.get("days", 30)),
+        "start_day": start_day,
+        "industry": data.get("industry", "Business"),
+        "tone": data.get("tone", "friendly"),
+        "platforms": data.get("platforms", ["instagram"]),
+        "brand_keywords": data.get("brand_keywords", []),
+        "niche_keywords": data.get("niche_keywords", []),
+        "goals": data.get("goals", []),
+        "details": data.get("details", {}),
+        "include_images": bool(data.get("include_images", True)),
+        "company": data.get("company", ""),
+    }
+
+# Profile inputs (generate_posts arguments) each post field is computed from.
+# update_posts() recomputes only the fields whose inputs changed. `days` and
+# `platforms` decide which posts exist at all, so a change to either (or to
+# the templates) regenerates the calendar; day_index, platform and pillar
+# depend on nothing else.
+FIELD_DEPENDENCIES = {
+    "date": ("start_day",),
+    "day_index": (),
+    "platform": (),
+    "pillar": (),
+    "caption": ("industry", "tone", "brand_keywords", "niche_keywords", "goals", "company"),
+    "image_prompt": ("industry", "brand_keywords", "company"),
+    "image_url": ("industry", "include_images"),
+    "reel": ("industry", "tone", "brand_keywords", "company", "details"),
+}
+STRUCTURAL_INPUTS = ("days", "platforms", "offset")
+
+def _reel_style(details):
+    try:
+        return (details or {}).get('reel_style')
+    except Exception:
+        return None
+
+class _Renderer:
+    """Memoised field renderers for one calendar's inputs and template snapshot.
+
+    Captions, prompts and reel plans only vary by pillar and platform, so each
+    distinct one is rendered once per calendar.
+    """
 
-    for i in range(days):
+    def __init__(self, industry: str, tone: str, brand_keywords: list[str], include_images: bool,
+                 niche_keywords: list[str], goals: list[str], company: str = "", details: Optional[dict] = None,
+                 tpl: Optional[captions.TemplateSet] = None, **_):
+        self.tpl = tpl or captions.current()
+        self.industry = industry
+        self.tone = tone
+        self.brand_keywords = brand_keywords
+        self.include_images = include_images
+        self.niche_keywords = niche_keywords
+        self.goals = goals
+        self.company = company
+        self.reel_style = _reel_style(details)
+        self.n_pillars = len(self.tpl.pillars)
+        self._tags = None
+        self._ctx = None
+        self._captions = {}
+        self._prompts = {}
+        self._urls = {}
+        self._reels = {}
+
+    def hashtags(self):
+        """(post tags, reel tags), looked up once."""
+        if self._tags is None:
+            index = hashtag_index()
+            self._tags = (index.tags(self.industry, self.niche_keywords), index.tags(self.industry, self.brand_keywords))
+        return self._tags
+
+    def caption(self, k: int, platform: str):
+        caption = self._captions.get((k, platform))
+        if caption is None:
+            tpl = self.tpl
+            if self._ctx is None:
+                self._ctx = caption_context(to_sentence_case(self.industry.strip() or "Business"), self.tone,
+                                            self.brand_keywords, self.hashtags()[0], self.goals, self.company, tpl)
+            pillar_name, pillar_hint = tpl.pillars[k]
+            self._ctx.update(pillar_name=pillar_name, pillar_hint=pillar_hint, platform_hint=tpl.platform_hint(platform))
+            caption = self._captions[(k, platform)] = tpl.caption.render(self._ctx)
+        return caption
+
+    def image_prompt(self, k: int):
+        prompt = self._prompts.get(k)
+        if prompt is None:
+            prompt = self._prompts[k] = image_prompt(self.industry, self.tpl.pillars[k][0], self.brand_keywords,
+                                                     self.company, self.tpl)
+        return prompt
+
+    def image_url(self, k: int):
+        if not self.include_images:
+            return None
+        url = self._urls.get(k)
+        if url is None:
+            url = self._urls[k] = unsplash_link(self.industry, self.tpl.pillars[k][0])
+        return url
+
+    def reel(self, k: int, platform: str):
+        """The reel plan for pillar `k`, or None if `platform` has no reels.
+
+        The dict is a shallow copy of the memoised plan: its lists and the beat dicts are shared
+        with every other post for pillar `k` and must not be mutated.
+        """
+        if platform.lower() not in self.tpl.reel_platforms:
+            return None
+        plan = self._reels.get(k)
+        if plan is None:
+            plan = self._reels[k] = make_reel_plan(self.industry, self.tpl.pillars[k][0], self.brand_keywords, self.tone,
+                                                   self.company, self.reel_style, self.hashtags()[1], self.tpl)
+        return dict(plan)
+
+def iter_posts(days: int, start_day, industry: str, tone: str,
+               platforms: list[str], brand_keywords: list[str],
+               include_images: bool, niche_keywords: list[str], goals: list[str], company: str = "", details: Optional[dict] = None,
+               offset: int = 0):
+    """Yield posts one at a time for `days` days, starting `offset` days into the calendar that begins on `start_day`.
+
+    Memory use is independent of calendar length; generate_posts() is the list form.
+    """
+    # one template snapshot per calendar
+    r = _Renderer(industry, tone, brand_keywords, include_images, niche_keywords, goals, company, details)
+    t0 = perf_counter()
+    r.hashtags()
+    t_hashtags = perf_counter() - t0
+    t_caption = t_image = t_reel = 0.0
+    pillars = r.tpl.pillars
+    n_pillars = r.n_pillars
+
+    for i in range(offset, offset + days):
         day = start_day + timedelta(days=i)
-        pillar_name, pillar_hint = next(pillar_stream)
+        k = i % n_pillars
+        pillar_name = pillars[k][0]
         for p in platforms:
-            caption = make_caption(
-                industry=to_sentence_case(industry.strip() or "Business"),
-                tone=tone,
-                pillar_name=pillar_name,
-                pillar_hint=pillar_hint,
-                platform=p,
-                brand_keywords=brand_keywords,
-                hashtags=hashtags,
-                goals=goals,
-                company=company
-            )
-            iprompt = image_prompt(industry, pillar_name, brand_keywords, company)
-            img_url = unsplash_link(industry, pillar_name) if include_images else None
-
-            reel_obj = None
-            if p.lower() in ["instagram", "tiktok", "short_video"]:
-                reel_style = None
-                try:
-                    reel_style = (details or {}).get('reel_style')
-                except Exception:
-                    reel_style = None
-                reel_obj = make_reel_plan(industry, pillar_name, brand_keywords, tone, company, reel_style)
-
-            posts.append({
+            t0 = perf_counter()
+            caption = r.caption(k, p)
+            t1 = perf_counter()
+            prompt = r.image_prompt(k)
+            url = r.image_url(k)
+            t2 = perf_counter()
+            reel_obj = r.reel(k, p)
+            t3 = perf_counter()
+            t_caption += t1 - t0
+            t_image += t2 - t1
+            t_reel += t3 - t2
+
+            yield {
                 "date": day.isoformat(),
                 "day_index": i + 1,
                 "platform": p,
                 "pillar": pillar_name,
                 "caption": caption,
-                "image_prompt": iprompt,
-                "image_url": img_url,
+                "image_prompt": prompt,
+                "image_url": url,
                 "reel": reel_obj
-            })
-    return posts
+            }
+    # one observation per stage per calendar keeps recording off the per-post path
+    metrics.generator_stage_duration.observe(t_hashtags, "hashtags")
+    metrics.generator_stage_duration.observe(t_caption, "caption")
+    metrics.generator_stage_duration.observe(t_image, "image")
+    metrics.generator_stage_duration.observe(t_reel, "reel")
+
+def generate_posts(days: int, start_day, industry: str, tone: str,
+                   platforms: list[str], brand_keywords: list[str],
+                   include_images: bool, niche_keywords: list[str], goals: list[str], company: str = "", details: Optional[dict] = None,
+                   offset: int = 0):
+    """Generate `days` days of posts, starting `offset` days into the calendar that begins on `start_day`."""
+    return list(iter_posts(days, start_day, industry, tone, platforms, brand_keywords, include_images,
+                           niche_keywords, goals, company, details, offset))
+
+def changed_inputs(old: dict, new: dict):
+    """Names of generate_posts arguments that differ between two parameter dicts.
+
+    `details` only counts as changed when the reel style it selects does.
+    """
+    out = set()
+    for name in set(old) | set(new):
+        a, b = old.get(name), new.get(name)
+        if name == "details":
+            a, b = _reel_style(a), _reel_style(b)
+        if a != b:
+            out.add(name)
+    return out
+
+def affected_fields(inputs):
+    """Post fields whose FIELD_DEPENDENCIES include any of `inputs`."""
+    return [f for f, deps in FIELD_DEPENDENCIES.items() if not inputs.isdisjoint(deps)]
+
+def update_posts(posts: list[dict], old: dict, new: dict, regenerate: bool = False):
+    """Bring `posts`, generated from parameters `old`, up to date with parameters `new`.
+
+    Only fields that depend on a changed input are recomputed. A change to a
+    structural input, or `regenerate=True` (the templates changed), builds the
+    calendar afresh. Returns (posts, changed): the updated list and the
+    indices of posts that differ from the originals.
+    """
+    inputs = changed_inputs(old, new)
+    if regenerate or not inputs.isdisjoint(STRUCTURAL_INPUTS):
+        fresh = generate_posts(**new)
+        return fresh, [i for i, post in enumerate(fresh) if i >= len(posts) or posts[i] != post]
+    fields = affected_fields(inputs)
+    if not fields:
+        return list(posts), []
+    r = _Renderer(**new)
+    start_day = new["start_day"]
+    out, changed = [], []
+    for i, post in enumerate(posts):
+        day = post["day_index"] - 1
+        k = day % r.n_pillars
+        p = post["platform"]
+        updated = dict(post)
+        for field in fields:
+            if field == "date":
+                updated["date"] = (start_day + timedelta(days=day)).isoformat()
+            elif field == "caption":
+                updated["caption"] = r.caption(k, p)
+            elif field == "image_prompt":
+                updated["image_prompt"] = r.image_prompt(k)
+            elif field == "image_url":
+                updated["image_url"] = r.image_url(k)
+            elif field == "reel":
+                updated["reel"] = r.reel(k, p)
+        if updated != post:
+            changed.append(i)
+        out.append(updated)
+    return out, changed
+
+_stamp = (None, None, None)
+
+def content_stamp():
+    """Short hash of the templates and hashtag config the generator currently renders from.
+
+    A stored calendar whose stamp differs was rendered from older content and
+    needs a full regeneration rather than a field update.
+    """
+    global _stamp
+    tpl_source, tag_source = captions.current().source, hashtag_index().source
+    cached = _stamp
+    if cached[0] is tpl_source and cached[1] is tag_source:
+        return cached[2]
+    digest = hashlib.sha1(json.dumps([tpl_source, tag_source], sort_keys=True, default=str).encode()).hexdigest()[:16]
+    _stamp = (tpl_source, tag_source, digest)
+    return digest
@@ -0,0 +1,109 @@
+"""Hashtag index built from the content pack.
+
+For each industry in config.json the index holds the base tags and the
+normalised `suggested_keywords` as ready-made candidates, so assembling the
+tags for a calendar is a dict lookup plus a short merge. User keywords are
+normalised once and memoised. The index is rebuilt (and swapped in whole)
+when content.config() returns a new object, i.e. when config.json changes.
+"""
+import threading
+
+import content
+
+GENERIC_TAGS = ("#SmallBusiness", "#LocalBiz", "#BehindTheScenes", "#Tips")
+MAX_TAGS = 12
+_MEMO_LIMIT = 4096
+
+
+def normalize_tag(keyword: str):
+    """'open house ' -> '#openhouse' (spaces removed, capped at 18 characters), or None if blank."""
+    k = (keyword or "").strip()
+    if not k:
+        return None
+    return "#" + k.replace(" ", "")[:18]
+
+
+class _Industry:
+    __slots__ = ("base", "seen", "suggested")
+
+    def __init__(self, name, suggested=()):
+        base = []
+        seen = set()
+        for tag in (f"#{name.replace(' ', '')[:18]}",) + GENERIC_TAGS:
+            if tag.lower() not in seen:
+                base.append(tag)
+                seen.add(tag.lower())
+        self.base = tuple(base)
+        self.seen = frozenset(seen)
+        self.suggested = tuple(suggested)
+
+
+class HashtagIndex:
+    def __init__(self, config):
+        self.source = config
+        self._industries = {}
+        self._resolved = {}
+        self._keywords = {}
+        for ind in (config or {}).get("industries") or []:
+            suggested = []
+            for kw in ind.get("suggested_keywords") or []:
+                tag = normalize_tag(kw)
+                if tag:
+                    suggested.append((tag, tag.lower()))
+            for name in (ind.get("label"), ind.get("key")):
+                if name:
+                    self._industries[name.lower()] = suggested
+
+    def _keyword(self, keyword):
+        entry = self._keywords.get(keyword)
+        if entry is None:
+            tag = normalize_tag(keyword)
+            entry = (tag, tag.lower()) if tag else ()
+            if len(self._keywords) >= _MEMO_LIMIT:
+                self._keywords.clear()
+            self._keywords[keyword] = entry
+        return entry
+
+    def industry(self, industry: str):
+        """Base tags and suggested candidates for `industry` (matched by config label or key)."""
+        entry = self._resolved.get(industry)
+        if entry is None:
+            known = self._industries.get(industry.strip().lower())
+            entry = _Industry(industry, known or ())
+            if len(self._resolved) >= _MEMO_LIMIT:
+                self._resolved.clear()
+            self._resolved[industry] = entry
+        return entry
+
+    def tags(self, industry: str, keywords=(), limit: int = MAX_TAGS):
+        """Base tags, then the user's keywords, then the industry's suggested keywords; deduped, at most `limit`."""
+        ind = self.industry(industry)
+        out = list(ind.base)
+        seen = set(ind.seen)
+        for kw in keywords or ():
+            entry = self._keyword(kw)
+            if entry and entry[1] not in seen:
+                out.append(entry[0])
+                seen.add(entry[1])
+        for tag, low in ind.suggested:
+            if low not in seen:
+                out.append(tag)
+                seen.add(low)
+        return out[:limit]
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def get_index():
+    """The current index, rebuilt when the content pack's config changes."""
+    global _index
+    cfg = content.config()
+    idx = _index
+    if idx is None or idx.source is not cfg:
+        with _lock:
+            idx = _index
+            if idx is None or idx.source is not cfg:
+                idx = _index = HashtagIndex(cfg)
+    return idx
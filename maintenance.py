@@ -0,0 +1,331 @@
+"""Periodic database maintenance.
+
+Each run works through these tasks in order until its time budget
+(MAINT_BUDGET_SECONDS) is spent:
+
+  purge_tokens       delete expired password reset tokens
+  compact_reconcile  drop per-row reconcile_results of finished jobs older than
+                     MAINT_JOB_RETENTION_DAYS, then move the jobs' summaries to
+                     reconcile_jobs_archive
+  purge_generate     delete finished generate jobs (and their stored calendars)
+                     older than MAINT_GENERATE_RETENTION_HOURS
+  archive_feedback   move feedback older than MAINT_FEEDBACK_RETENTION_DAYS to feedback_archive
+  prune_counters     drop admin_counters rows that have fallen to zero
+  optimize           PRAGMA optimize (ANALYZE where the planner needs it), with analysis_limit
+  checkpoint         PASSIVE WAL checkpoint; never waits for readers
+  incremental_vacuum return up to MAINT_VACUUM_PAGES free pages to the filesystem
+
+Row deletions go through the shared writer in batches of MAINT_BATCH, so a
+run never holds the write lock for long. The budget is checked between
+batches. Tasks that did not fit are listed under `skipped` and run next
+time. Each run logs and returns a report of what it reclaimed.
+
+The app runs maintenance every MAINT_INTERVAL_SECONDS (0 disables this). A
+run is claimed in maintenance_runs first, so with several workers only
+one of them runs per interval. To run it by hand:
+
+    python maintenance.py [--db togetherly.db] [--budget 30] [--enable-incremental-vacuum]
+"""
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import dbwriter
+
+log = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reconcile_jobs_archive (
+    id TEXT PRIMARY KEY,
+    status TEXT,
+    total INTEGER,
+    processed INTEGER,
+    changed INTEGER,
+    errors INTEGER,
+    error TEXT,
+    started_at DATETIME,
+    finished_at DATETIME,
+    created_at DATETIME,
+    archived_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS feedback_archive (
+    id INTEGER PRIMARY KEY,
+    profile_id TEXT,
+    post_day INTEGER,
+    platform TEXT,
+    rating INTEGER,
+    note TEXT,
+    created_at DATETIME,
+    archived_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS maintenance_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    finished_at DATETIME,
+    report TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_feedback_created ON feedback(created_at);
+CREATE INDEX IF NOT EXISTS idx_reconcile_jobs_created ON reconcile_jobs(created_at);
+CREATE INDEX IF NOT EXISTS idx_generate_jobs_created ON generate_jobs(created_at);
+"""
+
+
+def _env(name, default):
+    try:
+        return float(os.getenv(name, ''))
+    except ValueError:
+        return default
+
+
+def _sql_time(dt):
+    # the format CURRENT_TIMESTAMP defaults use, so cutoffs compare as text
+    return dt.strftime('%Y-%m-%d %H:%M:%S')
+
+
+class _Run:
+    def __init__(self, db_path, budget, now, writer):
+        self.db_path = db_path
+        self.deadline = time.monotonic() + budget
+        self.now = now
+        self.writer = writer
+        self.batch = max(1, int(_env('MAINT_BATCH', 1000)))
+
+    def time_left(self):
+        return self.deadline - time.monotonic()
+
+    def write(self, fn):
+        return self.writer.submit(fn).result(timeout=max(self.time_left(), 0) + 30)
+
+    def batches(self, fn):
+        """Call the writer op `fn(conn, batch)` until it returns fewer rows than a batch or time runs out."""
+        total = 0
+        while True:
+            n = self.write(lambda conn: fn(conn, self.batch))
+            total += n
+            if n < self.batch or self.time_left() <= 0:
+                return total, n >= self.batch
+
+
+def purge_tokens(run):
+    # expires_at is written as a naive UTC isoformat
+    cutoff = run.now.replace(tzinfo=None).isoformat()
+
+    def op(conn, limit):
+        return conn.execute('DELETE FROM password_reset_tokens WHERE token IN '
+                            '(SELECT token FROM password_reset_tokens WHERE expires_at < ? LIMIT ?)', (cutoff, limit)).rowcount
+    deleted, more = run.batches(op)
+    return {'deleted': deleted, 'more': more}
+
+
+def compact_reconcile(run):
+    cutoff = _sql_time(run.now - timedelta(days=_env('MAINT_JOB_RETENTION_DAYS', 30)))
+    old_jobs = "SELECT id FROM reconcile_jobs WHERE status != 'running' AND created_at < ?"
+
+    def drop_rows(conn, limit):
+        return conn.execute(f'DELETE FROM reconcile_results WHERE (job_id, seq) IN '
+                            f'(SELECT job_id, seq FROM reconcile_results WHERE job_id IN ({old_jobs}) LIMIT ?)', (cutoff, limit)).rowcount
+
+    def archive_jobs(conn, limit):
+        ids = [r[0] for r in conn.execute(old_jobs + ' LIMIT ?', (cutoff, limit))]
+        if not ids:
+            return 0
+        marks = ','.join('?' * len(ids))
+        # results older than per-row storage are dropped with the job; only failures keep their message
+        conn.execute(f"INSERT OR REPLACE INTO reconcile_jobs_archive (id, status, total, processed, changed, errors, error, started_at, finished_at, created_at) "
+                     f"SELECT id, status, total, processed, changed, errors, CASE WHEN status = 'failed' THEN result END, started_at, finished_at, created_at "
+                     f"FROM reconcile_jobs WHERE id IN ({marks})", ids)
+        return conn.execute(f'DELETE FROM reconcile_jobs WHERE id IN ({marks})', ids).rowcount
+
+    rows, more = run.batches(drop_rows)
+    jobs = 0
+    if not more and run.time_left() > 0:
+        jobs, more = run.batches(archive_jobs)
+    return {'result_rows_deleted': rows, 'jobs_archived': jobs, 'more': more}
+
+
+def purge_generate(run):
+    cutoff = _sql_time(run.now - timedelta(hours=_env('MAINT_GENERATE_RETENTION_HOURS', 24)))
+
+    def op(conn, limit):
+        return conn.execute("DELETE FROM generate_jobs WHERE id IN (SELECT id FROM generate_jobs "
+                            "WHERE status IN ('finished', 'failed') AND created_at < ? LIMIT ?)", (cutoff, limit)).rowcount
+    deleted, more = run.batches(op)
+    return {'deleted': deleted, 'more': more}
+
+
+def archive_feedback(run):
+    cutoff = _sql_time(run.now - timedelta(days=_env('MAINT_FEEDBACK_RETENTION_DAYS', 365)))
+
+    def op(conn, limit):
+        ids = [r[0] for r in conn.execute('SELECT id FROM feedback WHERE created_at < ? ORDER BY created_at LIMIT ?', (cutoff, limit))]
+        if not ids:
+            return 0
+        marks = ','.join('?' * len(ids))
+        conn.execute(f'INSERT OR REPLACE INTO feedback_archive (id, profile_id, post_day, platform, rating, note, created_at) '
+                     f'SELECT id, profile_id, post_day, platform, rating, note, created_at FROM feedback WHERE id IN ({marks})', ids)
+        return conn.execute(f'DELETE FROM feedback WHERE id IN ({marks})', ids).rowcount
+    archived, more = run.batches(op)
+    return {'archived': archived, 'more': more}
+
+
+def prune_counters(run):
+    return {'deleted': run.write(lambda conn: conn.execute('DELETE FROM admin_counters WHERE value = 0').rowcount)}
+
+
+def _connect(path):
+    conn = sqlite3.connect(path, isolation_level=None, timeout=5)
+    conn.execute('PRAGMA busy_timeout = 5000')
+    return conn
+
+
+def optimize(run):
+    conn = _connect(run.db_path)
+    try:
+        # bound the cost of any ANALYZE optimize decides to run
+        conn.execute('PRAGMA analysis_limit = %d' % int(_env('MAINT_ANALYSIS_LIMIT', 1000)))
+        conn.execute('PRAGMA optimize').fetchall()
+    finally:
+        conn.close()
+    return {}
+
+
+def checkpoint(run):
+    conn = _connect(run.db_path)
+    try:
+        busy, log_pages, done = conn.execute('PRAGMA wal_checkpoint(PASSIVE)').fetchone()
+    finally:
+        conn.close()
+    return {'wal_pages': log_pages, 'checkpointed': done, 'busy': bool(busy)}
+
+
+def incremental_vacuum(run):
+    conn = _connect(run.db_path)
+    try:
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            return {'skipped': 'auto_vacuum is not INCREMENTAL (see --enable-incremental-vacuum)'}
+        page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+        before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        conn.execute('PRAGMA incremental_vacuum(%d)' % int(_env('MAINT_VACUUM_PAGES', 2000))).fetchall()
+        after = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    finally:
+        conn.close()
+    return {'pages_freed': before - after, 'bytes_freed': (before - after) * page_size, 'free_pages_left': after}
+
+
+TASKS = (purge_tokens, compact_reconcile, purge_generate, archive_feedback, prune_counters,
+         optimize, checkpoint, incremental_vacuum)
+
+
+def install(conn):
+    conn.executescript(SCHEMA)
+
+
+def run(db_path, budget=None, now=None, writer=None):
+    """Run the maintenance tasks within `budget` seconds and return the report."""
+    budget = _env('MAINT_BUDGET_SECONDS', 10) if budget is None else budget
+    r = _Run(db_path, budget, now or datetime.now(timezone.utc), writer or dbwriter.get(db_path))
+    t0 = time.monotonic()
+    report = {'tasks': {}, 'skipped': []}
+    for task in TASKS:
+        if r.time_left() <= 0:
+            report['skipped'].append(task.__name__)
+            continue
+        t = time.monotonic()
+        try:
+            result = task(r)
+        except Exception as e:
+            result = {'error': str(e) or e.__class__.__name__}
+        result['ms'] = round((time.monotonic() - t) * 1000, 1)
+        report['tasks'][task.__name__] = result
+    report['elapsed_ms'] = round((time.monotonic() - t0) * 1000, 1)
+    log.info('maintenance: %s', json.dumps(report, sort_keys=True))
+    return report
+
+
+def claim(db_path, interval, writer=None):
+    """Record a run start unless one started within `interval` seconds; the run id, or None."""
+    since = _sql_time(datetime.now(timezone.utc) - timedelta(seconds=interval))
+
+    def op(conn):
+        cur = conn.execute('INSERT INTO maintenance_runs (started_at) SELECT CURRENT_TIMESTAMP '
+                           'WHERE NOT EXISTS (SELECT 1 FROM maintenance_runs WHERE started_at > ?)', (since,))
+        return cur.lastrowid if cur.rowcount else None
+    return (writer or dbwriter.get(db_path)).submit(op).result()
+
+
+def run_scheduled(db_path, interval):
+    """One scheduler tick: claim the interval and run if no other worker has."""
+    writer = dbwriter.get(db_path)
+    run_id = claim(db_path, interval, writer)
+    if run_id is None:
+        return None
+    report = run(db_path, writer=writer)
+    writer.execute('UPDATE maintenance_runs SET finished_at = CURRENT_TIMESTAMP, report = ? WHERE id = ?',
+                   (json.dumps(report), run_id))
+    return report
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def start_scheduler(db_path_fn):
+    """Start the background thread once per process; `db_path_fn()` gives the current database path."""
+    global _scheduler
+    interval = _env('MAINT_INTERVAL_SECONDS', 3600)
+    if interval <= 0 or _scheduler is not None:
+        return
+    with _scheduler_lock:
+        if _scheduler is not None:
+            return
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    run_scheduled(db_path_fn(), interval)
+                except Exception:
+                    log.exception('maintenance run failed')
+
+        _scheduler = threading.Thread(target=loop, name='db-maintenance', daemon=True)
+        _scheduler.start()
+
+
+def enable_incremental_vacuum(db_path):
+    """Switch an existing database to auto_vacuum=INCREMENTAL; rewrites the whole file with VACUUM."""
+    conn = _connect(db_path)
+    try:
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM')
+        return conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run database maintenance once.')
+    parser.add_argument('--db', default='togetherly.db')
+    parser.add_argument('--budget', type=float, default=None, help='seconds (default MAINT_BUDGET_SECONDS)')
+    parser.add_argument('--enable-incremental-vacuum', action='store_true',
+                        help='one-off: switch to auto_vacuum=INCREMENTAL (full VACUUM, locks the database)')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    if args.enable_incremental_vacuum:
+        print('auto_vacuum=INCREMENTAL' if enable_incremental_vacuum(args.db) else 'could not enable incremental vacuum')
+    conn = sqlite3.connect(args.db)
+    install(conn)
+    conn.close()
+    report = run(args.db, budget=args.budget)
+    dbwriter.get(args.db).close()
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
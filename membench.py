@@ -0,0 +1,112 @@
+"""Generator memory benchmark.
+
+Runs generate_posts, and generate_posts plus the JSON body /api/generate
+sends, under tracemalloc for each calendar size and platform count. Reports
+the peak traced bytes and bytes per post:
+
+    python membench.py [--days 7,30,365,3650] [--platforms 1,2,3,4,5] [--json]
+
+A run fails when its peak exceeds MEMBENCH_BASE_BYTES plus a per-post
+allowance; tests/test_membench.py enforces the same budgets on small sizes:
+  MEMBENCH_BASE_BYTES                 fixed overhead allowed per run
+  MEMBENCH_GENERATE_BYTES_PER_POST    generate_posts, the post list only
+  MEMBENCH_API_BYTES_PER_POST         post list plus the serialised response
+Templates and the hashtag index are warmed first, so they are not counted.
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tracemalloc
+from datetime import date
+
+import captions
+from generator import generate_posts
+
+DAYS = (7, 30, 365, 3650)
+PLATFORM_COUNTS = (1, 2, 3, 4, 5)
+MODES = ('generate', 'api')
+
+
+def budget(mode):
+    """(base bytes, bytes per post) allowed for `mode`."""
+    per_post = {'generate': os.getenv('MEMBENCH_GENERATE_BYTES_PER_POST', '1500'),
+                'api': os.getenv('MEMBENCH_API_BYTES_PER_POST', '16000')}[mode]
+    return int(os.getenv('MEMBENCH_BASE_BYTES', '262144')), int(per_post)
+
+
+def params(days, n_platforms):
+    return dict(days=days, start_day=date(2026, 1, 5), industry='Fitness', tone='friendly',
+                platforms=list(captions.current().platform_hints)[:n_platforms], brand_keywords=['bench', 'strength'],
+                include_images=True, niche_keywords=['strength'], goals=['growth'], company='Bench Gym',
+                details={'reel_style': 'tutorial'})
+
+
+def _api_body(p):
+    # the same response api_generate builds for an unwindowed request
+    from app import app, jsonify
+    with app.test_request_context():
+        posts = generate_posts(**p)
+        body = jsonify({
+            "count": len(posts), "posts": posts, "profile_id": None,
+            "offset": 0, "total_days": p["days"], "next_offset": None,
+        }).get_data()
+    return posts, body
+
+
+def measure(days, n_platforms, mode='generate'):
+    """Peak and retained traced bytes for one run; the result is kept alive until the snapshot."""
+    build = (lambda p: generate_posts(**p)) if mode == 'generate' else _api_body
+    build(params(1, n_platforms))  # warm templates, hashtags and the app import
+    p = params(days, n_platforms)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = build(p)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    posts = len(result if mode == 'generate' else result[0])
+    base, per_post = budget(mode)
+    limit = base + per_post * posts
+    out = {'mode': mode, 'days': days, 'platforms': n_platforms, 'posts': posts,
+           'peak_bytes': peak, 'retained_bytes': current,
+           'bytes_per_post': round(peak / posts, 1) if posts else None,
+           'budget_bytes': limit, 'over_budget': peak > limit}
+    if mode == 'api':
+        out['body_bytes'] = len(result[1])
+    del result
+    return out
+
+
+def run(days=DAYS, platform_counts=PLATFORM_COUNTS, modes=MODES):
+    return [measure(d, n, m) for m in modes for d in days for n in platform_counts]
+
+
+def _ints(text):
+    return tuple(int(x) for x in text.split(',') if x.strip())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure generator memory per calendar size.')
+    parser.add_argument('--days', type=_ints, default=DAYS, help='comma-separated calendar lengths')
+    parser.add_argument('--platforms', type=_ints, default=PLATFORM_COUNTS, help='comma-separated platform counts')
+    parser.add_argument('--mode', choices=MODES, action='append', help='generate, api (default both)')
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args = parser.parse_args(argv)
+
+    results = run(args.days, args.platforms, tuple(args.mode or MODES))
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'mode':8} {'days':>5} {'plat':>4} {'posts':>6} {'peak KiB':>10} {'B/post':>8} {'budget KiB':>10}")
+        for r in results:
+            flag = '  OVER' if r['over_budget'] else ''
+            print(f"{r['mode']:8} {r['days']:5} {r['platforms']:4} {r['posts']:6} {r['peak_bytes'] / 1024:10.1f} "
+                  f"{r['bytes_per_post'] or 0:8.0f} {r['budget_bytes'] / 1024:10.1f}{flag}")
+    return 1 if any(r['over_budget'] for r in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
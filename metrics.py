@@ -0,0 +1,157 @@
+"""Lightweight in-process metrics with Prometheus text exposition.
+
+Recording is a dict lookup, a bisect and a few integer adds under a
+per-metric lock, so it is cheap enough to leave on in production.
+"""
+import bisect
+import threading
+
+# latency buckets in seconds (request, SQL and Stripe timings)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# buckets for small integer counts (e.g. SQL statements per request)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _fmt(v):
+    if v == float('inf'):
+        return '+Inf'
+    if isinstance(v, float) and v.is_integer():
+        return repr(v)
+    return str(v)
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, v in items:
+            lines.append(f'{self.name}{_labels(self.labelnames, labels)} {_fmt(v)}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(labels)
+            if s is None:
+                s = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            s[0][idx] += 1
+            s[1] += value
+            s[2] += 1
+
+    def snapshot(self, *labels):
+        """Return (sum, count) for one label set; (0.0, 0) if never observed."""
+        with self._lock:
+            s = self._series.get(labels)
+            return (s[1], s[2]) if s else (0.0, 0)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._series.items())
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, c in zip(self.buckets + (float('inf'),), counts):
+                cumulative += c
+                le = 'le="%s"' % _fmt(float(bound))
+                lines.append(f'{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, labels)} {total!r}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, labels)} {count}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, *args, **kwargs):
+        with self._lock:
+            m = self._metrics.get(name)
+            if m is None:
+                m = self._metrics[name] = cls(name, *args, **kwargs)
+            return m
+
+    def counter(self, name, help, labelnames=()):
+        return self._get_or_create(Counter, name, help, labelnames)
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, help, labelnames, buckets)
+
+    def render(self):
+        with self._lock:
+            metrics = [self._metrics[k] for k in sorted(self._metrics)]
+        lines = []
+        for m in metrics:
+            lines.extend(m.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+http_request_duration = REGISTRY.histogram(
+    'togetherly_http_request_duration_seconds',
+    'HTTP request latency by endpoint, method and status.',
+    ('endpoint', 'method', 'status'),
+)
+sql_queries_per_request = REGISTRY.histogram(
+    'togetherly_sql_queries_per_request',
+    'Number of SQL statements executed per request.',
+    ('endpoint',),
+    buckets=COUNT_BUCKETS,
+)
+sql_time_per_request = REGISTRY.histogram(
+    'togetherly_sql_time_per_request_seconds',
+    'Total time spent executing SQL per request.',
+    ('endpoint',),
+)
+stripe_call_duration = REGISTRY.histogram(
+    'togetherly_stripe_call_duration_seconds',
+    'Stripe API call latency by operation and outcome (ok/error).',
+    ('operation', 'outcome'),
+)
+generator_stage_duration = REGISTRY.histogram(
+    'togetherly_generator_stage_duration_seconds',
+    'Time spent per generate_posts call in each generator stage.',
+    ('stage',),
+)
+
+
+def render():
+    return REGISTRY.render()
@@ -0,0 +1,190 @@
+"""Generator microbenchmarks with regression gating.
+
+Times make_caption, make_reel_plan, default_hashtags, image_prompt and
+generate_posts at several sizes (keyword-list length for the helpers,
+calendar days for generate_posts). Each case is warmed up, then sampled
+repeatedly; a sample runs the case enough times to last at least
+MICROBENCH_SAMPLE_MS. Results are per call, in nanoseconds.
+
+    python microbench.py [--only NAME] [--out results.json] [--compare microbench_baseline.json]
+    python microbench.py --update-baseline
+
+Right before each case a fixed pure-Python loop is timed too, and
+comparisons are scaled by the ratio of the two calibration times. A baseline
+committed on one machine can therefore gate runs on another, and drift in
+machine speed during a run is cancelled out. A case regresses when its
+scaled median is more than MICROBENCH_THRESHOLD (relative, default 0.15)
+above the baseline, *and* the gap exceeds MICROBENCH_NOISE_K times the
+combined median absolute deviation of both runs. Suspected regressions are
+re-run MICROBENCH_CONFIRM times and only reported if every re-run agrees.
+Exits 1 on any regression.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import date
+
+import captions
+from generator import default_hashtags, generate_posts, image_prompt, make_caption, make_reel_plan
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+BASELINE = os.path.join(ROOT, 'microbench_baseline.json')
+
+KEYWORD_COUNTS = (1, 5, 20)
+CALENDAR_DAYS = (7, 30, 365)
+PLATFORMS = ['instagram', 'facebook', 'tiktok']
+
+
+def _keywords(n):
+    return [f'keyword{i}' for i in range(n)]
+
+
+def _calibration():
+    total = 0
+    for i in range(2000):
+        total += i * i % 7
+    return total
+
+
+def cases():
+    """{name: zero-argument callable}; names carry the size, e.g. make_caption[kw=5]."""
+    out = {}
+    pillar_name, pillar_hint = captions.current().pillars[0]
+    for n in KEYWORD_COUNTS:
+        kw = _keywords(n)
+        tags = default_hashtags('Fitness', kw)
+        out[f'make_caption[kw={n}]'] = lambda kw=kw, tags=tags: make_caption(
+            'Fitness', 'friendly', pillar_name, pillar_hint, 'instagram', kw, tags, ['growth'], 'Bench Gym')
+        out[f'make_reel_plan[kw={n}]'] = lambda kw=kw, tags=tags: make_reel_plan(
+            'Fitness', pillar_name, kw, 'friendly', 'Bench Gym', 'tutorial', tags)
+        out[f'default_hashtags[kw={n}]'] = lambda kw=kw: default_hashtags('Fitness', kw)
+        out[f'image_prompt[kw={n}]'] = lambda kw=kw: image_prompt('Fitness', pillar_name, kw, 'Bench Gym')
+    for days in CALENDAR_DAYS:
+        out[f'generate_posts[days={days}]'] = lambda days=days: generate_posts(
+            days, date(2026, 1, 5), 'Fitness', 'friendly', PLATFORMS, _keywords(3), True, ['strength'],
+            ['growth'], 'Bench Gym', {'reel_style': 'tutorial'})
+    return out
+
+
+def _loops(fn, sample_s):
+    """Calls per sample so one sample lasts at least `sample_s` seconds."""
+    n = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(n):
+            fn()
+        if time.perf_counter() - t0 >= sample_s:
+            return n
+        n *= 2
+
+
+def bench(fn, samples=None, warmup=None, sample_ms=None):
+    """Per-call timings for `fn`: {median_ns, mad_ns, min_ns, loops, samples}."""
+    samples = samples or int(os.getenv('MICROBENCH_SAMPLES', '9'))
+    warmup = warmup if warmup is not None else int(os.getenv('MICROBENCH_WARMUP', '2'))
+    sample_s = (sample_ms or float(os.getenv('MICROBENCH_SAMPLE_MS', '20'))) / 1000
+    loops = _loops(fn, sample_s)
+    times = []
+    for i in range(warmup + samples):
+        t0 = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        if i >= warmup:
+            times.append((time.perf_counter() - t0) / loops * 1e9)
+    median = statistics.median(times)
+    return {
+        'median_ns': round(median, 1),
+        'mad_ns': round(statistics.median(abs(t - median) for t in times), 1),
+        'min_ns': round(min(times), 1),
+        'loops': loops,
+        'samples': len(times),
+    }
+
+
+def run(only=None, names=None, **kwargs):
+    """{'meta': ..., 'results': {name: timings}} for every case whose name contains `only` (or is in `names`).
+
+    Each result carries calibration_ns, the calibration loop timed just before it.
+    """
+    results = {}
+    for name, fn in cases().items():
+        if (names is None or name in names) and (not only or only in name):
+            calibration = bench(_calibration, **kwargs)['median_ns']
+            results[name] = {**bench(fn, **kwargs), 'calibration_ns': calibration}
+    return {
+        'meta': {'python': platform.python_version(), 'machine': platform.machine(),
+                 'created': time.strftime('%Y-%m-%dT%H:%M:%S')},
+        'results': results,
+    }
+
+
+def compare(current, baseline, threshold=None, noise_k=None):
+    """[{name, baseline_ns, current_ns, change, regressed}] for cases present in both runs.
+
+    current_ns is scaled to the baseline run's speed by the calibration ratio.
+    """
+    threshold = threshold if threshold is not None else float(os.getenv('MICROBENCH_THRESHOLD', '0.15'))
+    noise_k = noise_k if noise_k is not None else float(os.getenv('MICROBENCH_NOISE_K', '3'))
+    cur, base = current['results'], baseline['results']
+    out = []
+    for name in sorted(set(cur) & set(base)):
+        scale = 1.0
+        if cur[name].get('calibration_ns') and base[name].get('calibration_ns'):
+            scale = base[name]['calibration_ns'] / cur[name]['calibration_ns']
+        b = base[name]['median_ns']
+        c = cur[name]['median_ns'] * scale
+        noise = noise_k * ((base[name]['mad_ns'] ** 2 + (cur[name]['mad_ns'] * scale) ** 2) ** 0.5)
+        out.append({
+            'name': name, 'baseline_ns': b, 'current_ns': round(c, 1),
+            'change': round(c / b - 1, 4) if b else 0.0,
+            'regressed': c > b * (1 + threshold) and c - b > noise,
+        })
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run generator microbenchmarks and compare against a baseline.')
+    parser.add_argument('--only', help='run only cases whose name contains this text')
+    parser.add_argument('--out', help='write the results JSON here')
+    parser.add_argument('--compare', default=BASELINE, help='baseline JSON to compare against')
+    parser.add_argument('--update-baseline', action='store_true', help=f'write the results to {os.path.basename(BASELINE)}')
+    args = parser.parse_args(argv)
+
+    current = run(args.only)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(current, f, indent=2)
+    if args.update_baseline:
+        with open(BASELINE, 'w') as f:
+            json.dump(current, f, indent=2)
+            f.write('\n')
+        print(f'baseline written: {len(current["results"])} cases')
+        return 0
+    try:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        baseline = None
+    if baseline is None:
+        for name, r in current['results'].items():
+            print(f"{name:28} {r['median_ns']:12.0f} ns  ±{r['mad_ns']:.0f}")
+        return 0
+    rows = compare(current, baseline)
+    for _ in range(int(os.getenv('MICROBENCH_CONFIRM', '2'))):
+        suspects = {r['name'] for r in rows if r['regressed']}
+        if not suspects:
+            break
+        again = {r['name']: r for r in compare(run(names=suspects), baseline)}
+        rows = [again[r['name']] if r['name'] in suspects and not again[r['name']]['regressed'] else r for r in rows]
+    for r in rows:
+        flag = '  REGRESSED' if r['regressed'] else ''
+        print(f"{r['name']:28} {r['baseline_ns']:12.0f} -> {r['current_ns']:12.0f} ns  {r['change'] * 100:+6.1f}%{flag}")
+    return 1 if any(r['regressed'] for r in rows) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
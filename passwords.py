@@ -0,0 +1,105 @@
+"""Password hashing on a dedicated, bounded process pool.
+
+pbkdf2 is deliberately slow; running it inline holds a request worker for
+the whole hash. Here hashes run on a small process pool, and a semaphore
+caps how many auth operations may be in flight so a login burst fails fast
+with HashingBusy instead of starving every other endpoint.
+
+Config (env):
+  PASSWORD_HASH_ITERATIONS     pbkdf2-sha256 rounds (default: werkzeug's default)
+  PASSWORD_HASH_WORKERS        pool size; 0 hashes inline in the calling thread
+  PASSWORD_HASH_CONCURRENCY    max hash operations queued or running at once
+  PASSWORD_HASH_WAIT           seconds to wait for a slot before HashingBusy
+"""
+import os
+import threading
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+
+class HashingBusy(Exception):
+    """Raised when the hashing concurrency cap is reached."""
+
+
+def _env_int(name, default):
+    try:
+        return int(os.getenv(name, ''))
+    except ValueError:
+        return default
+
+
+def iterations():
+    return _env_int('PASSWORD_HASH_ITERATIONS', DEFAULT_PBKDF2_ITERATIONS)
+
+
+def hash_method():
+    return f'pbkdf2:sha256:{iterations()}'
+
+
+_pool = None
+_slots = None
+_lock = threading.Lock()
+
+
+def _workers():
+    return max(0, _env_int('PASSWORD_HASH_WORKERS', min(2, os.cpu_count() or 1)))
+
+
+def _get_slots():
+    global _slots
+    if _slots is None:
+        with _lock:
+            if _slots is None:
+                _slots = threading.BoundedSemaphore(max(1, _env_int('PASSWORD_HASH_CONCURRENCY', max(1, _workers()) * 4)))
+    return _slots
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _lock:
+            if _pool is None:
+                from concurrent.futures import ProcessPoolExecutor
+                _pool = ProcessPoolExecutor(max_workers=_workers())
+    return _pool
+
+
+def _run(fn, *args):
+    slots = _get_slots()
+    wait = float(os.getenv('PASSWORD_HASH_WAIT', '2'))
+    if not slots.acquire(timeout=wait):
+        raise HashingBusy('too many password hash operations in flight')
+    try:
+        if _workers() == 0:
+            return fn(*args)
+        return _get_pool().submit(fn, *args).result()
+    finally:
+        slots.release()
+
+
+def hash_password(password: str) -> str:
+    return _run(generate_password_hash, password, hash_method())
+
+
+def verify_password(pwhash: str, password: str) -> bool:
+    if not pwhash:
+        return False
+    return _run(check_password_hash, pwhash, password)
+
+
+def needs_rehash(pwhash: str) -> bool:
+    """True when a stored hash was made with a different method or cost than the current one."""
+    if not pwhash:
+        return False
+    method = pwhash.split('$', 1)[0]
+    return method != hash_method()
+
+
+def reset():
+    """Shut down the pool and drop the concurrency cap so config changes take effect (tests)."""
+    global _pool, _slots
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+        _pool = None
+        _slots = None
@@ -0,0 +1,124 @@
+"""Indexed access to profile fields.
+
+The JSON columns on `profiles` (platforms, brand_keywords, niche_keywords,
+goals, details) stay the record of what the user saved. SQLite keeps two
+derived structures in step with them:
+
+  profile_values   one row per list element (profile_id, field, pos, value),
+                   maintained by triggers using json_each; indexed on
+                   (field, value, profile_id) so "profiles targeting tiktok"
+                   is an index range, not a scan plus json.loads per row
+  profiles.reel_style
+                   a VIRTUAL generated column over details.reel_style, with
+                   its own index
+
+PROFILE_JSON builds the whole API representation in SQL with json_object,
+so reading a profile is one query whose text can be served as-is.
+"""
+LIST_FIELDS = ('platforms', 'brand_keywords', 'niche_keywords', 'goals')
+KEYWORD_FIELDS = ('brand_keywords', 'niche_keywords')
+
+
+def _valid(col, empty):
+    return f"(CASE WHEN json_valid({col}) THEN json({col}) ELSE json('{empty}') END)"
+
+
+_DETAILS = _valid('details', '{}')
+
+PROFILE_JSON = f"""
+SELECT json_object(
+    'id', id,
+    'industry', industry,
+    'tone', tone,
+    'platforms', {_valid('platforms', '[]')},
+    'brand_keywords', {_valid('brand_keywords', '[]')},
+    'niche_keywords', {_valid('niche_keywords', '[]')},
+    'goals', {_valid('goals', '[]')},
+    'details', {_DETAILS},
+    'company', COALESCE(company, ''),
+    'include_images', json(CASE WHEN include_images THEN 'true' ELSE 'false' END),
+    'created_at', created_at
+) FROM profiles WHERE id = ?
+"""
+
+
+def _array(expr):
+    # json_each raises on malformed JSON; anything but an array contributes no values
+    return f"(CASE WHEN json_valid({expr}) AND json_type({expr}) = 'array' THEN {expr} ELSE '[]' END)"
+
+
+def _fill(row, field, when='1'):
+    # scalars only; a nested array or object in a list is not a segment value
+    return (f"INSERT INTO profile_values (profile_id, field, pos, value) "
+            f"SELECT {row}.id, '{field}', key, value FROM json_each({_array(f'{row}.{field}')}) "
+            f"WHERE {when} AND type IN ('text', 'integer', 'real');")
+
+
+def _refill(field):
+    changed = f'NEW.{field} IS NOT OLD.{field}'
+    return (f"DELETE FROM profile_values WHERE profile_id = NEW.id AND field = '{field}' AND {changed};\n    "
+            + _fill('NEW', field, changed))
+
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS profile_values (
+    profile_id TEXT NOT NULL,
+    field TEXT NOT NULL,
+    pos INTEGER NOT NULL,
+    value TEXT COLLATE NOCASE,
+    PRIMARY KEY (profile_id, field, pos)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_profile_values_lookup ON profile_values(field, value, profile_id);
+
+CREATE TRIGGER IF NOT EXISTS profile_values_ins AFTER INSERT ON profiles BEGIN
+    {' '.join(_fill('NEW', f) for f in LIST_FIELDS)}
+END;
+CREATE TRIGGER IF NOT EXISTS profile_values_upd AFTER UPDATE OF {', '.join(LIST_FIELDS)} ON profiles BEGIN
+    {' '.join(_refill(f) for f in LIST_FIELDS)}
+END;
+CREATE TRIGGER IF NOT EXISTS profile_values_del AFTER DELETE ON profiles BEGIN
+    DELETE FROM profile_values WHERE profile_id = OLD.id;
+END;
+"""
+
+
+def install(conn):
+    """Migrate: add the reel_style column and profile_values, backfilling from existing rows."""
+    cols = [r[1] for r in conn.execute('PRAGMA table_xinfo(profiles)').fetchall()]
+    if 'reel_style' not in cols:
+        conn.execute("ALTER TABLE profiles ADD COLUMN reel_style TEXT GENERATED ALWAYS AS "
+                     "(CASE WHEN json_valid(details) THEN json_extract(details, '$.reel_style') END) VIRTUAL")
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_profiles_reel_style ON profiles(reel_style)')
+    new = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'profile_values'").fetchone() is None
+    conn.executescript(SCHEMA)
+    if new:
+        for field in LIST_FIELDS:
+            conn.execute(f"INSERT INTO profile_values (profile_id, field, pos, value) "
+                         f"SELECT p.id, '{field}', j.key, j.value FROM profiles p, json_each({_array('p.' + field)}) j "
+                         f"WHERE j.type IN ('text', 'integer', 'real')")
+
+
+def load(conn, profile_id):
+    """The profile's API JSON text, or None."""
+    if not profile_id:
+        return None
+    row = conn.execute(PROFILE_JSON, (profile_id,)).fetchone()
+    return row[0] if row else None
+
+
+def segment_sql(filters):
+    """(WHERE clause, params) selecting profiles matching every (field, value) in `filters`.
+
+    Fields: platform, keyword (brand or niche), goal, reel_style.
+    """
+    where, params = [], []
+    for name, value in filters:
+        if name == 'reel_style':
+            where.append('p.reel_style = ?')
+            params.append(value)
+            continue
+        fields = {'platform': ('platforms',), 'goal': ('goals',), 'keyword': KEYWORD_FIELDS}[name]
+        marks = ','.join('?' * len(fields))
+        where.append(f'p.id IN (SELECT profile_id FROM profile_values WHERE field IN ({marks}) AND value = ?)')
+        params += list(fields) + [value]
+    return where, params
@@ -0,0 +1,111 @@
+"""In-process progress pub/sub for background jobs.
+
+A job runner publishes its latest state (a small dict) under the job id;
+listeners such as the SSE endpoint block until the state changes. Each
+topic keeps only the latest state and a version number, not a queue per
+listener. Memory therefore stays constant however many listeners there are,
+and a slow listener skips intermediate states rather than falling behind.
+Runners may publish on every row: listeners are woken at most every
+PROGRESS_INTERVAL_MS (a state published inside the interval goes out with
+the next wake-up), and always for the final state.
+
+Finished topics are kept for PROGRESS_RETAIN_SECONDS so a listener that
+connects just after the end still sees the final state. Topics are per
+process, like the other in-memory state; listeners of a job running in
+another worker find no topic and fall back to the stored job row.
+"""
+import os
+import threading
+import time
+
+_topics = {}
+_lock = threading.Lock()
+_listeners = 0
+
+
+def interval():
+    return float(os.getenv('PROGRESS_INTERVAL_MS', '100')) / 1000
+
+
+def _retain():
+    return float(os.getenv('PROGRESS_RETAIN_SECONDS', '60'))
+
+
+def max_listeners():
+    return int(os.getenv('PROGRESS_MAX_LISTENERS', '100'))
+
+
+class Topic:
+    __slots__ = ('state', 'version', 'done', 'finished_at', '_notified_at', '_cond')
+
+    def __init__(self):
+        self.state = None
+        self.version = 0
+        self.done = False
+        self.finished_at = None
+        self._notified_at = 0.0
+        self._cond = threading.Condition()
+
+    def publish(self, state, done=False):
+        with self._cond:
+            self.state = state
+            self.version += 1
+            now = time.monotonic()
+            if done:
+                self.done = True
+                self.finished_at = now
+            if done or now - self._notified_at >= interval():
+                self._notified_at = now
+                self._cond.notify_all()
+
+    def wait(self, seen, timeout):
+        """(version, state, done) once the version passes `seen`, or the current one after `timeout` seconds."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self.version <= seen and not self.done:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return self.version, self.state, self.done
+
+
+def _prune(now):
+    for key in [k for k, t in _topics.items() if t.done and now - t.finished_at > _retain()]:
+        del _topics[key]
+
+
+def publish(key, state, done=False):
+    """Set the latest state for `key`; `done=True` marks it final."""
+    with _lock:
+        topic = _topics.get(key)
+        if topic is None:
+            _prune(time.monotonic())
+            topic = _topics[key] = Topic()
+    topic.publish(state, done)
+
+
+def topic(key):
+    with _lock:
+        return _topics.get(key)
+
+
+def acquire_listener():
+    """Take one of the PROGRESS_MAX_LISTENERS slots; False if all are in use."""
+    global _listeners
+    with _lock:
+        if _listeners >= max_listeners():
+            return False
+        _listeners += 1
+        return True
+
+
+def release_listener():
+    global _listeners
+    with _lock:
+        _listeners -= 1
+
+
+def clear():
+    with _lock:
+        _topics.clear()
@@ -0,0 +1,120 @@
+"""Opt-in per-request SQL tracing built on sqlite3's trace callback.
+
+Enable with SQL_TRACE=1 (or app.config['SQL_TRACE'] = True). Each request
+gets a QueryTracer; at the end of the request its report is logged, kept in
+`recent_reports` and checked against QUERY_BUDGETS and the repeat threshold.
+"""
+import re
+import collections
+from time import perf_counter
+
+# Max statements (excluding BEGIN/COMMIT/ROLLBACK) an endpoint may run per request.
+QUERY_BUDGETS = {
+    'index': 0,
+    'api_current_user': 1,
+    'api_account': 2,
+    'account_page': 3,
+    'api_login': 1,
+    'api_signup': 1,
+    'api_logout': 0,
+    'save_profile': 2,
+    'get_profile': 1,
+    'api_bootstrap': 2,
+    'api_generate': 1,
+    'api_calendar_create': 2,
+    'api_calendar_get': 2,
+    'api_calendar_update': 5,
+    'api_feedback': 1,
+    'api_cancel_subscription': 3,
+    'api_stripe_webhook': 4,
+    'admin_page': 1,
+    'api_admin_stats': 3,
+    'api_admin_users': 2,
+    'api_admin_subscriptions': 2,
+    'api_admin_profiles': 2,
+    'api_admin_profile_segments': 2,
+    'api_reconcile_job_get': 2,
+    'api_reconcile_job_events': 2,
+}
+
+# the same normalised statement this many times in one request is reported as N+1
+REPEAT_THRESHOLD = 3
+
+_TX_CONTROL = ('BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE')
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_SPACE_RE = re.compile(r'\s+')
+
+recent_reports = collections.deque(maxlen=200)
+
+
+def normalize(sql):
+    """Replace literals with ? so statements differing only by bound values compare equal."""
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    return _SPACE_RE.sub(' ', sql).strip()
+
+
+class QueryTracer:
+    def __init__(self, endpoint=None):
+        self.endpoint = endpoint
+        # [sql, duration_seconds]; durations are filled in by end_call()
+        self.statements = []
+        # index of the first statement traced by the execute() call in progress, else None
+        self._call_start = None
+
+    def attach(self, conn):
+        conn.set_trace_callback(self._on_statement)
+        conn.tracer = self
+
+    def _on_statement(self, sql):
+        # sqlite reports each statement a trigger runs under its parent's text; within one
+        # execute() call count the parent once, but separate calls always count
+        start = self._call_start
+        if start is not None and len(self.statements) > start and self.statements[-1][0] == sql:
+            return
+        self.statements.append([sql, 0.0])
+
+    def begin_call(self):
+        self._call_start = len(self.statements)
+        return self._call_start, perf_counter()
+
+    def end_call(self, token):
+        """Spread one execute() call's wall time over the statements it traced."""
+        start_idx, t0 = token
+        self._call_start = None
+        traced = self.statements[start_idx:]
+        if traced:
+            share = (perf_counter() - t0) / len(traced)
+            for entry in traced:
+                entry[1] = share
+
+    def report(self):
+        data = [(sql, d) for sql, d in self.statements if not sql.lstrip().upper().startswith(_TX_CONTROL)]
+        counts = collections.Counter(normalize(sql) for sql, _ in data)
+        exact = collections.Counter(sql for sql, _ in data)
+        budget = QUERY_BUDGETS.get(self.endpoint)
+        return {
+            'endpoint': self.endpoint,
+            'count': len(data),
+            'total_ms': round(sum(d for _, d in data) * 1000, 3),
+            'statements': [{'sql': sql, 'ms': round(d * 1000, 3)} for sql, d in data],
+            'repeated': [{'sql': s, 'count': n} for s, n in counts.items() if n >= REPEAT_THRESHOLD],
+            'duplicates': [{'sql': s, 'count': n} for s, n in exact.items() if n > 1],
+            'budget': budget,
+            'over_budget': budget is not None and len(data) > budget,
+        }
+
+
+def finish(tracer, logger):
+    """Build, log and remember the report for a finished request."""
+    rep = tracer.report()
+    recent_reports.append(rep)
+    logger.info('sql trace %s: %d statements, %.3f ms', rep['endpoint'], rep['count'], rep['total_ms'])
+    for s in rep['statements']:
+        logger.debug('sql trace %s: %.3f ms %s', rep['endpoint'], s['ms'], s['sql'])
+    for r in rep['repeated']:
+        logger.warning('sql trace %s: possible N+1, %d x %s', rep['endpoint'], r['count'], r['sql'])
+    if rep['over_budget']:
+        logger.warning('sql trace %s: %d statements exceeds budget of %d', rep['endpoint'], rep['count'], rep['budget'])
+    return rep
@@ -0,0 +1,119 @@
+"""Worker cold-start profiler.
+
+Boots the app in a fresh interpreter under `-X importtime`, serves one
+request through the test client, and reports where the time went:
+
+    python startup.py [--top 15] [--json]
+
+Budgets (ms, env-overridable) are enforced by tests/test_startup.py:
+  STARTUP_IMPORT_BUDGET_MS          importing app.py
+  STARTUP_FIRST_REQUEST_BUDGET_MS   first GET /api/bootstrap after import (schema init included)
+
+For a running server, STARTUP_PROFILE=1 makes app.py log the time from
+import to its first served request.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+IMPORT_BUDGET_MS = float(os.getenv('STARTUP_IMPORT_BUDGET_MS', '1500'))
+FIRST_REQUEST_BUDGET_MS = float(os.getenv('STARTUP_FIRST_REQUEST_BUDGET_MS', '1500'))
+
+# imported lazily by app.py; seeing one of these after boot is a regression
+LAZY_MODULES = ('stripe', 'openai', 'multiprocessing')
+
+_PROBE = r'''
+import json, os, sys, tempfile, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+loaded = [m for m in %r if m in sys.modules]
+app.DB_PATH = os.path.join(tempfile.mkdtemp(), 'startup.db')
+status = app.app.test_client().get('/api/bootstrap').status_code
+t2 = time.perf_counter()
+print(json.dumps({
+    'import_ms': (t1 - t0) * 1000,
+    'first_request_ms': (t2 - t1) * 1000,
+    'status': status,
+    'loaded': loaded,
+}))
+''' % (LAZY_MODULES,)
+
+
+def _parse_importtime(stderr):
+    """[(depth, name, self_us, cumulative_us)] from -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line.split('|')
+        if len(parts) != 3:
+            continue
+        try:
+            self_us = int(parts[0].split(':', 1)[1])
+            cum_us = int(parts[1])
+        except ValueError:
+            continue  # header line
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((depth, name.strip(), self_us, cum_us))
+    return rows
+
+
+def measure(python=None):
+    """Boot the app in a fresh interpreter and return timings plus the import breakdown."""
+    proc = subprocess.run(
+        [python or sys.executable, '-X', 'importtime', '-c', _PROBE],
+        cwd=ROOT, capture_output=True, text=True, timeout=120,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f'startup probe failed:\n{proc.stderr[-2000:]}')
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    rows = _parse_importtime(proc.stderr)
+    # children of `app` are listed before it at depth 1
+    result['app_imports'] = []
+    for i, (depth, name, self_us, cum_us) in enumerate(rows):
+        if depth == 0 and name == 'app':
+            j = i - 1
+            while j >= 0 and rows[j][0] >= 1:
+                if rows[j][0] == 1:
+                    result['app_imports'].append((rows[j][1], rows[j][3] / 1000))
+                j -= 1
+            result['app_self_ms'] = self_us / 1000
+            break
+    result['app_imports'].sort(key=lambda r: -r[1])
+    result['slowest_self'] = [(name, self_us / 1000) for _, name, self_us, _ in
+                              sorted(rows, key=lambda r: -r[2])[:50]]
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Profile worker cold start (imports and first request).')
+    parser.add_argument('--top', type=int, default=15, help='rows to show per table')
+    parser.add_argument('--json', action='store_true', help='print the raw result as JSON')
+    args = parser.parse_args(argv)
+
+    r = measure()
+    if args.json:
+        print(json.dumps(r, indent=2))
+    else:
+        print(f"import app:     {r['import_ms']:8.1f} ms  (budget {IMPORT_BUDGET_MS:.0f})")
+        print(f"first request:  {r['first_request_ms']:8.1f} ms  (budget {FIRST_REQUEST_BUDGET_MS:.0f}, status {r['status']})")
+        print(f"app.py body:    {r.get('app_self_ms', 0):8.1f} ms")
+        print(f"lazy modules loaded at boot: {', '.join(r['loaded']) or 'none'}")
+        print('\nimported by app.py (cumulative):')
+        for name, ms in r['app_imports'][:args.top]:
+            print(f'  {ms:8.1f} ms  {name}')
+        print('\nslowest modules (self):')
+        for name, ms in r['slowest_self'][:args.top]:
+            print(f'  {ms:8.1f} ms  {name}')
+    over = r['import_ms'] > IMPORT_BUDGET_MS or r['first_request_ms'] > FIRST_REQUEST_BUDGET_MS
+    return 1 if over or r['loaded'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
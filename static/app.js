@@ -1,17 +1,19 @@
 let CFG = null;
 let FLAGS = null;
 
-async function loadFlags(){
-  try{
-    const r = await fetch('/static/content/flags.json', { cache: 'no-store' });
-    if (r.ok) FLAGS = await r.json();
-  }catch(e){ /* swallow */ }
+// One round trip for content version, flags, config, saved profile and current user.
+// The browser revalidates it with the ETag, so an unchanged bootstrap costs a 304.
+async function loadBootstrap(){
+  const res = await fetch('/api/bootstrap', { credentials: 'include', cache: 'no-cache' });
+  if (!res.ok) throw new Error('Could not load /api/bootstrap');
+  return res.json();
 }
+const BOOTSTRAP = loadBootstrap();
 
 async function loadConfig(){
-  const res = await fetch('/static/content/config.json', { cache: 'no-store' });
-  if (!res.ok) throw new Error('Could not load config.json');
-  CFG = await res.json();
+  const boot = await BOOTSTRAP;
+  CFG = boot.config || {};
+  FLAGS = boot.flags || {};
   window.CFG = CFG; // handy for debugging
   window.FLAGS = FLAGS;
 
@@ -22,7 +24,8 @@ async function loadConfig(){
   showStep(step);
   updateSummary();
   // now that config is rendered, try to load any saved profile (so industries map correctly)
-  try{ await loadSavedProfile(); }catch(e){/* ignore */}
+  try{ loadSavedProfile(boot.profile); }catch(e){/* ignore */}
+  restoreLastCalendar().catch(() => {});
 }
 
 let step = 1;
@@ -40,15 +43,11 @@ const stepsBar = document.getElementById("steps");
 const btnSample = document.getElementById("btn-sample");
 const btn30 = document.getElementById("btn-30");
 
-// load optional flags then config
-loadFlags().then(loadConfig).catch(err => { console.error(err); });
+loadConfig().catch(err => { console.error(err); });
 
-// attempt to load saved profile for this session and prefill fields
-async function loadSavedProfile(){
+// prefill fields from the profile saved for this session
+function loadSavedProfile(p){
   try{
-  const res = await fetch('/api/profile', { credentials: 'include' });
-    if (!res.ok) return;
-    const p = await res.json();
     if (!p || !p.id) return;
     // prefill inputs
     if (p.company) {
@@ -70,23 +69,14 @@ async function loadSavedProfile(){
 }
 
 document.addEventListener('DOMContentLoaded', () => {
-  // load content metadata
+  // content metadata and current user from the bootstrap response
   (async ()=>{
     try{
-  const r = await fetch('/api/content', { credentials: 'include' });
-      if (!r.ok) return;
-      const j = await r.json();
+      const boot = await BOOTSTRAP;
       const el = document.getElementById('content-version');
-      if (el) el.textContent = j.version || 'local';
-      window.CONTENT_META = j;
-    }catch(e){/* ignore */}
-    // query server for current user
-    try{
-  const r2 = await fetch('/api/current_user', { credentials: 'include' });
-      if (r2.ok){
-        const u = await r2.json();
-        if (u && u.id){ window.CURRENT_USER = u; }
-      }
+      if (el) el.textContent = boot.version || 'local';
+      window.CONTENT_META = { version: boot.version, flags: boot.flags };
+      if (boot.current_user && boot.current_user.id){ window.CURRENT_USER = boot.current_user; }
       renderAuthUi();
     }catch(e){/* ignore */}
   })();
@@ -626,11 +616,11 @@ function clearFormError(){
 
 if (btnSample) btnSample.addEventListener("click", async ()=>{
   await maybeSaveDefaults();
-  renderPosts(await generate(1));
+  await showCalendar(1);
 });
 if (btn30) btn30.addEventListener("click", async ()=>{
   await maybeSaveDefaults();
-  renderPosts(await generate(30));
+  await showCalendar(30);
 });
 
 async function maybeSaveDefaults(){
@@ -640,40 +630,212 @@ async function maybeSaveDefaults(){
   await saveProfile();
 }
 
-async function generate(days){
+async function fetchCalendar(payload){
   const res = await fetch("/api/generate", {
     method: "POST",
     headers: {"Content-Type":"application/json"},
-    body: JSON.stringify({ ...answers, days })
+    body: JSON.stringify(payload)
   });
-  if (!res.ok) throw new Error(`HTTP ${res.status}`);
+  if (!res.ok){ const j = await res.json().catch(()=>null); throw new Error((j && j.error) || `HTTP ${res.status}`); }
+  if (res.status === 202) return pollGenerateJob((await res.json()).status_url);
   return res.json();
 }
 
+// large calendars are queued server-side; poll until the job finishes
+async function pollGenerateJob(url){
+  for (;;){
+    const r = await fetch(url, { credentials: 'include' });
+    const j = await r.json().catch(() => null);
+    if (!r.ok || !j) throw new Error((j && j.error) || `HTTP ${r.status}`);
+    if (j.result) return j.result;
+    if (j.job.status === 'failed') throw new Error(j.job.error || 'Generation failed');
+    await new Promise(done => setTimeout(done, 1000 * (+r.headers.get('Retry-After') || 1)));
+  }
+}
+
+// Generated calendars persisted in IndexedDB, keyed by a hash of the generate
+// inputs plus the content version, so a returning user sees their last calendar
+// immediately while a fresh copy is fetched in the background.
+const CalendarStore = {
+  _db: null,
+  open(){
+    if (!this._db) this._db = new Promise((resolve, reject) => {
+      if (!window.indexedDB) return reject(new Error("IndexedDB unavailable"));
+      const req = indexedDB.open("togetherly", 1);
+      req.onupgradeneeded = () => { req.result.createObjectStore("calendars"); };
+      req.onsuccess = () => resolve(req.result);
+      req.onerror = () => reject(req.error);
+    });
+    return this._db;
+  },
+  async _tx(mode, fn){
+    const db = await this.open();
+    return new Promise((resolve, reject) => {
+      const tx = db.transaction("calendars", mode);
+      const req = fn(tx.objectStore("calendars"));
+      tx.oncomplete = () => resolve(req.result);
+      tx.onerror = () => reject(tx.error);
+    });
+  },
+  get(key){ return this._tx("readonly", s => s.get(key)).catch(() => undefined); },
+  put(key, value){ return this._tx("readwrite", s => s.put(value, key)).catch(() => undefined); }
+};
+
+function stableStringify(v){
+  if (Array.isArray(v)) return "[" + v.map(stableStringify).join(",") + "]";
+  if (v && typeof v === "object") return "{" + Object.keys(v).sort().map(k => JSON.stringify(k) + ":" + stableStringify(v[k])).join(",") + "}";
+  return JSON.stringify(v === undefined ? null : v);
+}
+
+async function calendarKey(payload){
+  const text = stableStringify({ v: (CFG && CFG.version) || "local", p: payload });
+  if (window.crypto && crypto.subtle){
+    const buf = await crypto.subtle.digest("SHA-256", new TextEncoder().encode(text));
+    return Array.from(new Uint8Array(buf), b => b.toString(16).padStart(2, "0")).join("");
+  }
+  // FNV-1a fallback for insecure origins without SubtleCrypto
+  let h = 0x811c9dc5;
+  for (let i = 0; i < text.length; i++){ h ^= text.charCodeAt(i); h = Math.imul(h, 0x01000193); }
+  return "fnv-" + (h >>> 0).toString(16) + "-" + text.length;
+}
+
+// Render the cached calendar for these inputs at once (if any), then fetch a
+// fresh one and re-render only if it differs.
+function showCalendar(days, extra){
+  return showCalendarFor({ ...answers, days, ...extra });
+}
+
+async function showCalendarFor(payload){
+  const key = await calendarKey(payload);
+  const cached = await CalendarStore.get(key);
+  if (cached) renderPosts(cached);
+  const fresh = await fetchCalendar(payload);
+  CalendarStore.put(key, fresh);
+  CalendarStore.put("last", { key, payload, version: (CFG && CFG.version) || "local" });
+  if (!cached || JSON.stringify(cached.posts) !== JSON.stringify(fresh.posts)) renderPosts(fresh);
+  return fresh;
+}
+
+// On load: show the last calendar this browser generated for the current content
+// version, then revalidate it against the server.
+async function restoreLastCalendar(){
+  if (!results || results.childElementCount) return;
+  const last = await CalendarStore.get("last");
+  if (!last || last.version !== ((CFG && CFG.version) || "local")) return;
+  if (!(await CalendarStore.get(last.key)) || results.childElementCount) return;
+  showCalendarFor(last.payload).catch(err => console.warn("calendar revalidation failed", err));
+}
+
+if ("serviceWorker" in navigator){
+  window.addEventListener("load", () => { navigator.serviceWorker.register("/sw.js").catch(() => {}); });
+}
+
+// Windowed rendering: only the day sections near the viewport are in the DOM.
+// Heights of sections that have been rendered are remembered; unseen ones use
+// the running average, and two spacers stand in for everything off-screen.
+const VIRTUAL = {
+  posts: [], days: [], heights: [], estimate: 480, overscanPx: 1200,
+  first: -1, last: -1, mounted: new Map(), rated: new Map(),
+  top: null, list: null, bottom: null, raf: 0
+};
+
 function renderPosts(data){
   const posts = data.posts || [];
   results.innerHTML = "";
-  if (!posts.length){ results.innerHTML = `<div class="text-sm text-slate-600">No posts yet.</div>`; return; }
-  const byDay = groupBy(posts, "day_index");
-  for (const day of Object.keys(byDay).sort((a,b)=>+a-+b)){
-    const items = byDay[day];
-    const section = document.createElement("section");
-    section.className = "post";
-    section.innerHTML = `<div class="flex items-baseline justify-between mb-2">
-      <h4 class="font-medium">Day ${day} • ${items[0].date}</h4>
-      <span class="text-xs text-slate-500">${items.length} platform(s)</span>
-    </div>`;
-    items.forEach(p => section.appendChild(renderCard(p)));
-    results.appendChild(section);
+  VIRTUAL.mounted.clear(); VIRTUAL.rated.clear();
+  VIRTUAL.first = VIRTUAL.last = -1;
+  if (!posts.length){ VIRTUAL.posts = []; VIRTUAL.days = []; results.innerHTML = `<div class="text-sm text-slate-600">No posts yet.</div>`; return; }
+  results.appendChild(renderExportBar(posts));
+  VIRTUAL.posts = posts;
+  VIRTUAL.days = groupDays(posts);
+  VIRTUAL.heights = new Array(VIRTUAL.days.length).fill(0);
+  VIRTUAL.top = document.createElement("div");
+  VIRTUAL.list = document.createElement("div");
+  VIRTUAL.bottom = document.createElement("div");
+  results.append(VIRTUAL.top, VIRTUAL.list, VIRTUAL.bottom);
+  updateVirtualWindow();
+}
+
+// posts arrive ordered by day then platform; collect post indexes per day in one pass
+function groupDays(posts){
+  const days = [];
+  let cur = null;
+  posts.forEach((p, i) => {
+    if (!cur || cur.day !== p.day_index){ cur = { day: p.day_index, date: p.date, idx: [] }; days.push(cur); }
+    cur.idx.push(i);
+  });
+  return days;
+}
+
+function scheduleVirtualUpdate(){
+  if (VIRTUAL.raf || !VIRTUAL.days.length) return;
+  VIRTUAL.raf = requestAnimationFrame(() => { VIRTUAL.raf = 0; updateVirtualWindow(); });
+}
+window.addEventListener("scroll", scheduleVirtualUpdate, { passive: true });
+window.addEventListener("resize", scheduleVirtualUpdate, { passive: true });
+
+function updateVirtualWindow(){
+  const n = VIRTUAL.days.length;
+  if (!n || !VIRTUAL.top || !VIRTUAL.top.isConnected) return;
+  const h = i => VIRTUAL.heights[i] || VIRTUAL.estimate;
+  const viewTop = -VIRTUAL.top.getBoundingClientRect().top - VIRTUAL.overscanPx;
+  const viewBottom = viewTop + window.innerHeight + 2 * VIRTUAL.overscanPx;
+  let first = 0, y = 0;
+  while (first < n - 1 && y + h(first) < viewTop){ y += h(first); first++; }
+  let last = first, y2 = y;
+  while (last < n - 1 && y2 + h(last) < viewBottom){ y2 += h(last); last++; }
+  if (first === VIRTUAL.first && last === VIRTUAL.last) return;
+
+  // keep sections that stay in range, build the rest
+  const keep = new Map();
+  for (let i = first; i <= last; i++){
+    let el = VIRTUAL.mounted.get(i);
+    if (!el) el = renderDaySection(i);
+    keep.set(i, el);
   }
+  VIRTUAL.mounted.forEach((el, i) => { if (!keep.has(i)) el.remove(); });
+  let prev = null;
+  keep.forEach(el => {
+    const want = prev ? prev.nextSibling : VIRTUAL.list.firstChild;
+    if (el !== want) VIRTUAL.list.insertBefore(el, want);
+    prev = el;
+  });
+  VIRTUAL.mounted = keep;
+  VIRTUAL.first = first; VIRTUAL.last = last;
+
+  // measure what is mounted, refresh the estimate for unseen days, size the spacers
+  let measured = 0, count = 0;
+  keep.forEach((el, i) => { VIRTUAL.heights[i] = el.offsetHeight; });
+  VIRTUAL.heights.forEach(v => { if (v){ measured += v; count++; } });
+  if (count) VIRTUAL.estimate = measured / count;
+  let above = 0, below = 0;
+  for (let i = 0; i < first; i++) above += h(i);
+  for (let i = last + 1; i < n; i++) below += h(i);
+  VIRTUAL.top.style.height = above + "px";
+  VIRTUAL.bottom.style.height = below + "px";
 }
 
-function renderCard(post){
-  const card = document.createElement("div");
-  card.className = "border rounded-lg p-3 mt-2";
-  card.innerHTML = `
+function renderDaySection(i){
+  const d = VIRTUAL.days[i];
+  const slot = document.createElement("div");
+  slot.className = "pb-3";
+  slot.innerHTML = `<section class="post">
+    <div class="flex items-baseline justify-between mb-2">
+      <h4 class="font-medium">Day ${d.day} • ${d.date}</h4>
+      <span class="text-xs text-slate-500">${d.idx.length} platform(s)</span>
+    </div>
+    ${d.idx.map(renderCard).join('')}
+  </section>`;
+  return slot;
+}
+
+function renderCard(idx){
+  const post = VIRTUAL.posts[idx];
+  const rated = VIRTUAL.rated.get(idx);
+  const shot = s => typeof s === 'string' ? s : `${s.type}: ${s.description}`;
+  return `<div class="border rounded-lg p-3 mt-2" data-idx="${idx}">
     <div class="text-sm font-medium mb-1">${capitalize(post.platform)} • ${post.pillar}</div>
-    ${post.image_url ? `<img class="w-full h-40 object-cover rounded mb-2" src="${post.image_url}" alt="Suggested image" />` : ""}
+    ${post.image_url ? `<img class="w-full h-40 object-cover rounded mb-2" src="${escapeAttr(post.image_url)}" alt="Suggested image" loading="lazy" decoding="async" />` : ""}
     <div class="text-xs text-slate-500 mb-2"><strong>Image prompt:</strong> ${escapeHtml(post.image_prompt)}</div>
     <pre class="caption text-sm">${escapeHtml(post.caption)}</pre>
     ${post.reel ? `
@@ -684,63 +846,76 @@ function renderCard(post){
           <ol class="list-decimal ml-5 text-sm text-slate-700">${(post.reel.script_beats||[]).map(b => `<li>${escapeHtml(b)}</li>`).join('')}</ol>
         </div>
         <div class="text-sm mb-2"><strong>Shot list:</strong>
-          <ul class="list-disc ml-5 text-sm text-slate-700">${(post.reel.shot_list||[]).map(s => `<li>${escapeHtml(s.type + ': ' + s.description)}</li>`).join('')}</ul>
+          <ul class="list-disc ml-5 text-sm text-slate-700">${(post.reel.shot_list||[]).map(s => `<li>${escapeHtml(shot(s))}</li>`).join('')}</ul>
         </div>
         <div class="text-sm mb-2"><strong>On-screen text:</strong> ${escapeHtml((post.reel.on_screen_text||[]).join(' • '))}</div>
         <div class="text-sm mb-2"><strong>Hashtags:</strong> ${escapeHtml((post.reel.hashtags||[]).join(' '))}</div>
         <div class="text-sm mb-2"><strong>CTA:</strong> ${escapeHtml(post.reel.cta || '')}</div>
         <div class="flex gap-2 mt-2">
-          <button class="btn-ghost text-xs" data-copy-reel-script>Copy Reel Script</button>
-          <button class="btn-ghost text-xs" data-copy-srt>Copy SRT Prompt</button>
-          <button class="btn-ghost text-xs" data-copy-thumb>Copy Thumbnail Prompt</button>
+          <button class="btn-ghost text-xs" data-action="copy-reel-script">Copy Reel Script</button>
+          <button class="btn-ghost text-xs" data-action="copy-srt">Copy SRT Prompt</button>
+          <button class="btn-ghost text-xs" data-action="copy-thumb">Copy Thumbnail Prompt</button>
         </div>
       </div>
     ` : ''}
     <div class="mt-3 flex items-center gap-2">
-      <button class="btn-ghost text-xs" data-copy="${escapeAttr(post.caption)}">Copy</button>
-      <button class="btn-ghost text-xs" data-like="1" data-day="${post.day_index}" data-platform="${post.platform}">👍</button>
-      <button class="btn-ghost text-xs" data-like="-1" data-day="${post.day_index}" data-platform="${post.platform}">👎</button>
+      <button class="btn-ghost text-xs" data-action="copy">Copy</button>
+      <button class="btn-ghost text-xs" data-action="like" data-rating="1"${rated ? ' disabled' : ''}>${rated === 1 ? '👍 Thanks' : '👍'}</button>
+      <button class="btn-ghost text-xs" data-action="like" data-rating="-1"${rated ? ' disabled' : ''}>${rated === -1 ? '👎 Noted' : '👎'}</button>
     </div>
-  `;
-  card.querySelector("[data-copy]")?.addEventListener("click", async (ev) => {
-    const txt = ev.currentTarget.getAttribute("data-copy") || "";
-    await navigator.clipboard.writeText(txt);
-    ev.currentTarget.textContent = "Copied!";
-    setTimeout(() => (ev.currentTarget.textContent = "Copy"), 1200);
-  });
-  // reel copy buttons
-  if (post.reel){
-    const btnScript = card.querySelector('[data-copy-reel-script]');
-    const btnSrt = card.querySelector('[data-copy-srt]');
-    const btnThumb = card.querySelector('[data-copy-thumb]');
-    const scriptText = `${post.reel.hook}\n\n${(post.reel.script_beats||[]).join('\n')}`;
-    btnScript?.addEventListener('click', async (ev) => {
-      try{ await navigator.clipboard.writeText(scriptText); ev.currentTarget.textContent = 'Copied!'; setTimeout(()=>ev.currentTarget.textContent='Copy Reel Script',1200);}catch(e){console.error(e)}
-    });
-    btnSrt?.addEventListener('click', async (ev) => {
-      try{ await navigator.clipboard.writeText(post.reel.srt_prompt || ''); ev.currentTarget.textContent = 'Copied!'; setTimeout(()=>ev.currentTarget.textContent='Copy SRT Prompt',1200);}catch(e){console.error(e)}
-    });
-    btnThumb?.addEventListener('click', async (ev) => {
-      try{ await navigator.clipboard.writeText(post.reel.thumbnail_prompt || ''); ev.currentTarget.textContent = 'Copied!'; setTimeout(()=>ev.currentTarget.textContent='Copy Thumbnail Prompt',1200);}catch(e){console.error(e)}
+  </div>`;
+}
+
+// text each copy action puts on the clipboard, looked up from the post by index
+const COPY_ACTIONS = {
+  "copy": ["Copy", p => p.caption],
+  "copy-reel-script": ["Copy Reel Script", p => `${p.reel.hook}\n\n${(p.reel.script_beats||[]).join('\n')}`],
+  "copy-srt": ["Copy SRT Prompt", p => p.reel.srt_prompt || ''],
+  "copy-thumb": ["Copy Thumbnail Prompt", p => p.reel.thumbnail_prompt || '']
+};
+
+// one delegated handler for every card action
+if (results) results.addEventListener("click", async (ev) => {
+  const btn = ev.target.closest("[data-action]");
+  const card = btn && btn.closest("[data-idx]");
+  if (!card || !results.contains(card)) return;
+  const idx = +card.getAttribute("data-idx");
+  const post = VIRTUAL.posts[idx];
+  if (!post) return;
+  const action = btn.getAttribute("data-action");
+  if (action === "like"){
+    const rating = +btn.getAttribute("data-rating");
+    card.querySelectorAll('[data-action="like"]').forEach(b => { b.disabled = true; });
+    VIRTUAL.rated.set(idx, rating);
+    btn.textContent = rating > 0 ? "👍 Thanks" : "👎 Noted";
+    await fetch("/api/feedback", {
+      method: "POST",
+      headers: {"Content-Type":"application/json"},
+      body: JSON.stringify({ rating, post_day: post.day_index, platform: post.platform })
     });
+    return;
   }
-  card.querySelectorAll("[data-like]").forEach(btn => {
-    btn.addEventListener("click", async () => {
-      const rating = +btn.getAttribute("data-like");
-      const post_day = +btn.getAttribute("data-day");
-      const platform = btn.getAttribute("data-platform");
-      await fetch("/api/feedback", {
-        method: "POST",
-        headers: {"Content-Type":"application/json"},
-        body: JSON.stringify({ rating, post_day, platform })
-      });
-      if (btn){
-        btn.textContent = rating > 0 ? "👍 Thanks" : "👎 Noted";
-        try{ btn.disabled = true; }catch(e){}
-      }
-    });
-  });
-  return card;
+  const copy = COPY_ACTIONS[action];
+  if (!copy) return;
+  try{
+    await navigator.clipboard.writeText(copy[1](post));
+    btn.textContent = "Copied!";
+    setTimeout(() => { btn.textContent = copy[0]; }, 1200);
+  }catch(e){ console.error(e); }
+});
+
+// download links for the calendar just rendered (server streams it from the saved profile)
+function renderExportBar(posts){
+  const days = new Set(posts.map(p => p.day_index)).size;
+  const platforms = [...new Set(posts.map(p => p.platform))].join(',');
+  const qs = `days=${days}&start_date=${encodeURIComponent(posts[0].date)}&platforms=${encodeURIComponent(platforms)}`;
+  const bar = document.createElement("div");
+  bar.className = "flex items-center gap-2 text-xs text-slate-600 mb-2";
+  bar.innerHTML = `<span>Export:</span>
+    <a class="btn-ghost text-xs" href="/api/generate/export?format=csv&${qs}">CSV</a>
+    <a class="btn-ghost text-xs" href="/api/generate/export?format=ics&${qs}">Calendar (.ics)</a>
+    <a class="btn-ghost text-xs" href="/api/generate/export?format=jsonl&${qs}">JSON Lines</a>`;
+  return bar;
 }
 
 function updateSummary(){
@@ -797,9 +972,6 @@ function renderInlineSummary(){
   });
 }
 
-function groupBy(arr, key){
-  return arr.reduce((acc, x) => { (acc[x[key]] ||= []).push(x); return acc; }, {});
-}
 function capitalize(s){ return s ? s[0].toUpperCase() + s.slice(1) : s; }
 function escapeHtml(s){ return (s||"").replace(/[&<>"']/g, ch => ({'&':'&amp;','<':'&lt;','>':'&gt;','"':'&quot;',"'":'&#39;'}[ch])); }
 function escapeAttr(s){ return (s||"").replace(/"/g, "&quot;"); }
@@ -824,8 +996,7 @@ document.addEventListener('DOMContentLoaded', () => {
     if (modal) modal.classList.add('hidden');
     try{
       await maybeSaveDefaults();
-      const data = await generate(1);
-      renderPosts(data);
+      await showCalendar(1);
     }catch(err){ console.error('generate(1) failed', err); }
   });
   genReelsBtn?.addEventListener('click', async () => {
@@ -836,10 +1007,7 @@ document.addEventListener('DOMContentLoaded', () => {
       clearFormError();
       await maybeSaveDefaults();
       // call generate endpoint requesting only short_video platform
-      const res = await fetch('/api/generate', { method: 'POST', headers: {'Content-Type':'application/json'}, body: JSON.stringify({ ...answers, days: 5, platforms: ['short_video'] }) });
-      if (!res.ok){ const j = await res.json().catch(()=>null); throw new Error((j && j.error) || ('HTTP ' + res.status)); }
-      const data = await res.json();
-      renderPosts(data);
+      await showCalendar(5, { platforms: ['short_video'] });
     }catch(err){ console.error('generate(reels) failed', err); }
   });
   gen7Btn?.addEventListener('click', async () => {
@@ -858,8 +1026,7 @@ document.addEventListener('DOMContentLoaded', () => {
     try{
       clearFormError();
       await maybeSaveDefaults();
-      const data = await generate(7);
-      renderPosts(data);
+      await showCalendar(7);
     }catch(err){ console.error('generate(7) failed', err); }
   });
 
@@ -868,8 +1035,7 @@ document.addEventListener('DOMContentLoaded', () => {
     if (modal) modal.classList.add('hidden');
     try{
       await maybeSaveDefaults();
-      const data = await generate(30);
-      renderPosts(data);
+      await showCalendar(30);
     }catch(err){ console.error('generate(30) failed', err); }
   });
   // show 7-day button based on flags
@@ -0,0 +1,48 @@
+// Service worker: caches the app shell and the content pack.
+// Served from /sw.js with the content version substituted below, so a new
+// config.json version changes this file, installs a fresh cache and drops the old one.
+const CONTENT_VERSION = "__CONTENT_VERSION__";
+const CACHE = "togetherly-" + CONTENT_VERSION;
+const SHELL = [
+  "/",
+  "/static/app.js",
+  "/static/styles.css",
+  "/static/content/config.json",
+  "/static/content/flags.json"
+];
+
+self.addEventListener("install", (event) => {
+  event.waitUntil(
+    caches.open(CACHE).then(cache => cache.addAll(SHELL)).then(() => self.skipWaiting())
+  );
+});
+
+self.addEventListener("activate", (event) => {
+  event.waitUntil(
+    caches.keys()
+      .then(keys => Promise.all(keys.filter(k => k.startsWith("togetherly-") && k !== CACHE).map(k => caches.delete(k))))
+      .then(() => self.clients.claim())
+  );
+});
+
+// Shell and content pack: answer from cache straight away and refresh the
+// cached copy in the background (stale-while-revalidate). Everything else,
+// including /api/*, goes to the network untouched.
+self.addEventListener("fetch", (event) => {
+  const req = event.request;
+  if (req.method !== "GET") return;
+  const url = new URL(req.url);
+  if (url.origin !== self.location.origin || !SHELL.includes(url.pathname)) return;
+  event.respondWith(caches.open(CACHE).then(async (cache) => {
+    const cached = await cache.match(url.pathname);
+    const refresh = fetch(url.pathname, { cache: "no-cache" }).then(res => {
+      if (res.ok) cache.put(url.pathname, res.clone());
+      return res;
+    });
+    if (cached){
+      event.waitUntil(refresh.catch(() => {}));
+      return cached;
+    }
+    return refresh;
+  }));
+});
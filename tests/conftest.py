@@ -4,6 +4,7 @@ import tempfile
 import json
 import sqlite3
 import pytest
+from flask.testing import FlaskClient
 from pathlib import Path
 
 # ensure repo root is on sys.path so `import app` works when pytest runs
@@ -20,6 +21,9 @@ def client(tmp_path, monkeypatch):
     togetherly_app.DB_PATH = str(db_file)
     # Expose DB_PATH on the Flask app object for tests that reference client.application.DB_PATH
     togetherly_app.app.DB_PATH = togetherly_app.DB_PATH
+    togetherly_app.entitlement_cache.clear()
+    togetherly_app.profile_cache.clear()
+    togetherly_app.admission.limiter.clear()
     # ensure DB is initialized
     with togetherly_app.app.app_context():
         togetherly_app.init_db()
@@ -28,6 +32,42 @@ def client(tmp_path, monkeypatch):
         yield client
 
 
+class _OwnContextClient(FlaskClient):
+    # `client` keeps its last request context (and so g.db) alive; run each request in a fresh app
+    # context so this client's requests neither reuse that connection nor share its SQL trace
+    def open(self, *args, **kwargs):
+        with self.application.app_context():
+            return super().open(*args, **kwargs)
+
+
+@pytest.fixture
+def admin_client(client):
+    """A second client on `client`'s database, signed in as admin@example.com (an admin) and sending its CSRF token."""
+    admin = _OwnContextClient(togetherly_app.app, togetherly_app.app.response_class, use_cookies=True)
+    admin.post('/api/signup', json={'email': 'admin@example.com', 'password': 'admin12345'})
+    con = sqlite3.connect(togetherly_app.DB_PATH)
+    con.execute("UPDATE users SET is_admin = 1 WHERE email = 'admin@example.com'")
+    con.commit()
+    con.close()
+    togetherly_app.invalidate_entitlements()
+    admin.get('/admin')
+    with admin.session_transaction() as sess:
+        admin.environ_base['HTTP_X_CSRF_TOKEN'] = sess['admin_csrf']
+    return admin
+
+
+@pytest.fixture
+def sql_trace(client):
+    """Trace SQL for every request made with `client` and fail the test if any endpoint exceeds its query budget."""
+    import sqltrace
+    togetherly_app.app.config['SQL_TRACE'] = True
+    sqltrace.recent_reports.clear()
+    yield sqltrace.recent_reports
+    togetherly_app.app.config['SQL_TRACE'] = False
+    over = [r for r in sqltrace.recent_reports if r['over_budget']]
+    assert not over, 'query budget exceeded: ' + ', '.join(f"{r['endpoint']} ran {r['count']} (budget {r['budget']})" for r in over)
+
+
 def get_user_row(db_path, email):
     con = sqlite3.connect(db_path)
     con.row_factory = sqlite3.Row
@@ -0,0 +1,90 @@
+import pytest
+
+
+@pytest.fixture
+def populated(client, admin_client):
+    import app as togetherly_app
+    with client.application.app_context():
+        db = togetherly_app.get_db()
+        for i in range(7):
+            db.execute('INSERT INTO users (id, email, is_paid, created_at) VALUES (?, ?, ?, ?)',
+                       (f'u{i}', f'user{i}@example.com', i % 2, f'2026-01-0{i + 1} 00:00:00'))
+        db.executemany('INSERT INTO subscriptions (id, user_id, stripe_subscription_id, status, created_at) VALUES (?, ?, ?, ?, ?)', [
+            ('s1', 'u1', 'sub_1', 'canceled', '2026-02-01 00:00:00'),
+            ('s1b', 'u1', 'sub_1b', 'active', '2026-03-01 00:00:00'),
+            ('s3', 'u3', 'sub_3', 'past_due', '2026-02-01 00:00:00'),
+        ])
+        db.commit()
+    return admin_client
+
+
+def all_pages(client, url, key):
+    out, after = [], None
+    while True:
+        j = client.get(url + (f'&after={after}' if after else '')).get_json()
+        # the signed-in admin is a user too; leave it out of the expected lists
+        out += [r for r in j[key] if r.get('email') != 'admin@example.com']
+        after = j['next_after']
+        if not after:
+            return out
+
+
+def test_lists_require_an_admin(client, monkeypatch):
+    monkeypatch.delenv('ADMIN_EMAILS', raising=False)
+    assert client.get('/api/admin/users').status_code == 403
+    assert client.get('/api/admin/subscriptions').status_code == 403
+    client.post('/api/signup', json={'email': 'plain@example.com', 'password': 'pw12345'})
+    assert client.get('/api/admin/users').status_code == 403
+
+
+def test_users_pages_newest_first_with_latest_subscription(populated):
+    users = all_pages(populated, '/api/admin/users?limit=3', 'users')
+    assert [u['id'] for u in users] == ['u6', 'u5', 'u4', 'u3', 'u2', 'u1', 'u0']
+    u1 = next(u for u in users if u['id'] == 'u1')
+    assert u1['subscription']['id'] == 's1b' and u1['subscription']['status'] == 'active'
+    assert next(u for u in users if u['id'] == 'u0')['subscription'] is None
+
+
+def test_user_filters(populated):
+    ids = lambda url: [u['id'] for u in all_pages(populated, url, 'users')]
+    assert ids('/api/admin/users?limit=2&is_paid=1') == ['u5', 'u3', 'u1']
+    assert ids('/api/admin/users?limit=2&status=active') == ['u1']
+    assert ids('/api/admin/users?limit=2&status=past_due&is_paid=1') == ['u3']
+    assert ids('/api/admin/users?limit=2&status=none') == ['u6', 'u5', 'u4', 'u2', 'u0']
+    assert ids('/api/admin/users?limit=1&email=USER') == [f'u{i}' for i in range(7)]
+    assert ids('/api/admin/users?limit=1&email=user3') == ['u3']
+    assert populated.get('/api/admin/users?is_paid=yes').status_code == 400
+
+
+def test_subscription_status_follows_updates(populated):
+    import app as togetherly_app
+    with populated.application.app_context():
+        db = togetherly_app.get_db()
+        db.execute("UPDATE subscriptions SET status = 'canceled' WHERE id = 's1b'")
+        db.execute("DELETE FROM subscriptions WHERE id = 's3'")
+        db.commit()
+    ids = lambda url: [u['id'] for u in all_pages(populated, url, 'users')]
+    assert ids('/api/admin/users?status=canceled') == ['u1']
+    assert 'u3' in ids('/api/admin/users?status=none')
+
+
+def test_subscriptions_list(populated):
+    subs = all_pages(populated, '/api/admin/subscriptions?limit=2', 'subscriptions')
+    assert [s['id'] for s in subs] == ['s1b', 's3', 's1']
+    assert subs[0]['email'] == 'user1@example.com'
+    assert [s['id'] for s in all_pages(populated, '/api/admin/subscriptions?status=canceled', 'subscriptions')] == ['s1']
+
+
+@pytest.mark.parametrize('where, order', [
+    ('', 'created_at DESC, id DESC'),
+    ('WHERE is_paid = 1 AND (created_at, id) < (?, ?)', 'created_at DESC, id DESC'),
+    ('WHERE subscription_status = ? AND (created_at, id) < (?, ?)', 'created_at DESC, id DESC'),
+    ('WHERE email >= ? AND email < ?', 'email'),
+])
+def test_user_pages_are_index_ordered(client, where, order):
+    import app as togetherly_app
+    with client.application.app_context():
+        db = togetherly_app.get_db()
+        params = ['x'] * where.count('?')
+        plan = ' '.join(r[3] for r in db.execute(f'EXPLAIN QUERY PLAN SELECT id FROM users {where} ORDER BY {order} LIMIT 10', params))
+    assert 'USING' in plan and 'TEMP B-TREE' not in plan
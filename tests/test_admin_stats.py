@@ -0,0 +1,69 @@
+import json
+import time
+
+import counters
+
+
+def webhook(client, typ, obj):
+    r = client.post('/api/stripe-webhook', data=json.dumps({'type': typ, 'data': {'object': obj}}), content_type='application/json')
+    assert r.status_code == 200
+
+
+def test_counters_follow_writes(client, admin_client, sql_trace):
+    client.post('/api/signup', json={'email': 'free@example.com', 'password': 'pw12345'})
+    client.post('/api/signup', json={'email': 'paid@example.com', 'password': 'pw12345'})
+    uid = client.get('/api/current_user').get_json()['id']
+    webhook(client, 'checkout.session.completed', {'client_reference_id': uid, 'customer': 'cus_s'})
+    in_three_days = int(time.time()) + 3 * 86400
+    webhook(client, 'customer.subscription.created', {'id': 'sub_s', 'status': 'active', 'customer': 'cus_s', 'current_period_end': in_three_days})
+    client.post('/api/profile', json={'company': 'Stats Co'})
+    assert client.post('/api/feedback', json={'rating': 1, 'post_day': 1, 'platform': 'instagram'}).status_code == 200
+
+    stats = admin_client.get('/api/admin/stats').get_json()['stats']
+    assert stats['users'] == 3  # with the admin
+    assert stats['paid_users'] == 1
+    assert stats['subscriptions'] == {'active': 1}
+    assert stats['renewals_next_7_days'] == 1
+    assert stats['feedback_total'] == stats['feedback_last_7_days'] == 1
+
+    webhook(client, 'customer.subscription.updated', {'id': 'sub_s', 'status': 'canceled', 'customer': 'cus_s', 'current_period_end': in_three_days})
+    stats = admin_client.get('/api/admin/stats').get_json()['stats']
+    assert stats['paid_users'] == 0
+    assert stats['subscriptions'] == {'canceled': 1}
+    assert stats['renewals_next_7_days'] == 0
+    assert admin_client.post('/api/admin/stats/check').get_json()['consistent'] is True
+
+
+def test_check_reports_and_repairs_drift(client, admin_client):
+    client.post('/api/signup', json={'email': 'drift@example.com', 'password': 'pw12345'})
+    import app as togetherly_app
+    with client.application.app_context():
+        db = togetherly_app.get_db()
+        db.execute("UPDATE admin_counters SET value = 7 WHERE name = 'users'")
+        db.commit()
+    j = admin_client.post('/api/admin/stats/check').get_json()
+    assert j['consistent'] is False
+    assert j['mismatches'] == [{'name': 'users', 'bucket': '', 'stored': 7, 'actual': 2}]
+    assert j['repaired'] is False
+    assert admin_client.post('/api/admin/stats/check?repair=1').get_json()['repaired'] is True
+    assert admin_client.post('/api/admin/stats/check').get_json()['consistent'] is True
+    assert admin_client.get('/api/admin/stats').get_json()['stats']['users'] == 2
+
+
+def test_install_fills_counters_for_existing_rows(tmp_path):
+    import sqlite3
+    conn = sqlite3.connect(str(tmp_path / 'old.db'))
+    conn.executescript("""
+        CREATE TABLE users (id TEXT PRIMARY KEY, is_paid INTEGER DEFAULT 0);
+        CREATE TABLE subscriptions (id TEXT PRIMARY KEY, status TEXT, current_period_end DATETIME);
+        CREATE TABLE feedback (id INTEGER PRIMARY KEY, created_at DATETIME DEFAULT CURRENT_TIMESTAMP);
+        INSERT INTO users VALUES ('a', 1), ('b', 0);
+        INSERT INTO subscriptions VALUES ('s1', 'active', '2026-01-05'), ('s2', NULL, NULL);
+    """)
+    counters.install(conn)
+    assert counters.check(conn) == []
+    from datetime import date
+    stats = counters.summary(conn, today=date(2026, 1, 1))
+    assert (stats['users'], stats['paid_users'], stats['renewals_next_7_days']) == (2, 1, 1)
+    assert stats['subscriptions'] == {'active': 1, 'unknown': 1}
+    conn.close()
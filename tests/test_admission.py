@@ -0,0 +1,130 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import admission
+import batch
+
+
+@pytest.fixture
+def ungated():
+    with open('static/content/flags.json', 'w') as f:
+        f.write(json.dumps({'gate7DayToPaid': False}))
+    yield
+    with open('static/content/flags.json', 'w') as f:
+        f.write(json.dumps({'gate7DayToPaid': True}))
+
+
+def test_estimate_cost_weights_reel_platforms():
+    reel = frozenset({'instagram', 'tiktok'})
+    assert admission.estimate_cost(10, ['linkedin', 'twitter'], reel) == 20
+    assert admission.estimate_cost(10, ['instagram', 'linkedin'], reel) == 30
+    assert admission.estimate_cost(0, ['instagram'], reel) == 0
+
+
+def test_token_bucket_refills_and_reports_retry_after():
+    now = [100.0]
+    lim = admission.Limiter(clock=lambda: now[0])
+    limits = [('user:u', 10, 100)]
+    lim.charge(80, limits)
+    with pytest.raises(admission.Rejected) as e:
+        lim.charge(50, limits)
+    assert e.value.status == 429 and e.value.retry_after == 3
+    now[0] += 3
+    lim.charge(50, limits)
+    with pytest.raises(admission.Rejected) as e:
+        lim.charge(101, limits)
+    assert e.value.status == 413
+
+
+def test_hard_ceilings(client, ungated):
+    r = client.post('/api/generate', json={'days': 100000})
+    assert r.status_code == 400 and 'days' in r.get_json()['error']
+    r = client.post('/api/generate', json={'days': 1, 'platforms': [f'p{i}' for i in range(50)]})
+    assert r.status_code == 400
+    r = client.post('/api/generate', json={'days': 1, 'platforms': 'instagram'})
+    assert r.status_code == 400
+
+
+def test_rate_limited_per_ip(client, ungated, monkeypatch):
+    monkeypatch.setenv('GENERATE_IP_BURST', '20')
+    monkeypatch.setenv('GENERATE_IP_RATE', '1')
+    assert client.post('/api/generate', json={'days': 5, 'platforms': ['linkedin']}).status_code == 200
+    r = client.post('/api/generate', json={'days': 20, 'platforms': ['linkedin']})
+    assert r.status_code == 429 and int(r.headers['Retry-After']) >= 1
+
+
+def test_expensive_request_is_queued_and_polled(client, ungated, monkeypatch):
+    monkeypatch.setenv('GENERATE_SYNC_COST', '50')
+    monkeypatch.setattr(batch, '_pool', ThreadPoolExecutor(max_workers=2))
+    payload = {'days': 40, 'start_date': '2025-01-01', 'platforms': ['linkedin', 'instagram'], 'offset': 5, 'limit': 30}
+    r = client.post('/api/generate', json=payload)
+    assert r.status_code == 202
+    body = r.get_json()
+    assert body['queued'] and r.headers['Location'] == body['status_url']
+
+    deadline = time.time() + 10
+    while True:
+        polled = client.get(body['status_url']).get_json()
+        if polled['job']['status'] not in ('queued', 'running') or time.time() > deadline:
+            break
+        time.sleep(0.05)
+    assert polled['job']['status'] == 'finished'
+    result = polled['result']
+    assert result['count'] == 60 and result['offset'] == 5 and result['next_offset'] == 35
+    monkeypatch.setenv('GENERATE_SYNC_COST', '100000')
+    inline = client.post('/api/generate', json=payload).get_json()
+    assert result['posts'] == inline['posts']
+
+    # jobs are only visible to whoever queued them
+    other = client.application.test_client()
+    assert other.get(body['status_url']).status_code == 404
+
+
+def test_stuck_jobs_stop_counting_against_the_limit(client, ungated, monkeypatch):
+    import sqlite3
+    monkeypatch.setenv('GENERATE_SYNC_COST', '10')
+    monkeypatch.setattr(batch, '_pool', ThreadPoolExecutor(max_workers=2))
+    with client.session_transaction() as sess:
+        sess['job_owner'] = 'fixed'
+    db = sqlite3.connect(client.application.DB_PATH)
+    # left 'running' by a process that died an hour ago
+    db.executemany("INSERT INTO generate_jobs (id, owner, status, started_at, created_at) VALUES (?, 'session:fixed', 'running', "
+                   "datetime('now', '-1 hour'), datetime('now', '-1 hour'))", [('stuck1',), ('stuck2',)])
+    db.commit()
+    r = client.post('/api/generate', json={'days': 20, 'platforms': ['linkedin']})
+    assert r.status_code == 202
+    assert dict(db.execute("SELECT id, status FROM generate_jobs WHERE id LIKE 'stuck%'").fetchall()) == {
+        'stuck1': 'failed', 'stuck2': 'failed'}
+
+    db.executemany("INSERT INTO generate_jobs (id, owner, status, created_at) VALUES (?, 'session:fixed', 'running', "
+                   "datetime('now'))", [('live1',), ('live2',)])
+    db.commit()
+    r = client.post('/api/generate', json={'days': 20, 'platforms': ['linkedin']})
+    assert r.status_code == 429 and r.headers['Retry-After'] == '5'
+    db.close()
+
+
+def test_rejected_jobs_are_not_charged(client, ungated, monkeypatch):
+    import sqlite3
+    monkeypatch.setenv('GENERATE_SYNC_COST', '10')
+    monkeypatch.setenv('GENERATE_IP_BURST', '40')
+    monkeypatch.setenv('GENERATE_IP_RATE', '0.001')
+    with client.session_transaction() as sess:
+        sess['job_owner'] = 'fixed'
+    db = sqlite3.connect(client.application.DB_PATH)
+    db.executemany("INSERT INTO generate_jobs (id, owner, status, created_at) VALUES (?, 'session:fixed', 'running', "
+                   "datetime('now'))", [('live1',), ('live2',)])
+    db.commit()
+    db.close()
+    for _ in range(3):
+        r = client.post('/api/generate', json={'days': 20, 'platforms': ['linkedin']})
+        assert r.status_code == 429 and r.headers['Retry-After'] == '5'
+    monkeypatch.setenv('GENERATE_MAX_QUEUED', '0')
+    assert client.post('/api/generate', json={'days': 20, 'platforms': ['linkedin']}).status_code == 503
+
+    # none of those took tokens: the whole burst is still there
+    monkeypatch.setenv('GENERATE_SYNC_COST', '100000')
+    assert client.post('/api/generate', json={'days': 40, 'platforms': ['linkedin']}).status_code == 200
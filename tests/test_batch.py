@@ -0,0 +1,67 @@
+import json
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+import batch
+from generator import generate_posts, params_from_payload
+
+
+def _params(**overrides):
+    return params_from_payload({'days': 9, 'start_date': '2025-03-01', 'platforms': ['instagram', 'linkedin'],
+                                'industry': 'Bakery', 'niche_keywords': ['sourdough'], **overrides})
+
+
+def test_plan_chunks_covers_calendar():
+    assert batch.plan_chunks(9, 4) == [(0, 4), (4, 4), (8, 1)]
+    assert batch.plan_chunks(0, 4) == []
+
+
+def test_offset_continues_pillar_rotation():
+    params = _params()
+    full = generate_posts(**params)
+    tail = generate_posts(**{**params, 'days': 2, 'offset': 7})
+    assert tail == full[14:]
+    assert tail[0]['day_index'] == 8 and tail[0]['date'] == '2025-03-08'
+
+
+def test_iter_batch_chunks_match_single_run():
+    jobs = [('a', _params()), ('b', _params(industry='Fitness', days=3))]
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        out = {key: posts for _, key, posts, error in batch.iter_batch(jobs, executor=pool, chunk_days=4)}
+    assert out['a'] == generate_posts(**jobs[0][1])
+    assert out['b'] == generate_posts(**jobs[1][1])
+
+
+def test_batch_endpoint_streams_ndjson(client, monkeypatch):
+    monkeypatch.setattr(batch, '_pool', ProcessPoolExecutor(max_workers=2))
+    profiles = [{'id': 'client-1', 'days': 2, 'industry': 'Bakery'}, {'id': 'client-2', 'days': 3, 'platforms': ['tiktok']}]
+    r = client.post('/api/generate/batch', json={'profiles': profiles})
+    assert r.status_code == 200
+    assert r.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in r.get_data(as_text=True).splitlines()]
+    by_id = {line['id']: line for line in lines}
+    assert by_id['client-1']['count'] == 2
+    assert by_id['client-2']['count'] == 3
+    assert by_id['client-2']['posts'][0]['reel'] is not None
+    batch._pool.shutdown()
+
+
+def test_batch_endpoint_validates_and_gates(client):
+    assert client.post('/api/generate/batch', json={'profiles': []}).status_code == 400
+    assert client.post('/api/generate/batch', json={'profiles': ['x']}).status_code == 400
+    # gating applies to the longest calendar in the batch
+    with open('static/content/flags.json', 'w') as f:
+        f.write(json.dumps({'gate7DayToPaid': True}))
+    r = client.post('/api/generate/batch', json={'profiles': [{'days': 1}, {'days': 30}]})
+    assert r.status_code == 401
+
+
+def test_cli_writes_one_file_per_profile(tmp_path):
+    src = tmp_path / 'profiles.json'
+    src.write_text(json.dumps([{'id': 'acme co', 'days': 2}, {'days': 1, 'industry': 'Retail'}]))
+    out = tmp_path / 'out'
+    assert batch.main([str(src), '--out-dir', str(out), '--workers', '2']) == 0
+    files = sorted(p.name for p in out.iterdir())
+    assert files == ['1.json', 'acme_co.json']
+    data = json.loads((out / 'acme_co.json').read_text())
+    assert data['count'] == 2 and data['profile_id'] == 'acme co'
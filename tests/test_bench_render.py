@@ -0,0 +1,17 @@
+def test_bench_routes_are_dev_only(client, monkeypatch):
+    monkeypatch.delenv('FLASK_ENV', raising=False)
+    monkeypatch.delenv('ALLOW_DEV_DEBUG', raising=False)
+    assert client.get('/__dev__/bench/render').status_code == 403
+    assert client.get('/__dev__/bench/calendar.json').status_code == 403
+
+
+def test_bench_calendar_and_page(client, monkeypatch):
+    monkeypatch.setenv('ALLOW_DEV_DEBUG', '1')
+    r = client.get('/__dev__/bench/calendar.json?days=10&platforms=3')
+    assert r.status_code == 200
+    data = r.get_json()
+    assert data['count'] == 30
+    assert {p['platform'] for p in data['posts']} == {'instagram', 'facebook', 'linkedin'}
+    page = client.get('/__dev__/bench/render')
+    assert page.status_code == 200
+    assert b'/static/app.js' in page.data and b'BENCH_RESULT' in page.data
@@ -0,0 +1,42 @@
+import json
+
+import content
+
+
+def test_bootstrap_carries_everything_the_page_needs(client):
+    anon = client.get('/api/bootstrap')
+    assert anon.status_code == 200
+    data = anon.get_json()
+    assert data['version'] == content.version()
+    assert data['config']['industries'] and data['flags'] == content.flags()
+    assert data['profile'] == {} and data['current_user'] == {}
+
+    client.post('/api/signup', json={'email': 'boot@example.com', 'password': 'pw123456'})
+    client.post('/api/profile', json={'industry': 'Bakery', 'tone': 'friendly', 'platforms': ['instagram']})
+    data = client.get('/api/bootstrap').get_json()
+    assert data['current_user']['email'] == 'boot@example.com'
+    assert data['profile']['industry'] == 'Bakery'
+
+
+def test_bootstrap_etag_revalidates(client):
+    first = client.get('/api/bootstrap')
+    etag = first.headers['ETag']
+    assert etag and 'no-cache' in first.headers['Cache-Control']
+    again = client.get('/api/bootstrap', headers={'If-None-Match': etag})
+    assert again.status_code == 304 and again.data == b''
+
+    client.post('/api/profile', json={'industry': 'Bakery', 'tone': 'friendly', 'platforms': ['instagram']})
+    changed = client.get('/api/bootstrap', headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.headers['ETag'] != etag
+
+
+def test_content_pack_reloads_when_file_changes(client):
+    before = client.get('/api/bootstrap').get_json()['flags']
+    with open('static/content/flags.json', 'w') as f:
+        f.write(json.dumps({'gate7DayToPaid': False, 'show7Day': True}))
+    try:
+        assert client.get('/api/bootstrap').get_json()['flags'] == {'gate7DayToPaid': False, 'show7Day': True}
+    finally:
+        with open('static/content/flags.json', 'w') as f:
+            f.write(json.dumps({'gate7DayToPaid': True}))
+    assert client.get('/api/bootstrap').get_json()['flags'] == before
@@ -0,0 +1,132 @@
+from datetime import date
+
+import pytest
+
+import generator
+from generator import FIELD_DEPENDENCIES, generate_posts, update_posts
+
+BASE = dict(days=14, start_day=date(2026, 3, 2), industry='Bakery', tone='friendly', platforms=['instagram', 'tiktok'],
+            brand_keywords=['artisan'], include_images=True, niche_keywords=['sourdough'], goals=['sales'],
+            company='Crumb', details={})
+
+
+@pytest.mark.parametrize('change', [
+    {'company': 'Crumb & Co'},
+    {'tone': 'bold'},
+    {'start_day': date(2026, 4, 1)},
+    {'include_images': False},
+    {'brand_keywords': ['organic', 'local']},
+    {'niche_keywords': ['pastry']},
+    {'details': {'reel_style': 'tutorial'}},
+    {'industry': 'Florist', 'goals': []},
+])
+def test_update_matches_full_regeneration(change):
+    posts = generate_posts(**BASE)
+    new = {**BASE, **change}
+    updated, changed = update_posts(posts, BASE, new)
+    fresh = generate_posts(**new)
+    assert updated == fresh
+    assert changed == [i for i, p in enumerate(fresh) if p != posts[i]]
+    assert changed
+
+
+def test_only_dependent_fields_are_recomputed(monkeypatch):
+    posts = generate_posts(**BASE)
+
+    def fail(*args, **kwargs):
+        raise AssertionError('recomputed a field that does not depend on company')
+    monkeypatch.setattr(generator, 'unsplash_link', fail)
+    updated, changed = update_posts(posts, BASE, {**BASE, 'company': 'Crumb & Co'})
+    assert len(changed) == len(posts)
+    for old, new in zip(posts, updated):
+        different = {k for k in old if old[k] != new[k]}
+        assert different <= {f for f, deps in FIELD_DEPENDENCIES.items() if 'company' in deps}
+        assert new['image_url'] == old['image_url'] and new['pillar'] == old['pillar']
+
+
+def test_unrelated_detail_changes_nothing():
+    posts = generate_posts(**BASE)
+    assert update_posts(posts, BASE, {**BASE, 'details': {'notes': 'x'}}) == (posts, [])
+
+
+def test_structural_change_regenerates():
+    posts = generate_posts(**BASE)
+    new = {**BASE, 'days': 10, 'platforms': ['instagram']}
+    updated, changed = update_posts(posts, BASE, new)
+    assert updated == generate_posts(**new)
+    assert len(updated) == 10
+
+
+def _create(client, **payload):
+    r = client.post('/api/calendars', json={'days': 6, 'start_date': '2026-03-02', 'industry': 'Bakery',
+                                            'platforms': ['instagram', 'tiktok'], 'company': 'Crumb', **payload})
+    assert r.status_code == 201
+    return r.get_json()
+
+
+def test_calendar_diff_endpoint(client, sql_trace):
+    created = _create(client)
+    cid = created['id']
+    assert created['count'] == 12
+
+    r = client.patch(f'/api/calendars/{cid}', json={'company': 'Crumb & Co'})
+    body = r.get_json()
+    assert body['ok'] and body['version'] == 2 and not body['regenerated']
+    assert body['changed_inputs'] == ['company']
+    assert set(body['fields']) == {'caption', 'image_prompt', 'reel'}
+    assert len(body['posts']) == 12
+    assert all('Crumb & Co' in p['post']['caption'] for p in body['posts'])
+
+    # an unchanged payload returns no posts and keeps the version
+    r = client.patch(f'/api/calendars/{cid}', json={'company': 'Crumb & Co'})
+    assert r.get_json()['posts'] == [] and r.get_json()['version'] == 2
+
+    stored = client.get(f'/api/calendars/{cid}').get_json()
+    assert stored['version'] == 2 and stored['params']['company'] == 'Crumb & Co'
+    fresh = client.post('/api/generate', json={**stored['params']}).get_json()['posts']
+    assert stored['posts'] == fresh
+
+
+def test_calendar_date_change_touches_dates_only(client):
+    cid = _create(client)['id']
+    before = client.get(f'/api/calendars/{cid}').get_json()['posts']
+    body = client.patch(f'/api/calendars/{cid}', json={'start_date': '2026-03-03'}).get_json()
+    assert body['fields'] == ['date']
+    for item in body['posts']:
+        old = before[item['seq']]
+        assert {k for k in old if old[k] != item['post'][k]} == {'date'}
+
+
+def test_calendar_shrink_regenerates_and_drops_posts(client):
+    cid = _create(client)['id']
+    body = client.patch(f'/api/calendars/{cid}', json={'days': 3, 'platforms': ['instagram', 'tiktok']}).get_json()
+    assert body['regenerated'] and body['count'] == 6
+    assert body['posts'] == []
+    assert len(client.get(f'/api/calendars/{cid}').get_json()['posts']) == 6
+
+
+def test_calendar_templates_changed_regenerates(client, monkeypatch):
+    cid = _create(client)['id']
+    monkeypatch.setattr('app.content_stamp', lambda: 'newer')
+    body = client.patch(f'/api/calendars/{cid}', json={}).get_json()
+    assert body['regenerated'] and body['version'] == 2
+
+
+def test_calendar_is_private_to_its_owner(client):
+    cid = _create(client)['id']
+    with client.application.test_client() as other:
+        assert other.get(f'/api/calendars/{cid}').status_code == 404
+        assert other.patch(f'/api/calendars/{cid}', json={'tone': 'bold'}).status_code == 404
+
+
+def test_oversized_calendar_does_not_charge_rate_limits(client, monkeypatch):
+    import admission
+    monkeypatch.setenv('GENERATE_SYNC_COST', '20')
+    charged = []
+    monkeypatch.setattr(admission, 'admit', lambda cost, **kw: charged.append(cost))
+    r = client.post('/api/calendars', json={'days': 6, 'platforms': ['instagram', 'tiktok']})
+    assert r.status_code == 413
+    cid = _create(client, platforms=['linkedin'])['id']
+    assert len(charged) == 1
+    r = client.patch(f'/api/calendars/{cid}', json={'platforms': ['instagram', 'tiktok']})
+    assert r.status_code == 413 and len(charged) == 1
@@ -0,0 +1,51 @@
+import copy
+from datetime import date
+
+import pytest
+
+import captions
+from captions import Template, TemplateSet
+from generator import generate_posts, make_reel_plan
+
+
+def test_template_renders_fields_and_literal_percent():
+    t = Template('{a} is 100% {b}{a}')
+    assert t.fields == ('a', 'b', 'a')
+    assert t.render({'a': 'x', 'b': 'y'}) == 'x is 100% yx'
+    assert Template('no fields, 5%').render({}) == 'no fields, 5%'
+    with pytest.raises(ValueError):
+        Template('{a.b}')
+
+
+def test_unknown_reel_style_uses_default_hook_and_fallback_shots():
+    tpl = captions.current()
+    plan = make_reel_plan('Bakery', 'Story', [], 'friendly', reel_style='Interpretive dance')
+    assert plan['hook'] == tpl.reel_styles[tpl.default_reel_style].hooks[0].render({})
+    assert plan['shot_list'] == list(tpl.fallback_shots)
+    assert plan['script_beats'][0] == plan['hook']
+
+
+def test_content_edit_swaps_templates_without_restart(monkeypatch):
+    data = copy.deepcopy(captions.current().source)
+    monkeypatch.setattr(captions.content, 'load', lambda name, default=None: data)
+    kwargs = dict(days=1, start_day=date(2025, 1, 1), industry='Bakery', tone='friendly', platforms=['linkedin'],
+                  brand_keywords=[], include_images=False, niche_keywords=[], goals=[])
+    assert 'Platform tip: Value-forward' in generate_posts(**kwargs)[0]['caption']
+
+    data = copy.deepcopy(data)
+    data['platform_hints']['linkedin'] = 'Lead with a number.'
+    data['pillars'] = [{'name': 'Launch', 'hint': 'Announce something new.'}] + data['pillars']
+    post = generate_posts(**kwargs)[0]
+    assert post['pillar'] == 'Launch' and 'Platform tip: Lead with a number.' in post['caption']
+
+    # a broken edit keeps the last good set
+    good = captions.current()
+    data = {'pillars': []}
+    assert captions.current() is good
+
+
+def test_template_set_rejects_missing_default_style():
+    data = copy.deepcopy(captions.current().source)
+    data['reel']['default_style'] = 'Missing'
+    with pytest.raises(ValueError):
+        TemplateSet(data)
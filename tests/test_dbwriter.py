@@ -0,0 +1,79 @@
+import sqlite3
+import threading
+
+import pytest
+
+import dbwriter
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'w.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE t (id INTEGER PRIMARY KEY, v TEXT UNIQUE)')
+    conn.commit()
+    conn.close()
+    return path
+
+
+def count(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute('SELECT COUNT(*) FROM t').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_concurrent_writes_are_grouped(db_path):
+    w = dbwriter.Writer(db_path, max_batch=50, max_delay=20)
+    futures = []
+    lock = threading.Lock()
+
+    def worker(n):
+        for i in range(20):
+            f = w.execute('INSERT INTO t (v) VALUES (?)', (f'{n}-{i}',))
+            with lock:
+                futures.append(f)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert all(f.result(timeout=5) == 1 for f in futures)
+    w.close()
+    assert count(db_path) == 100
+    assert w.ops == 100
+    assert w.commits < 100
+
+
+def test_failing_operation_does_not_undo_its_group(db_path):
+    w = dbwriter.Writer(db_path, max_delay=50)
+    ok1 = w.execute('INSERT INTO t (v) VALUES (?)', ('a',))
+    dup = w.execute('INSERT INTO t (v) VALUES (?)', ('a',))
+    ok2 = w.submit(lambda conn: conn.execute('INSERT INTO t (v) VALUES (?)', ('b',)).lastrowid)
+    assert ok1.result(timeout=5) == 1
+    with pytest.raises(sqlite3.IntegrityError):
+        dup.result(timeout=5)
+    assert ok2.result(timeout=5) == 2
+    w.close()
+    assert count(db_path) == 2
+
+
+def test_full_durability_flushes_without_waiting(db_path):
+    # a long gather window would hold a NORMAL op; FULL commits at once
+    w = dbwriter.Writer(db_path, max_delay=10000)
+    f = w.execute('INSERT INTO t (v) VALUES (?)', ('x',), durability=dbwriter.FULL)
+    assert f.result(timeout=2) == 1
+    assert count(db_path) == 1
+    w.close()
+
+
+def test_close_commits_queued_operations(db_path):
+    w = dbwriter.Writer(db_path, max_delay=10000)
+    futures = [w.execute('INSERT INTO t (v) VALUES (?)', (str(i),)) for i in range(10)]
+    w.close()
+    assert [f.result(timeout=1) for f in futures] == [1] * 10
+    assert count(db_path) == 10
+    with pytest.raises(RuntimeError):
+        w.execute('INSERT INTO t (v) VALUES (?)', ('late',))
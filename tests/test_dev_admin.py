@@ -34,6 +34,7 @@ def test_dev_admin_seed_and_create_user(client):
         db = togetherly_app.get_db()
         db.execute('UPDATE users SET is_admin = 1 WHERE email = ?', ('tester@example.com',))
         db.commit()
+    togetherly_app.invalidate_entitlements()
     # Now GET /admin should render allowed=True (template contains 'Admin' link for allowed users)
     rv3 = client.get('/admin')
     assert rv3.status_code == 200
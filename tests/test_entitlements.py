@@ -0,0 +1,53 @@
+import json
+
+import app as togetherly_app
+
+
+def _signup(client, email):
+    client.post('/api/signup', json={'email': email, 'password': 'pw12345'})
+    return client.get('/api/current_user').get_json()['id']
+
+
+def test_gated_generate_uses_cached_entitlements(client, sql_trace):
+    uid = _signup(client, 'ent-paid@example.com')
+    togetherly_app.set_user_paid(uid, True)
+    client.get('/api/current_user')
+    sql_trace.clear()
+    r = client.post('/api/generate', json={'days': 7})
+    assert r.status_code == 200
+    r = client.get('/api/current_user')
+    assert r.get_json()['is_paid'] is True
+    # both hot paths were served from the entitlement cache without touching the DB
+    assert not [rep for rep in sql_trace if rep['endpoint'] in ('api_generate', 'api_current_user') and rep['count']]
+
+
+def test_webhook_invalidates_cached_paid_flag(client):
+    uid = _signup(client, 'ent-wh@example.com')
+    assert client.get('/api/current_user').get_json()['is_paid'] is False
+    payload = {'type': 'checkout.session.completed', 'data': {'object': {'client_reference_id': uid, 'customer': 'cus_ent', 'subscription': 'sub_ent'}}}
+    client.post('/api/stripe-webhook', data=json.dumps(payload), content_type='application/json')
+    assert client.get('/api/current_user').get_json()['is_paid'] is True
+
+    payload = {'type': 'customer.subscription.deleted', 'data': {'object': {'id': 'sub_ent', 'status': 'canceled', 'customer': 'cus_ent'}}}
+    client.post('/api/stripe-webhook', data=json.dumps(payload), content_type='application/json')
+    assert client.get('/api/current_user').get_json()['is_paid'] is False
+
+
+def test_is_admin_flag_is_honoured(client):
+    uid = _signup(client, 'ent-admin@example.com')
+    with client.application.test_request_context():
+        from flask import session
+        session['user_id'] = uid
+        assert togetherly_app.is_admin() is False
+        db = togetherly_app.get_db()
+        db.execute('UPDATE users SET is_admin = 1 WHERE id = ?', (uid,))
+        db.commit()
+        togetherly_app.invalidate_entitlements(uid)
+        assert togetherly_app.is_admin() is True
+
+
+def test_ttl_zero_disables_cross_request_cache(client, monkeypatch):
+    monkeypatch.setenv('ENTITLEMENT_CACHE_TTL', '0')
+    uid = _signup(client, 'ent-ttl@example.com')
+    client.get('/api/current_user')
+    assert len(togetherly_app.entitlement_cache) == 0
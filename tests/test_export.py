@@ -0,0 +1,70 @@
+import csv
+import io
+import json
+import tracemalloc
+
+import exports
+from generator import iter_posts, params_from_payload
+
+
+def _save_profile(client):
+    client.post('/api/profile', json={'industry': 'Bakery', 'tone': 'friendly', 'platforms': ['instagram', 'linkedin'],
+                                      'company': 'Crumb Co', 'niche_keywords': ['sourdough']})
+
+
+def test_saved_profile_round_trips(client):
+    _save_profile(client)
+    prof = client.get('/api/profile').get_json()
+    assert prof['company'] == 'Crumb Co'
+    assert prof['details'] == {}
+
+
+def test_export_csv_streams_saved_profile(client):
+    _save_profile(client)
+    r = client.get('/api/generate/export?format=csv&days=3&start_date=2025-01-01')
+    assert r.status_code == 200
+    assert r.mimetype == 'text/csv'
+    assert r.is_streamed
+    assert 'attachment' in r.headers['Content-Disposition']
+    rows = list(csv.DictReader(io.StringIO(r.get_data(as_text=True))))
+    assert len(rows) == 6
+    assert rows[0]['date'] == '2025-01-01' and rows[0]['platform'] == 'instagram'
+    assert 'From Crumb Co.' in rows[0]['caption']
+    assert rows[0]['reel_hook'] and not rows[1]['reel_hook']
+
+
+def test_export_jsonl_matches_generator(client):
+    r = client.get('/api/generate/export?format=jsonl&days=2&platforms=tiktok&start_date=2025-01-01')
+    lines = [json.loads(l) for l in r.get_data(as_text=True).splitlines()]
+    expected = list(iter_posts(**params_from_payload({'days': 2, 'platforms': ['tiktok'], 'start_date': '2025-01-01'})))
+    assert lines == expected
+
+
+def test_export_ics_is_valid_and_folded(client):
+    r = client.get('/api/generate/export?format=ics&days=2&start_date=2025-01-01&company=Long%20Company%20Name')
+    assert r.mimetype == 'text/calendar'
+    body = r.get_data(as_text=True)
+    assert body.startswith('BEGIN:VCALENDAR\r\n') and body.endswith('END:VCALENDAR\r\n')
+    assert body.count('BEGIN:VEVENT') == 2
+    assert 'DTSTART;VALUE=DATE:20250101' in body
+    assert all(len(line.encode('utf-8')) <= 75 for line in body.split('\r\n'))
+
+
+def test_export_rejects_unknown_format_and_applies_gate(client):
+    assert client.get('/api/generate/export?format=xml').status_code == 400
+    with open('static/content/flags.json', 'w') as f:
+        f.write(json.dumps({'gate7DayToPaid': True}))
+    assert client.get('/api/generate/export?format=csv&days=30').status_code == 401
+
+
+def test_export_memory_is_flat_for_long_calendars():
+    params = params_from_payload({'days': 3650, 'platforms': ['instagram', 'facebook', 'linkedin', 'tiktok', 'twitter']})
+    tracemalloc.start()
+    total = 0
+    for chunk in exports.buffered(exports.iter_csv(iter_posts(**params))):
+        total += len(chunk)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert total > 10_000_000
+    # a fully materialised calendar of this size needs well over 50 MB
+    assert peak < 2_000_000
@@ -25,6 +25,9 @@ def test_generate_gating(client):
         db = get_db()
         db.execute('UPDATE users SET is_paid = 1 WHERE id = ?', (uid,))
         db.commit()
+    # direct DB writes bypass the app's write paths, so drop the cached entitlements
+    from app import invalidate_entitlements
+    invalidate_entitlements(uid)
 
     # now should be allowed
     r = client.post('/api/generate', json={'days': 7})
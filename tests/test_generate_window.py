@@ -0,0 +1,32 @@
+import json
+
+
+def test_generate_window_matches_full_calendar(client):
+    base = {'days': 40, 'start_date': '2025-01-01', 'platforms': ['instagram', 'twitter']}
+    with open('static/content/flags.json', 'w') as f:
+        f.write(json.dumps({'gate7DayToPaid': False}))
+    try:
+        everything = client.post('/api/generate', json=base).get_json()
+        assert everything['next_offset'] is None and everything['total_days'] == 40
+        page = client.post('/api/generate', json={**base, 'offset': 30, 'limit': 5}).get_json()
+        assert page['posts'] == everything['posts'][60:70]
+        assert page['offset'] == 30 and page['next_offset'] == 35 and page['total_days'] == 40
+        assert page['posts'][0]['day_index'] == 31 and page['posts'][0]['date'] == '2025-01-31'
+
+        last = client.post('/api/generate', json={**base, 'offset': 38, 'limit': 5}).get_json()
+        assert last['count'] == 4 and last['next_offset'] is None
+        past_end = client.post('/api/generate', json={**base, 'offset': 50, 'limit': 5}).get_json()
+        assert past_end['count'] == 0
+    finally:
+        with open('static/content/flags.json', 'w') as f:
+            f.write(json.dumps({'gate7DayToPaid': True}))
+
+
+def test_generate_window_is_gated_on_calendar_length(client):
+    r = client.post('/api/generate', json={'days': 365, 'offset': 0, 'limit': 3})
+    assert r.status_code == 401
+
+
+def test_generate_window_validation(client):
+    assert client.post('/api/generate', json={'days': 3, 'offset': -1}).status_code == 400
+    assert client.post('/api/generate', json={'days': 3, 'limit': 'x'}).status_code == 400
@@ -13,3 +13,15 @@ def test_make_caption_includes_company():
         company='Laura\'s Bakery'
     )
     assert 'From Laura\'s Bakery.' in caption or 'From Laura\'s Bakery' in caption
+
+
+def test_pillar_for_day_matches_rolling_rotation():
+    from itertools import islice
+    from generator import pillar_for_day, rolling_pillars
+    # the content pack's pillar order, repeating every six days
+    order = ['Educational', 'Behind-the-Scenes', 'Testimonial/Social Proof', 'Product/Offer', 'Engagement', 'Story']
+    expected = order * 3 + order[:2]
+    assert [pillar_for_day(i)[0] for i in range(20)] == expected
+    assert [name for name, _ in islice(rolling_pillars(), 20)] == expected
+    assert [name for name, _ in islice(rolling_pillars(13), 7)] == [
+        'Behind-the-Scenes', 'Testimonial/Social Proof', 'Product/Offer', 'Engagement', 'Story', 'Educational', 'Behind-the-Scenes']
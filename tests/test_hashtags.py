@@ -0,0 +1,33 @@
+import hashtags
+from hashtags import HashtagIndex, normalize_tag
+
+CONFIG = {'industries': [
+    {'key': 'bakery', 'label': 'Bakery', 'suggested_keywords': ['sourdough', 'fresh bread', ' ', 'Tips']},
+]}
+
+
+def test_normalize_tag():
+    assert normalize_tag(' open house ') == '#openhouse'
+    assert normalize_tag('a very long keyword indeed') == '#averylongkeywordin'
+    assert normalize_tag('  ') is None
+
+
+def test_tags_merge_base_user_and_suggested():
+    idx = HashtagIndex(CONFIG)
+    tags = idx.tags('Bakery', ['Fresh Bread', 'croissants', ''])
+    assert tags == ['#Bakery', '#SmallBusiness', '#LocalBiz', '#BehindTheScenes', '#Tips',
+                    '#FreshBread', '#croissants', '#sourdough']
+    # matched by key too; unknown industries just get the base tags
+    assert idx.tags('bakery')[-1] == '#freshbread'
+    assert idx.tags('Plumbing', ['pipes']) == ['#Plumbing', '#SmallBusiness', '#LocalBiz', '#BehindTheScenes', '#Tips', '#pipes']
+    assert len(idx.tags('Bakery', [f'kw{i}' for i in range(20)])) == hashtags.MAX_TAGS
+
+
+def test_index_rebuilds_when_content_changes(monkeypatch):
+    cfg = dict(CONFIG)
+    monkeypatch.setattr(hashtags.content, 'config', lambda: cfg)
+    first = hashtags.get_index()
+    assert hashtags.get_index() is first
+    cfg = {'industries': [{'key': 'bakery', 'label': 'Bakery', 'suggested_keywords': ['rye']}]}
+    second = hashtags.get_index()
+    assert second is not first and second.tags('Bakery')[-1] == '#rye'
@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta, timezone
+
+import counters
+import maintenance
+
+NOW = datetime(2026, 6, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def seed(db):
+    old, recent = '2025-01-01 00:00:00', '2026-05-31 00:00:00'
+    db.executemany('INSERT INTO password_reset_tokens (token, user_id, expires_at) VALUES (?, ?, ?)', [
+        (f't{i}', 'u', (NOW.replace(tzinfo=None) - timedelta(hours=1)).isoformat()) for i in range(5)
+    ] + [('live', 'u', (NOW.replace(tzinfo=None) + timedelta(hours=1)).isoformat())])
+    db.executemany('INSERT INTO reconcile_jobs (id, status, result, total, processed, created_at) VALUES (?, ?, ?, ?, ?, ?)', [
+        ('old', 'finished', None, 3, 3, old), ('oldfail', 'failed', 'boom', 0, 0, old), ('new', 'finished', None, 1, 1, recent)])
+    db.executemany("INSERT INTO reconcile_results (job_id, seq, outcome) VALUES (?, ?, 'unchanged')",
+                   [('old', i) for i in range(1, 4)] + [('new', 1)])
+    db.executemany('INSERT INTO generate_jobs (id, status, result, created_at) VALUES (?, ?, ?, ?)', [
+        ('g_old', 'finished', '{}', old), ('g_new', 'finished', '{}', '2026-06-01 06:00:00'), ('g_run', 'running', None, old)])
+    db.executemany('INSERT INTO feedback (profile_id, rating, created_at) VALUES (?, ?, ?)', [
+        ('p', 1, old), ('p', 2, old), ('p', 3, recent)])
+    db.commit()
+
+
+def test_run_purges_archives_and_reports(client, monkeypatch):
+    import app as togetherly_app
+    monkeypatch.setenv('MAINT_BATCH', '2')
+    with client.application.app_context():
+        db = togetherly_app.get_db()
+        seed(db)
+        report = maintenance.run(togetherly_app.DB_PATH, budget=30, now=NOW, writer=togetherly_app.db_writer())
+        tasks = report['tasks']
+        assert report['skipped'] == []
+        assert tasks['purge_tokens']['deleted'] == 5
+        assert tasks['compact_reconcile'] == dict(tasks['compact_reconcile'], result_rows_deleted=3, jobs_archived=2, more=False)
+        assert tasks['purge_generate']['deleted'] == 1
+        assert tasks['archive_feedback']['archived'] == 2
+        assert 'pages_freed' in tasks['incremental_vacuum']
+        assert 'error' not in tasks['optimize'] and 'error' not in tasks['checkpoint']
+
+        assert [r[0] for r in db.execute('SELECT token FROM password_reset_tokens')] == ['live']
+        assert [r[0] for r in db.execute('SELECT id FROM reconcile_jobs')] == ['new']
+        assert db.execute('SELECT COUNT(*) FROM reconcile_results').fetchone()[0] == 1
+        archived = {r['id']: dict(r) for r in db.execute('SELECT * FROM reconcile_jobs_archive')}
+        assert archived['old']['total'] == 3 and archived['oldfail']['error'] == 'boom'
+        assert sorted(r[0] for r in db.execute('SELECT id FROM generate_jobs')) == ['g_new', 'g_run']
+        assert [r[0] for r in db.execute('SELECT rating FROM feedback_archive ORDER BY rating')] == [1, 2]
+        # archiving goes through the feedback triggers, so the dashboard counters stay exact
+        assert counters.check(db) == []
+
+
+def test_budget_skips_remaining_tasks(client):
+    import app as togetherly_app
+    report = maintenance.run(togetherly_app.DB_PATH, budget=0, now=NOW, writer=togetherly_app.db_writer())
+    assert report['tasks'] == {}
+    assert report['skipped'] == [t.__name__ for t in maintenance.TASKS]
+
+
+def test_claim_allows_one_run_per_interval(client):
+    import app as togetherly_app
+    writer = togetherly_app.db_writer()
+    assert maintenance.claim(togetherly_app.DB_PATH, 3600, writer) is not None
+    assert maintenance.claim(togetherly_app.DB_PATH, 3600, writer) is None
+    assert maintenance.run_scheduled(togetherly_app.DB_PATH, 3600) is None
+
+
+def test_admin_endpoint(admin_client):
+    j = admin_client.post('/api/admin/maintenance?budget=5').get_json()
+    assert j['ok'] is True
+    assert 'purge_tokens' in j['report']['tasks']
+    assert admin_client.post('/api/admin/maintenance?budget=x').status_code == 400
+
+
+def test_admin_endpoint_requires_an_admin_and_csrf(client, admin_client, monkeypatch):
+    monkeypatch.delenv('ADMIN_EMAILS', raising=False)
+    assert client.post('/api/admin/maintenance').status_code == 403
+    r = admin_client.post('/api/admin/maintenance', headers={'X-CSRF-Token': 'wrong'})
+    assert r.status_code == 403
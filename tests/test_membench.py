@@ -0,0 +1,33 @@
+import copy
+
+import generator
+import membench
+
+
+def test_generator_memory_within_budget():
+    for days, n in ((7, 1), (30, 5), (365, 1), (365, 5)):
+        r = membench.measure(days, n, 'generate')
+        assert r['posts'] == days * n
+        assert not r['over_budget'], r
+
+
+def test_api_serialisation_within_budget():
+    for days, n in ((30, 2), (365, 1)):
+        r = membench.measure(days, n, 'api')
+        assert r['body_bytes'] > 0
+        assert not r['over_budget'], r
+
+
+def test_per_post_reel_copies_exceed_budget(monkeypatch):
+    # posts share one reel plan per pillar; copying it whole for every post is the regression to catch
+    reel = generator._Renderer.reel
+    monkeypatch.setattr(generator._Renderer, 'reel', lambda self, k, p: copy.deepcopy(reel(self, k, p)))
+    assert membench.measure(365, 1, 'generate')['over_budget']
+
+
+def test_cli_exit_status(monkeypatch, capsys):
+    assert membench.main(['--days', '7', '--platforms', '1,2', '--mode', 'generate']) == 0
+    assert 'generate' in capsys.readouterr().out
+    monkeypatch.setenv('MEMBENCH_BASE_BYTES', '0')
+    monkeypatch.setenv('MEMBENCH_GENERATE_BYTES_PER_POST', '1')
+    assert membench.main(['--days', '7', '--platforms', '1', '--mode', 'generate', '--json']) == 1
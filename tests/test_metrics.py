@@ -0,0 +1,69 @@
+import metrics
+
+
+def test_histogram_renders_cumulative_buckets():
+    h = metrics.Histogram('t_latency_seconds', 'test', ('endpoint',), buckets=(0.1, 1.0))
+    h.observe(0.05, 'a')
+    h.observe(0.5, 'a')
+    h.observe(5.0, 'a')
+    text = '\n'.join(h.render())
+    assert 't_latency_seconds_bucket{endpoint="a",le="0.1"} 1' in text
+    assert 't_latency_seconds_bucket{endpoint="a",le="1.0"} 2' in text
+    assert 't_latency_seconds_bucket{endpoint="a",le="+Inf"} 3' in text
+    assert 't_latency_seconds_count{endpoint="a"} 3' in text
+
+
+def test_metrics_endpoint_requires_token(client, monkeypatch):
+    monkeypatch.delenv('FLASK_ENV', raising=False)
+    monkeypatch.delenv('ALLOW_DEV_DEBUG', raising=False)
+    monkeypatch.setenv('METRICS_TOKEN', 'scrape-me')
+    r = client.get('/__dev__/metrics')
+    assert r.status_code == 403
+    r = client.get('/__dev__/metrics', headers={'Authorization': 'Bearer wrong'})
+    assert r.status_code == 403
+    r = client.get('/__dev__/metrics', headers={'Authorization': 'Bearer scrape-me'})
+    assert r.status_code == 200
+    assert r.mimetype == 'text/plain'
+
+
+def test_metrics_record_requests_sql_and_generator(client, monkeypatch):
+    monkeypatch.setenv('METRICS_TOKEN', 'scrape-me')
+    before_sum, before_count = metrics.sql_queries_per_request.snapshot('api_current_user')
+    client.post('/api/signup', json={'email': 'metrics@example.com', 'password': 'pw12345'})
+    client.get('/api/current_user')
+    client.post('/api/generate', json={'days': 1, 'platforms': ['instagram']})
+    after_sum, after_count = metrics.sql_queries_per_request.snapshot('api_current_user')
+    assert after_count == before_count + 1
+    assert after_sum > before_sum
+
+    text = client.get('/__dev__/metrics', headers={'Authorization': 'Bearer scrape-me'}).get_data(as_text=True)
+    assert 'togetherly_http_request_duration_seconds_count{endpoint="api_current_user",method="GET",status="200"}' in text
+    assert 'togetherly_generator_stage_duration_seconds_count{stage="caption"}' in text
+
+
+def test_stripe_calls_record_outcome(client, admin_client, monkeypatch):
+    class DummySub:
+        @staticmethod
+        def retrieve(sid):
+            if sid == 'sub_bad':
+                raise Exception('boom')
+            return {'id': sid, 'status': 'active', 'current_period_end': None}
+
+    monkeypatch.setattr('app.stripe', __import__('types').SimpleNamespace(Subscription=DummySub()), raising=False)
+    monkeypatch.setenv('STRIPE_SECRET_KEY', 'sk_test_dummy')
+    _, ok_before = metrics.stripe_call_duration.snapshot('subscription.retrieve', 'ok')
+    _, err_before = metrics.stripe_call_duration.snapshot('subscription.retrieve', 'error')
+
+    client.post('/api/signup', json={'email': 'stripe-metrics@example.com', 'password': 'pw12345'})
+    uid = client.get('/api/current_user').get_json()['id']
+    from app import get_db
+    with client.application.app_context():
+        db = get_db()
+        db.execute('INSERT INTO subscriptions (id, user_id, stripe_subscription_id, status) VALUES (?, ?, ?, ?)', ('m_ok', uid, 'sub_ok', 'active'))
+        db.execute('INSERT INTO subscriptions (id, user_id, stripe_subscription_id, status) VALUES (?, ?, ?, ?)', ('m_bad', uid, 'sub_bad', 'active'))
+        db.commit()
+    r = admin_client.post('/api/reconcile-subscriptions')
+    assert r.status_code == 200
+
+    assert metrics.stripe_call_duration.snapshot('subscription.retrieve', 'ok')[1] == ok_before + 1
+    assert metrics.stripe_call_duration.snapshot('subscription.retrieve', 'error')[1] == err_before + 1
@@ -0,0 +1,41 @@
+import json
+
+import microbench
+
+
+def _run(**cases):
+    return {'results': {name: {'median_ns': m, 'mad_ns': mad, 'calibration_ns': cal}
+                        for name, (m, mad, cal) in cases.items()}}
+
+
+def test_compare_flags_only_regressions_beyond_noise():
+    base = _run(fast=(1000, 10, 100), noisy=(1000, 200, 100), steady=(1000, 10, 100))
+    cur = _run(fast=(1300, 10, 100), noisy=(1300, 200, 100), steady=(1050, 10, 100))
+    rows = {r['name']: r for r in microbench.compare(cur, base, threshold=0.1, noise_k=3)}
+    assert rows['fast']['regressed']
+    assert not rows['noisy']['regressed']  # 30% slower, but inside 3x the spread
+    assert not rows['steady']['regressed']  # outside the noise, inside the threshold
+
+
+def test_compare_scales_by_calibration():
+    base = _run(case=(1000, 10, 100))
+    # a machine twice as slow: the case and the calibration loop both take twice as long
+    cur = _run(case=(2000, 20, 200))
+    row = microbench.compare(cur, base, threshold=0.1)[0]
+    assert row['current_ns'] == 1000 and not row['regressed']
+
+
+def test_bench_and_run_shape():
+    r = microbench.bench(lambda: None, samples=3, warmup=1, sample_ms=1)
+    assert r['samples'] == 3 and r['loops'] >= 1 and r['min_ns'] <= r['median_ns']
+    out = microbench.run('image_prompt[kw=1]', samples=2, warmup=0, sample_ms=1)
+    assert list(out['results']) == ['image_prompt[kw=1]']
+    assert out['results']['image_prompt[kw=1]']['calibration_ns'] > 0
+
+
+def test_baseline_covers_every_case():
+    with open(microbench.BASELINE) as f:
+        baseline = json.load(f)
+    assert set(baseline['results']) == set(microbench.cases())
+    for name in ('make_caption', 'make_reel_plan', 'default_hashtags', 'image_prompt', 'generate_posts'):
+        assert any(case.startswith(name + '[') for case in baseline['results'])
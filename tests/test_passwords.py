@@ -0,0 +1,70 @@
+import threading
+
+import pytest
+
+import passwords
+from tests.conftest import get_user_row
+
+
+@pytest.fixture
+def fast_hashing(monkeypatch):
+    monkeypatch.setenv('PASSWORD_HASH_ITERATIONS', '1000')
+    passwords.reset()
+    yield
+    passwords.reset()
+
+
+def test_hash_and_verify_on_pool(fast_hashing):
+    h = passwords.hash_password('s3cret!')
+    assert h.startswith('pbkdf2:sha256:1000$')
+    assert passwords.verify_password(h, 's3cret!')
+    assert not passwords.verify_password(h, 'nope')
+    assert not passwords.verify_password('', 's3cret!')
+
+
+def test_needs_rehash_tracks_configured_cost(fast_hashing, monkeypatch):
+    h = passwords.hash_password('pw12345')
+    assert not passwords.needs_rehash(h)
+    monkeypatch.setenv('PASSWORD_HASH_ITERATIONS', '2000')
+    assert passwords.needs_rehash(h)
+
+
+def test_login_upgrades_hash(client, fast_hashing, monkeypatch):
+    client.post('/api/signup', json={'email': 'rehash@example.com', 'password': 'pw12345'})
+    old = get_user_row(str(client.application.DB_PATH), 'rehash@example.com')['password_hash']
+    assert old.startswith('pbkdf2:sha256:1000$')
+
+    monkeypatch.setenv('PASSWORD_HASH_ITERATIONS', '1500')
+    r = client.post('/api/login', json={'email': 'rehash@example.com', 'password': 'pw12345'})
+    assert r.status_code == 200
+    new = get_user_row(str(client.application.DB_PATH), 'rehash@example.com')['password_hash']
+    assert new.startswith('pbkdf2:sha256:1500$')
+    # still logs in with the upgraded hash
+    assert client.post('/api/login', json={'email': 'rehash@example.com', 'password': 'pw12345'}).status_code == 200
+
+
+def test_concurrency_cap_returns_503(client, monkeypatch):
+    monkeypatch.setenv('PASSWORD_HASH_WORKERS', '0')
+    monkeypatch.setenv('PASSWORD_HASH_CONCURRENCY', '1')
+    monkeypatch.setenv('PASSWORD_HASH_WAIT', '0.01')
+    passwords.reset()
+    release = threading.Event()
+    started = threading.Event()
+
+    def slow_hash(password, method):
+        started.set()
+        release.wait(5)
+        return 'pbkdf2:sha256:1$x$y'
+
+    monkeypatch.setattr(passwords, 'generate_password_hash', slow_hash)
+    t = threading.Thread(target=passwords.hash_password, args=('pw',))
+    t.start()
+    try:
+        assert started.wait(5)
+        r = client.post('/api/signup', json={'email': 'busy@example.com', 'password': 'pw12345'})
+        assert r.status_code == 503
+        assert r.headers.get('Retry-After')
+    finally:
+        release.set()
+        t.join()
+        passwords.reset()
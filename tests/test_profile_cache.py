@@ -0,0 +1,51 @@
+import profiles
+
+
+def test_saved_profile_is_served_from_cache_with_etag(client, monkeypatch):
+    client.post('/api/profile', json={'industry': 'Bakery', 'platforms': ['instagram']})
+
+    def no_db(conn, profile_id):
+        raise AssertionError('profile read hit the database')
+    monkeypatch.setattr(profiles, 'load', no_db)
+
+    r = client.get('/api/profile')
+    assert r.status_code == 200
+    assert r.get_json()['industry'] == 'Bakery'
+    etag = r.headers['ETag']
+    assert client.get('/api/profile', headers={'If-None-Match': etag}).status_code == 304
+    assert client.get('/api/bootstrap').get_json()['profile']['platforms'] == ['instagram']
+
+
+def test_save_writes_through(client):
+    client.post('/api/profile', json={'industry': 'Bakery'})
+    first = client.get('/api/profile')
+    client.post('/api/profile', json={'industry': 'Florist'})
+    second = client.get('/api/profile', headers={'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 200
+    assert second.get_json()['industry'] == 'Florist'
+    assert second.headers['ETag'] != first.headers['ETag']
+
+
+def test_cold_cache_reads_once(client, monkeypatch):
+    import app as togetherly_app
+    client.post('/api/profile', json={'industry': 'Bakery'})
+    uncached = client.get('/api/profile').get_data()
+    togetherly_app.profile_cache.clear()
+    calls = []
+    real = profiles.load
+    monkeypatch.setattr(profiles, 'load', lambda conn, pid: calls.append(pid) or real(conn, pid))
+    for _ in range(3):
+        assert client.get('/api/profile').get_data() == uncached
+    assert len(calls) == 1
+
+    monkeypatch.setenv('PROFILE_CACHE_TTL', '0')
+    togetherly_app.profile_cache.clear()
+    client.get('/api/profile')
+    client.get('/api/profile')
+    assert len(calls) == 3
+
+
+def test_no_profile(client):
+    r = client.get('/api/profile')
+    assert r.get_json() == {}
+    assert 'ETag' not in r.headers
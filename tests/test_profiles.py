@@ -0,0 +1,81 @@
+import sqlite3
+
+import profiles
+
+
+def save(client, **fields):
+    with client.session_transaction() as sess:
+        sess.pop('profile_id', None)
+    r = client.post('/api/profile', json=fields)
+    assert r.status_code == 200
+    return r.get_json()['profile_id']
+
+
+def test_profile_round_trip(client):
+    pid = save(client, industry='Bakery', tone='playful', platforms=['instagram', 'tiktok'], brand_keywords=['sourdough'],
+               goals=['awareness'], details={'reel_style': 'day-in-the-life', 'city': 'Leeds'}, company='crumb co', include_images=False)
+    p = client.get('/api/profile').get_json()
+    assert p == dict(p, id=pid, industry='Bakery', tone='playful', platforms=['instagram', 'tiktok'], brand_keywords=['sourdough'],
+                     niche_keywords=[], goals=['awareness'], details={'reel_style': 'day-in-the-life', 'city': 'Leeds'},
+                     company='Crumb Co', include_images=False)
+    assert client.get('/api/bootstrap').get_json()['profile'] == p
+
+
+def test_segments_follow_saves(client, admin_client):
+    a = save(client, platforms=['TikTok', 'instagram'], brand_keywords=['vegan'], details={'reel_style': 'tutorial'})
+    b = save(client, platforms=['linkedin'], niche_keywords=['vegan'], goals=['leads'])
+    c = save(client, platforms=['tiktok'], details={'reel_style': 'tutorial'})
+    ids = lambda qs: sorted(p['id'] for p in admin_client.get('/api/admin/profiles?' + qs).get_json()['profiles'])
+    assert ids('platform=tiktok') == sorted([a, c])
+    assert ids('keyword=VEGAN') == sorted([a, b])
+    assert ids('reel_style=tutorial&platform=instagram') == [a]
+    assert ids('goal=leads') == [b]
+
+    # an update replaces that profile's values
+    client.post('/api/profile', json={'platforms': ['instagram'], 'details': {'reel_style': 'tips'}})
+    assert ids('platform=tiktok') == [a]
+    assert ids('reel_style=tips') == [c]
+
+    segs = admin_client.get('/api/admin/profile-segments?field=platforms').get_json()['segments']
+    assert {s['value'].lower(): s['profiles'] for s in segs} == {'instagram': 2, 'tiktok': 1, 'linkedin': 1}
+    assert admin_client.get('/api/admin/profile-segments?field=nope').status_code == 400
+
+    first = admin_client.get('/api/admin/profiles?limit=2').get_json()
+    rest = admin_client.get('/api/admin/profiles?limit=2&after=' + first['next_after']).get_json()
+    assert sorted(p['id'] for p in first['profiles'] + rest['profiles']) == sorted([a, b, c])
+    assert rest['next_after'] is None
+
+
+def test_segments_require_an_admin(client, monkeypatch):
+    monkeypatch.delenv('ADMIN_EMAILS', raising=False)
+    save(client, platforms=['tiktok'])
+    assert client.get('/api/admin/profiles').status_code == 403
+    assert client.get('/api/admin/profile-segments').status_code == 403
+
+
+def test_install_backfills_existing_profiles(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'old.db'))
+    conn.execute('CREATE TABLE profiles (id TEXT PRIMARY KEY, industry TEXT, tone TEXT, platforms TEXT, brand_keywords TEXT, '
+                 'niche_keywords TEXT, goals TEXT, details TEXT, company TEXT, include_images INTEGER DEFAULT 1, created_at DATETIME)')
+    conn.executemany('INSERT INTO profiles (id, platforms, brand_keywords, details) VALUES (?, ?, ?, ?)', [
+        ('p1', '["tiktok", "instagram"]', '["a", 3, {"x": 1}]', '{"reel_style": "tips"}'),
+        ('p2', 'not json', None, 'also not json'),
+    ])
+    profiles.install(conn)
+    assert conn.execute("SELECT field, pos, value FROM profile_values ORDER BY field, pos").fetchall() == [
+        ('brand_keywords', 0, 'a'), ('brand_keywords', 1, '3'), ('platforms', 0, 'tiktok'), ('platforms', 1, 'instagram')]
+    assert conn.execute("SELECT id, reel_style FROM profiles ORDER BY id").fetchall() == [('p1', 'tips'), ('p2', None)]
+    # malformed columns read back as empty values rather than failing
+    import json
+    p2 = json.loads(profiles.load(conn, 'p2'))
+    assert (p2['platforms'], p2['details'], p2['include_images']) == ([], {}, True)
+
+
+def test_segment_queries_use_indexes(client):
+    import app as togetherly_app
+    with client.application.app_context():
+        db = togetherly_app.get_db()
+        where, params = profiles.segment_sql([('platform', 'tiktok'), ('reel_style', 'tips')])
+        plan = ' '.join(r[3] for r in db.execute('EXPLAIN QUERY PLAN SELECT p.id FROM profiles p WHERE ' + ' AND '.join(where), params))
+    assert 'idx_profile_values_lookup' in plan or 'idx_profiles_reel_style' in plan
+    assert 'SCAN p' not in plan
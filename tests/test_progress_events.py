@@ -0,0 +1,94 @@
+import json
+import threading
+import time
+
+import progress
+
+
+class DummySub:
+    @staticmethod
+    def retrieve(sid):
+        return {'id': sid, 'status': 'canceled' if sid == 'sub_x' else 'active', 'current_period_end': None}
+
+
+def events(body):
+    out = []
+    for block in body.split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines() if ': ' in line and not line.startswith(':'))
+        if 'event' in fields:
+            out.append((fields['event'], json.loads(fields['data'])))
+    return out
+
+
+def test_topic_wait_returns_latest_state():
+    progress.clear()
+    progress.publish('t1', {'n': 1})
+    topic = progress.topic('t1')
+    version, state, done = topic.wait(0, 1)
+    assert (version, state, done) == (1, {'n': 1}, False)
+    # nothing new: times out with the same version
+    assert topic.wait(version, 0.05)[0] == version
+    threading.Timer(0.05, progress.publish, args=('t1', {'n': 2}), kwargs={'done': True}).start()
+    assert topic.wait(version, 2) == (2, {'n': 2}, True)
+
+
+def test_events_stream_progress_then_done(admin_client):
+    progress.clear()
+    progress.publish('live', {'status': 'running', 'processed': 1, 'total': 3})
+
+    def finish():
+        time.sleep(0.2)
+        progress.publish('live', {'status': 'running', 'processed': 2, 'total': 3})
+        time.sleep(0.2)
+        progress.publish('live', {'status': 'finished', 'processed': 3, 'total': 3}, done=True)
+
+    threading.Thread(target=finish).start()
+    r = admin_client.get('/api/reconcile-jobs/live/events')
+    assert r.status_code == 200
+    assert r.mimetype == 'text/event-stream'
+    evs = events(r.get_data(as_text=True))
+    assert evs[0] == ('progress', {'status': 'running', 'processed': 1, 'total': 3})
+    assert evs[-1] == ('done', {'status': 'finished', 'processed': 3, 'total': 3})
+    # the WSGI server closes the response, which frees the listener slot
+    listeners = progress._listeners
+    r.close()
+    assert progress._listeners == listeners - 1
+
+
+def test_reconcile_job_publishes_counts(client, admin_client, monkeypatch):
+    client.post('/api/signup', json={'email': 'sse@example.com', 'password': 'pw12345'})
+    uid = client.get('/api/current_user').get_json()['id']
+    import app as togetherly_app
+    with client.application.app_context():
+        db = togetherly_app.get_db()
+        for sid in ('sub_x', 'sub_y'):
+            db.execute('INSERT INTO subscriptions (id, user_id, stripe_subscription_id, status) VALUES (?, ?, ?, ?)', ('s_' + sid, uid, sid, 'active'))
+        db.commit()
+    monkeypatch.setattr('app.stripe', __import__('types').SimpleNamespace(Subscription=DummySub()), raising=False)
+    monkeypatch.setenv('STRIPE_SECRET_KEY', 'sk_test_dummy')
+    job_id = admin_client.post('/api/reconcile-job?wait=1').get_json()['job']['id']
+
+    evs = events(admin_client.get(f'/api/reconcile-jobs/{job_id}/events').get_data(as_text=True))
+    assert evs == [('done', {'status': 'finished', 'processed': 2, 'total': 2, 'changed': 1, 'errors': 0, 'eta_seconds': 0})]
+
+    # once the topic is gone the stored row answers
+    progress.clear()
+    evs = events(admin_client.get(f'/api/reconcile-jobs/{job_id}/events').get_data(as_text=True))
+    assert evs[0][0] == 'done' and evs[0][1]['status'] == 'finished'
+    assert admin_client.get('/api/reconcile-jobs/nope/events').status_code == 404
+
+
+def test_events_require_an_admin(client, monkeypatch):
+    monkeypatch.delenv('ADMIN_EMAILS', raising=False)
+    progress.clear()
+    progress.publish('private', {'status': 'running'})
+    assert client.get('/api/reconcile-jobs/private/events').status_code == 403
+
+
+def test_listener_limit(admin_client, monkeypatch):
+    progress.clear()
+    progress.publish('busy', {'status': 'running'})
+    monkeypatch.setenv('PROGRESS_MAX_LISTENERS', '0')
+    r = admin_client.get('/api/reconcile-jobs/busy/events')
+    assert r.status_code == 503
+    assert r.headers['Retry-After'] == '5'
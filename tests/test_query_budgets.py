@@ -0,0 +1,98 @@
+import json
+import sqlite3
+
+import sqltrace
+
+
+def test_normalize_collapses_literals():
+    a = sqltrace.normalize("SELECT * FROM users WHERE id = 'abc' AND is_paid = 1")
+    b = sqltrace.normalize("SELECT *  FROM users WHERE id = 'x''y' AND is_paid = 0")
+    assert a == b == 'SELECT * FROM users WHERE id = ? AND is_paid = ?'
+
+
+def test_hot_endpoints_stay_within_budget(client, sql_trace):
+    client.post('/api/signup', json={'email': 'budget@example.com', 'password': 'pw12345'})
+    client.post('/api/login', json={'email': 'budget@example.com', 'password': 'pw12345'})
+    client.get('/api/current_user')
+    client.get('/api/account')
+    client.get('/account')
+    client.get('/admin')
+    client.post('/api/profile', json={'company': 'Budget Co'})
+    client.post('/api/generate', json={'days': 1})
+    client.get('/api/bootstrap')
+    client.get('/api/profile')
+    client.post('/api/feedback', json={'rating': 1, 'post_day': 1, 'platform': 'instagram'})
+    endpoints = {r['endpoint'] for r in sql_trace}
+    assert {'api_current_user', 'api_account', 'account_page', 'save_profile', 'api_feedback'} <= endpoints
+    # the saved profile and the entitlements are served from cache: no SQL at all
+    assert not {'api_bootstrap', 'get_profile'} & endpoints
+    # schema setup no longer runs per request
+    assert all(not s['sql'].startswith('CREATE TABLE') for r in sql_trace for s in r['statements'])
+
+
+def test_webhook_stays_within_budget(client, sql_trace):
+    client.post('/api/signup', json={'email': 'budget-wh@example.com', 'password': 'pw12345'})
+    uid = client.get('/api/current_user').get_json()['id']
+    for typ, obj in (
+        ('checkout.session.completed', {'client_reference_id': uid, 'customer': 'cus_b', 'subscription': 'sub_b'}),
+        ('customer.subscription.updated', {'id': 'sub_b', 'status': 'past_due', 'customer': 'cus_b'}),
+    ):
+        r = client.post('/api/stripe-webhook', data=json.dumps({'type': typ, 'data': {'object': obj}}), content_type='application/json')
+        assert r.status_code == 200
+    assert [r['endpoint'] for r in sql_trace].count('api_stripe_webhook') == 2
+
+
+def test_reconcile_loop_is_reported_as_n_plus_one(client, admin_client, monkeypatch):
+    import app as togetherly_app
+    togetherly_app.app.config['SQL_TRACE'] = True
+    sqltrace.recent_reports.clear()
+    try:
+        client.post('/api/signup', json={'email': 'nplus1@example.com', 'password': 'pw12345'})
+        uid = client.get('/api/current_user').get_json()['id']
+        with client.application.app_context():
+            db = togetherly_app.get_db()
+            for i in range(3):
+                db.execute('INSERT INTO subscriptions (id, user_id, stripe_subscription_id, status) VALUES (?, ?, ?, ?)', (f's_n{i}', uid, f'sub_n{i}', 'active'))
+            db.commit()
+
+        class DummySub:
+            @staticmethod
+            def retrieve(sid):
+                return {'id': sid, 'status': 'active', 'current_period_end': None}
+
+        monkeypatch.setattr('app.stripe', __import__('types').SimpleNamespace(Subscription=DummySub()), raising=False)
+        monkeypatch.setenv('STRIPE_SECRET_KEY', 'sk_test_dummy')
+        assert admin_client.post('/api/reconcile-subscriptions').status_code == 200
+    finally:
+        togetherly_app.app.config['SQL_TRACE'] = False
+    rep = [r for r in sqltrace.recent_reports if r['endpoint'] == 'api_reconcile_subscriptions'][-1]
+    repeated = {r['sql'] for r in rep['repeated']}
+    assert 'UPDATE users SET is_paid = ? WHERE id = ?' in repeated
+
+
+def test_identical_statements_in_a_loop_all_count():
+    import app as togetherly_app
+    conn = sqlite3.connect(':memory:', factory=togetherly_app.TimedConnection)
+    tracer = sqltrace.QueryTracer('loop')
+    tracer.attach(conn)
+    conn.execute('create table a (x)')
+    for _ in range(5):
+        conn.execute('select count(*) from a')
+    for _ in range(3):
+        conn.execute('select * from a where x=?', (1,))
+    rep = tracer.report()
+    assert rep['count'] == 9
+    assert {d['sql']: d['count'] for d in rep['duplicates']} == {'select count(*) from a': 5, 'select * from a where x=1': 3}
+    assert {r['sql'] for r in rep['repeated']} == {'select count(*) from a', 'select * from a where x=?'}
+
+
+def test_trigger_statements_count_once_per_call():
+    import app as togetherly_app
+    conn = sqlite3.connect(':memory:', factory=togetherly_app.TimedConnection)
+    conn.executescript('create table a (x); create table log (x);'
+                       'create trigger a_ins after insert on a begin insert into log values (new.x); insert into log values (1); end;')
+    tracer = sqltrace.QueryTracer('trigger')
+    tracer.attach(conn)
+    conn.execute('insert into a values (1)')
+    conn.execute('insert into a values (1)')
+    assert tracer.report()['count'] == 2
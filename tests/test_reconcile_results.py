@@ -0,0 +1,73 @@
+class DummySub:
+    @staticmethod
+    def retrieve(sid):
+        if sid == 'sub_3':
+            raise Exception('not found')
+        return {'id': sid, 'status': 'canceled' if sid in ('sub_1', 'sub_4') else 'active', 'current_period_end': None}
+
+
+def run_job(client, admin, monkeypatch, n=5):
+    client.post('/api/signup', json={'email': 'rows@example.com', 'password': 'pw12345'})
+    uid = client.get('/api/current_user').get_json()['id']
+    import app as togetherly_app
+    with client.application.app_context():
+        db = togetherly_app.get_db()
+        for i in range(n):
+            db.execute('INSERT INTO subscriptions (id, user_id, stripe_subscription_id, status) VALUES (?, ?, ?, ?)', (f's_{i}', uid, f'sub_{i}', 'active'))
+        db.commit()
+    monkeypatch.setattr('app.stripe', __import__('types').SimpleNamespace(Subscription=DummySub()), raising=False)
+    monkeypatch.setenv('STRIPE_SECRET_KEY', 'sk_test_dummy')
+    monkeypatch.setenv('RECONCILE_BATCH', '2')
+    r = admin.post('/api/reconcile-job?wait=1')
+    assert r.status_code == 200
+    return r.get_json()['job']
+
+
+def test_job_stores_rows_and_counts(client, admin_client, monkeypatch):
+    job = run_job(client, admin_client, monkeypatch)
+    assert job['status'] == 'finished'
+    assert (job['total'], job['processed'], job['changed'], job['errors']) == (5, 5, 2, 1)
+    assert 'result' not in job
+
+    j = admin_client.get(f"/api/reconcile-jobs/{job['id']}").get_json()
+    assert [r['seq'] for r in j['results']] == [1, 2, 3, 4, 5]
+    assert j['next_after'] is None
+    err = [r for r in j['results'] if r['outcome'] == 'error']
+    assert err == [{'seq': 4, 'subscription_id': 's_3', 'stripe_subscription_id': 'sub_3', 'status': None,
+                    'current_period_end': None, 'outcome': 'error', 'error': 'not found'}]
+
+
+def test_results_are_keyset_paginated_and_filtered(client, admin_client, monkeypatch):
+    job_id = run_job(client, admin_client, monkeypatch)['id']
+    seen = []
+    after = 0
+    while after is not None:
+        j = admin_client.get(f'/api/reconcile-jobs/{job_id}?limit=2&after={after}').get_json()
+        seen += [r['seq'] for r in j['results']]
+        after = j['next_after']
+    assert seen == [1, 2, 3, 4, 5]
+
+    j = admin_client.get(f'/api/reconcile-jobs/{job_id}?outcome=changed').get_json()
+    assert [r['stripe_subscription_id'] for r in j['results']] == ['sub_1', 'sub_4']
+    j = admin_client.get(f'/api/reconcile-jobs/{job_id}?status=active&limit=1').get_json()
+    assert [r['seq'] for r in j['results']] == [1] and j['next_after'] == 1
+    assert admin_client.get(f'/api/reconcile-jobs/{job_id}?outcome=bogus').status_code == 400
+    assert admin_client.get(f'/api/reconcile-jobs/{job_id}?limit=x').status_code == 400
+
+
+def test_results_require_an_admin(client, admin_client, monkeypatch):
+    job_id = run_job(client, admin_client, monkeypatch)['id']
+    monkeypatch.delenv('ADMIN_EMAILS', raising=False)
+    assert client.get(f'/api/reconcile-jobs/{job_id}').status_code == 403
+
+
+def test_result_queries_use_the_indexes(client, admin_client, monkeypatch):
+    job_id = run_job(client, admin_client, monkeypatch)['id']
+    import app as togetherly_app
+    with client.application.app_context():
+        db = togetherly_app.get_db()
+        plan = ' '.join(r[3] for r in db.execute(
+            'EXPLAIN QUERY PLAN SELECT seq FROM reconcile_results WHERE job_id = ? AND outcome = ? AND seq > ? ORDER BY seq LIMIT 10',
+            (job_id, 'error', 0)))
+    assert 'idx_reconcile_results_outcome' in plan
+    assert 'TEMP B-TREE' not in plan
@@ -0,0 +1,16 @@
+import json
+import os
+
+
+def test_service_worker_served_from_root_with_content_version(client):
+    cfg_path = os.path.join(os.path.dirname(__file__), '..', 'static', 'content', 'config.json')
+    with open(cfg_path, encoding='utf-8') as f:
+        version = json.load(f)['version']
+    r = client.get('/sw.js')
+    assert r.status_code == 200
+    assert r.mimetype == 'application/javascript'
+    assert r.headers['Service-Worker-Allowed'] == '/'
+    assert 'no-cache' in r.headers['Cache-Control']
+    body = r.get_data(as_text=True)
+    assert f'const CONTENT_VERSION = "{version}";' in body
+    assert '__CONTENT_VERSION__' not in body
@@ -0,0 +1,31 @@
+import startup
+
+
+def test_cold_start_within_budget():
+    r = startup.measure()
+    assert r['status'] == 200
+    # billing/AI SDKs and multiprocessing are loaded on first use, never at boot
+    assert r['loaded'] == []
+    assert r['import_ms'] < startup.IMPORT_BUDGET_MS, r['app_imports'][:10]
+    assert r['first_request_ms'] < startup.FIRST_REQUEST_BUDGET_MS
+
+
+def test_stripe_is_loaded_on_first_use(client, monkeypatch):
+    import app as app_module
+    monkeypatch.setattr(app_module, 'stripe', app_module._NOT_LOADED)
+    monkeypatch.delenv('STRIPE_SECRET_KEY', raising=False)
+    assert app_module.stripe_client() is None
+    assert app_module.stripe is app_module._NOT_LOADED
+    monkeypatch.setenv('STRIPE_SECRET_KEY', 'sk_test_dummy')
+    mod = app_module.stripe_client()
+    assert mod is app_module.stripe and mod.api_key == 'sk_test_dummy'
+
+
+def test_parse_importtime():
+    rows = startup._parse_importtime(
+        'import time: self [us] | cumulative | imported package\n'
+        'import time:       120 |        120 |     _json\n'
+        'import time:       300 |        420 |   json\n'
+        'import time:      1000 |       1420 | app\n'
+    )
+    assert rows == [(2, '_json', 120, 120), (1, 'json', 300, 420), (0, 'app', 1000, 1420)]
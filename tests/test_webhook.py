@@ -23,3 +23,57 @@ def test_stripe_webhook_checkout_completed(client):
     r = client.get('/api/current_user')
     j = r.get_json()
     assert j.get('is_paid') is True
+
+
+def test_failed_billing_write_is_not_acknowledged(client, monkeypatch):
+    import app as togetherly_app
+    client.post('/api/signup', json={'email': 'wh-fail@example.com', 'password': 'pass1234'})
+    uid = client.get('/api/current_user').get_json()['id']
+    payload = json.dumps({'type': 'checkout.session.completed',
+                          'data': {'object': {'client_reference_id': uid, 'customer': 'cus_f', 'subscription': 'sub_f'}}})
+    real_write = togetherly_app.write
+
+    def timed_out(*args, **kwargs):
+        raise TimeoutError()
+    monkeypatch.setattr(togetherly_app, 'write', timed_out)
+    r = client.post('/api/stripe-webhook', data=payload, content_type='application/json')
+    assert r.status_code == 500 and r.get_json()['ok'] is False
+    assert client.get('/api/current_user').get_json().get('is_paid') is False
+
+    # Stripe's retry of the same event is applied normally
+    monkeypatch.setattr(togetherly_app, 'write', real_write)
+    assert client.post('/api/stripe-webhook', data=payload, content_type='application/json').status_code == 200
+    assert client.get('/api/current_user').get_json().get('is_paid') is True
+
+
+def test_redelivered_checkout_keeps_one_subscription(client):
+    import sqlite3
+    client.post('/api/signup', json={'email': 'wh-dup@example.com', 'password': 'pass1234'})
+    uid = client.get('/api/current_user').get_json()['id']
+    payload = json.dumps({'type': 'checkout.session.completed',
+                          'data': {'object': {'client_reference_id': uid, 'customer': 'cus_d', 'subscription': 'sub_d'}}})
+    db = sqlite3.connect(client.application.DB_PATH)
+
+    def state():
+        return (db.execute("SELECT COUNT(*) FROM subscriptions WHERE stripe_subscription_id = 'sub_d'").fetchone()[0],
+                db.execute('SELECT name, bucket, value FROM admin_counters ORDER BY 1, 2').fetchall())
+
+    assert client.post('/api/stripe-webhook', data=payload, content_type='application/json').status_code == 200
+    first = state()
+    assert first[0] == 1
+    assert client.post('/api/stripe-webhook', data=payload, content_type='application/json').status_code == 200
+    assert state() == first
+    db.close()
+
+
+def test_migration_collapses_duplicate_subscriptions(client):
+    import app as togetherly_app
+    with client.application.app_context():
+        db = togetherly_app.get_db()
+        db.execute('DROP INDEX idx_subscriptions_stripe_id')
+        db.executemany("INSERT INTO subscriptions (id, user_id, stripe_subscription_id, status) VALUES (?, 'u', 'sub_x', ?)",
+                       [('s1', 'active'), ('s2', 'past_due')])
+        db.commit()
+        togetherly_app.init_db()
+        rows = db.execute("SELECT id, status FROM subscriptions WHERE stripe_subscription_id = 'sub_x'").fetchall()
+        assert [tuple(r) for r in rows] == [('s2', 'past_due')]